@@ -6,6 +6,7 @@ from __future__ import annotations
 from abc import ABCMeta, abstractmethod
 from dataclasses import dataclass
 from enum import Enum
+from typing import ClassVar
 
 from lisa import notifier
 from lisa.util import LisaException
@@ -31,6 +32,7 @@ ActionStatus = Enum(
 
 @dataclass
 class ActionMessage(notifier.MessageBase):
+    is_debug: ClassVar[bool] = True
     type: str = "Action"
     sub_type: str = ""
     status: ActionStatus = ActionStatus.UNKNOWN
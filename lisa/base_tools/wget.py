@@ -1,9 +1,11 @@
 import pathlib
 import re
+import shlex
 from typing import TYPE_CHECKING
+from urllib.parse import urlparse
 
 from lisa.executable import Tool
-from lisa.util import LisaException, is_valid_url
+from lisa.util import LisaException, artifact_cache, is_valid_url
 
 if TYPE_CHECKING:
     from lisa.operating_system import Posix
@@ -37,6 +39,21 @@ class Wget(Tool):
     ) -> str:
         is_valid_url(url)
 
+        cache = artifact_cache.get_cache()
+        if cache and self.node.is_posix:
+            # download once on the controller, and copy to nodes.
+            if not filename:
+                filename = self._get_default_filename(url)
+            node_path = cache.deploy(
+                self.node,
+                url,
+                pathlib.PurePosixPath(file_path) / filename,
+                overwrite=overwrite,
+            )
+            if executable:
+                self.node.execute(f"chmod +x {shlex.quote(str(node_path))}", shell=True)
+            return str(node_path)
+
         # create folder when it doesn't exist
         self.node.execute(f"mkdir -p {file_path}", shell=True)
         # combine download file path
@@ -65,3 +82,12 @@ class Wget(Tool):
             self.node.execute(f"chmod +x {actual_file_path}")
 
         return actual_file_path.stdout
+
+    def _get_default_filename(self, url: str) -> str:
+        # the same name as wget saves without "-O": the last part of the url path
+        # with the query, or index.html if it's empty.
+        parsed_url = urlparse(url)
+        filename = parsed_url.path.split("/")[-1]
+        if parsed_url.query:
+            filename = f"{filename}?{parsed_url.query}"
+        return filename or "index.html"
@@ -11,7 +11,7 @@ from lisa.parameter_parser.runbook import RunbookBuilder
 from lisa.runner import RootRunner
 from lisa.testselector import select_testcases
 from lisa.testsuite import TestCaseRuntimeData
-from lisa.util import LisaException, constants, hookspec, plugin_manager
+from lisa.util import LisaException, checkpoint, constants, hookspec, plugin_manager
 from lisa.util.logger import enable_console_timestamp, get_logger
 from lisa.util.perf_timer import create_timer
 
@@ -21,6 +21,7 @@ _get_init_logger = functools.partial(get_logger, "init")
 def run(args: Namespace) -> int:
     enable_console_timestamp()
     builder = RunbookBuilder.from_path(args.runbook, args.variables)
+    checkpoint.enable_checkpoint(args.resume)
 
     notifier_data = builder.partial_resolve(constants.NOTIFIER)
     if notifier_data:
@@ -53,6 +54,9 @@ def run(args: Namespace) -> int:
         notifier.notify(run_message)
         notifier.finalize()
         run_finalize()
+        run_checkpoint = checkpoint.get_checkpoint()
+        if run_checkpoint:
+            run_checkpoint.close()
 
     return runner.exit_code
 
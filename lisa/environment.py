@@ -11,7 +11,7 @@ from enum import Enum
 from functools import partial
 from pathlib import Path
 from threading import Lock
-from typing import TYPE_CHECKING, Any, Dict, List, Optional, cast
+from typing import TYPE_CHECKING, Any, ClassVar, Dict, Hashable, List, Optional, cast
 
 from dataclasses_json import dataclass_json
 from marshmallow import validate
@@ -32,6 +32,7 @@ from lisa.util import (
     plugin_manager,
 )
 from lisa.util.logger import create_file_handler, get_logger, remove_handler
+from lisa.util.parallel import ParallelException
 
 if TYPE_CHECKING:
     from lisa.platform_ import Platform
@@ -74,8 +75,20 @@ def _get_environment_id() -> int:
     return id
 
 
+def set_environment_id_start(start: int) -> None:
+    """
+    It's used by shard processes, so ids and names of environments don't
+    conflict across processes.
+    """
+    global _global_environment_id
+
+    with _global_environment_id_lock:
+        _global_environment_id = start
+
+
 @dataclass
 class EnvironmentMessage(MessageBase):
+    is_debug: ClassVar[bool] = True
     type: str = "Environment"
     name: str = ""
     runbook: schema.Environment = schema.Environment()
@@ -108,6 +121,13 @@ class EnvironmentSpace(search_space.RequirementMixin):
             self.nodes, o.nodes
         )
 
+    def _get_fingerprint(self) -> Hashable:
+        return (
+            "EnvironmentSpace",
+            self.topology,
+            search_space.get_fingerprint(self.nodes),
+        )
+
     def check(self, capability: Any) -> search_space.ResultReason:
         assert isinstance(capability, EnvironmentSpace), f"actual: {type(capability)}"
         result = search_space.ResultReason()
@@ -183,6 +203,8 @@ class Environment(ContextMixin, InitializableMixin):
 
         # indicate is this environment is deploying, preparing, testing or not.
         self.is_in_use: bool = False
+        # errors of failed nodes on initializing or closing, by node names.
+        self.node_errors: Dict[str, str] = {}
 
         # Not to set the log path until its first used. Because the path
         # contains environment name, which is not set in __init__.
@@ -268,7 +290,11 @@ class Environment(ContextMixin, InitializableMixin):
         if hasattr(self, "_log_handler") and self._log_handler:
             remove_handler(self._log_handler, self.log)
             self._log_handler.close()
-        self.nodes.close()
+        try:
+            self.nodes.close()
+        except ParallelException as identifier:
+            self._add_node_errors("close", identifier)
+            raise
 
     def create_node_from_exists(
         self,
@@ -333,9 +359,19 @@ class Environment(ContextMixin, InitializableMixin):
         self._log_handler = create_file_handler(
             self.log_path / "environment.log", self.log
         )
-        self.nodes.initialize()
+        try:
+            self.nodes.initialize()
+        except ParallelException as identifier:
+            self._add_node_errors("initialize", identifier)
+            raise
         self.status = EnvironmentStatus.Connected
 
+    def _add_node_errors(self, action: str, identifier: ParallelException) -> None:
+        for name, error in identifier.errors.items():
+            message = f"failed to {action}, {error.__class__.__name__}: {error}"
+            self.node_errors[name] = message
+            self.log.error(f"{name} {message}")
+
     def _validate_single_default(
         self, has_default: bool, is_default: Optional[bool]
     ) -> bool:
@@ -361,14 +397,18 @@ class Environments(EnvironmentsDict):
         super().__init__()
         self.warn_as_error = warn_as_error
         self.max_concurrency = max_concurrency
+        # index environments by fingerprint of capability, so the exact match
+        # can be found without comparing with all environments.
+        self._capability_index: Dict[Hashable, Environment] = {}
 
     def get_or_create(self, requirement: EnvironmentSpace) -> Optional[Environment]:
         result: Optional[Environment] = None
-        for environment in self.values():
-            # find exact match, or create a new one.
-            if requirement == environment.capability:
-                result = environment
-                break
+        # find exact match, or create a new one.
+        environment = self._capability_index.get(
+            search_space.get_fingerprint(requirement), None
+        )
+        if environment and requirement == environment.capability:
+            result = environment
         else:
             result = self.from_requirement(requirement)
         return result
@@ -407,6 +447,9 @@ class Environments(EnvironmentsDict):
             runbook=copied_runbook,
         )
         self[name] = env
+        self._capability_index.setdefault(
+            search_space.get_fingerprint(env.capability), env
+        )
         log = _get_init_logger()
         log.debug(f"created {env.name}: {env.runbook}")
 
@@ -449,6 +492,11 @@ class EnvironmentHookImpl:
     def get_environment_information(self, environment: Environment) -> Dict[str, str]:
         information: Dict[str, str] = {}
         information["name"] = environment.name
+        if environment.node_errors:
+            information["node_errors"] = "; ".join(
+                f"{name}: {message}"
+                for name, message in environment.node_errors.items()
+            )
 
         if environment.nodes:
             node = environment.default_node
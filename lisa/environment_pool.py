@@ -0,0 +1,197 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+import time
+from dataclasses import dataclass
+from functools import partial
+from threading import Lock
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional
+
+from lisa import schema
+from lisa.environment import Environment, EnvironmentStatus
+from lisa.util.logger import get_logger
+from lisa.util.parallel import run_in_parallel
+
+if TYPE_CHECKING:
+    from lisa.platform_ import Platform
+
+
+# the timeout of health check command on nodes.
+_HEALTH_CHECK_TIMEOUT = 60
+
+
+@dataclass
+class _PoolEntry:
+    environment: Environment
+    platform_key: Dict[str, Any]
+    pooled_time: float
+    released_time: float
+
+
+def _get_platform_key(platform: "Platform") -> Dict[str, Any]:
+    # environments are reused by platforms with the same settings only, because
+    # settings like images are in platform runbook.
+    runbook: schema.Platform = platform.runbook
+    return runbook.to_dict()  # type: ignore
+
+
+class EnvironmentPool:
+    """
+    The run scoped pool of deployed environments. Runners release environments
+    to the pool instead of deleting them, and later runners lease them, if the
+    platform settings are the same and test cases fit.
+    """
+
+    def __init__(self, ttl: float, max_idle: float, reset: bool) -> None:
+        self._ttl = ttl
+        self._max_idle = max_idle
+        self._reset = reset
+        self._entries: List[_PoolEntry] = []
+        # the first pooled time of environments, so the ttl is kept across leases.
+        self._pooled_times: Dict[int, float] = {}
+        self._lock = Lock()
+        self._log = get_logger("environment_pool")
+
+    @property
+    def count(self) -> int:
+        return len(self._entries)
+
+    def release(self, environment: Environment) -> bool:
+        """
+        Put a deployed environment to the pool. Return False, if it cannot be
+        reused, and the caller should delete it.
+        """
+        if (
+            environment.is_predefined
+            or not environment.platform
+            or environment.status
+            not in [EnvironmentStatus.Deployed, EnvironmentStatus.Connected]
+        ):
+            return False
+
+        current_time = time.time()
+        with self._lock:
+            pooled_time = self._pooled_times.setdefault(environment.id, current_time)
+            if current_time - pooled_time > self._ttl:
+                return False
+            self._entries.append(
+                _PoolEntry(
+                    environment=environment,
+                    platform_key=_get_platform_key(environment.platform),
+                    pooled_time=pooled_time,
+                    released_time=current_time,
+                )
+            )
+        self._log.debug(f"released '{environment.name}', pool size: {self.count}")
+        return True
+
+    def lease(
+        self, platform: "Platform", check: Callable[[Environment], bool]
+    ) -> Optional[Environment]:
+        """
+        Return a healthy environment, which is deployed by the same platform
+        settings and passes the check.
+        """
+        self.delete_expired()
+        platform_key = _get_platform_key(platform)
+        while True:
+            with self._lock:
+                entry = next(
+                    (
+                        x
+                        for x in self._entries
+                        # the releasing runner may not finish the task yet.
+                        if not x.environment.is_in_use
+                        and x.platform_key == platform_key
+                        and check(x.environment)
+                    ),
+                    None,
+                )
+                if not entry:
+                    return None
+                self._entries.remove(entry)
+
+            environment = entry.environment
+            if self._prepare_leased(environment):
+                self._log.debug(f"leased '{environment.name}'")
+                return environment
+            self._delete(environment)
+
+    def delete_expired(self) -> None:
+        current_time = time.time()
+        with self._lock:
+            expired_entries = [
+                x
+                for x in self._entries
+                if not x.environment.is_in_use
+                and (
+                    current_time - x.pooled_time > self._ttl
+                    or current_time - x.released_time > self._max_idle
+                )
+            ]
+            for entry in expired_entries:
+                self._entries.remove(entry)
+        self._delete_entries(expired_entries)
+
+    def clear(self) -> None:
+        with self._lock:
+            entries = self._entries
+            self._entries = []
+        self._delete_entries(entries)
+
+    def _prepare_leased(self, environment: Environment) -> bool:
+        """
+        Check health of nodes, and reset them if it's needed.
+        """
+        if environment.status != EnvironmentStatus.Connected:
+            # nodes are not initialized, so the platform's status is trusted.
+            return True
+        try:
+            for node in environment.nodes.list():
+                result = node.execute(
+                    "echo lisa", timeout=_HEALTH_CHECK_TIMEOUT, no_error_log=True
+                )
+                if result.exit_code != 0:
+                    raise Exception(f"unexpected exit code: {result.exit_code}")
+                if self._reset:
+                    node.reboot()
+        except Exception as identifier:
+            self._log.info(
+                f"'{environment.name}' failed on health check: {identifier}, "
+                f"delete it"
+            )
+            return False
+        return True
+
+    def _delete_entries(self, entries: List[_PoolEntry]) -> None:
+        if not entries:
+            return
+        tasks: Dict[str, Callable[[], None]] = {
+            x.environment.name: partial(self._delete, x.environment) for x in entries
+        }
+        try:
+            run_in_parallel(tasks)
+        except Exception as identifier:
+            self._log.info(f"failed on deleting pooled environments: {identifier}")
+
+    def _delete(self, environment: Environment) -> None:
+        assert environment.platform
+        self._log.debug(f"deleting '{environment.name}'")
+        environment.platform.delete_environment(environment)
+
+
+_pool: Optional[EnvironmentPool] = None
+
+
+def enable_pool(ttl: float, max_idle: float, reset: bool) -> None:
+    """
+    It's opt-in. ttl and max_idle are in seconds. The pool is shared by all
+    runners, so it's created once.
+    """
+    global _pool
+    if not _pool:
+        _pool = EnvironmentPool(ttl=ttl, max_idle=max_idle, reset=reset)
+
+
+def get_pool() -> Optional[EnvironmentPool]:
+    return _pool
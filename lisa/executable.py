@@ -4,8 +4,22 @@
 from __future__ import annotations
 
 import pathlib
+import time
+from collections import OrderedDict
 from hashlib import sha256
-from typing import TYPE_CHECKING, Any, Dict, List, Optional, Type, TypeVar, Union, cast
+from threading import Lock
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    Type,
+    TypeVar,
+    Union,
+    cast,
+)
 
 from lisa.util import InitializableMixin, LisaException, constants
 from lisa.util.logger import get_logger
@@ -19,6 +33,60 @@ if TYPE_CHECKING:
 T = TypeVar("T")
 
 
+class ResultCache:
+    """
+    Cache processes of a tool by command lines. It drops the least recently used
+    one, if it's full. If ttl is set, results are expired after ttl seconds. The
+    max_size 0 means no limit, and ttl 0 means never expire.
+    """
+
+    def __init__(self, max_size: int = 64, ttl: float = 0) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        # command key: (process, cached time)
+        self._items: OrderedDict[str, Tuple[Process, float]] = OrderedDict()
+        # a tool may be run by multiple threads, like tasks of test cases.
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._items)
+
+    def get(self, key: str) -> Optional[Process]:
+        with self._lock:
+            item = self._items.get(key, None)
+            if item and self.ttl and time.monotonic() - item[1] > self.ttl:
+                del self._items[key]
+                item = None
+            if item:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return item[0]
+            self.misses += 1
+            return None
+
+    def put(self, key: str, process: Process) -> None:
+        with self._lock:
+            self._items[key] = (process, time.monotonic())
+            self._items.move_to_end(key)
+            while self.max_size and len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+    def is_mutating(self, parameters: str, force_run: bool, sudo: bool) -> bool:
+        """
+        A forced run with sudo is considered to change the state of the node,
+        like ethtool -G, so cached results of the tool are stale after it.
+        Override it for tools, which need a different rule.
+        """
+        return force_run and sudo
+
+
 class Tool(InitializableMixin):
     """
     The base class, which wraps an executable, package, or scripts on a node.
@@ -66,7 +134,7 @@ class Tool(InitializableMixin):
         self._use_sudo: bool = False
         # cache the processes with same command line, so that it reduce time to
         # rerun same commands.
-        self.__cached_results: Dict[str, Process] = {}
+        self.__cached_results = self._create_result_cache()
 
     @property
     def command(self) -> str:
@@ -121,6 +189,17 @@ class Tool(InitializableMixin):
         """
         raise NotImplementedError()
 
+    @property
+    def cached_results(self) -> ResultCache:
+        return self.__cached_results
+
+    def _create_result_cache(self) -> ResultCache:
+        """
+        Override it to change the size, ttl or the rule of mutating calls of the
+        result cache.
+        """
+        return ResultCache()
+
     def _initialize(self, *args: Any, **kwargs: Any) -> None:
         """
         Declare and initialize variables here, or some time costing initialization.
@@ -186,9 +265,24 @@ class Tool(InitializableMixin):
         """
         # the check may need extra cost, so cache it's result.
         if self._exists is None:
-            self._exists = self._check_exists()
+            facts = self.node.facts
+            if facts and self.name in facts.tools:
+                self._exists, self._use_sudo = facts.tools[self.name]
+            else:
+                self._exists = self._check_exists()
+                # builtin tools cannot be installed by tests, so the result is the
+                # same on other nodes with same image.
+                if facts and self._is_builtin():
+                    facts.tools[self.name] = [self._exists, self._use_sudo]
         return self._exists
 
+    def _is_builtin(self) -> bool:
+        try:
+            return not self.can_install
+        except NotImplementedError:
+            # tools without installation are builtin.
+            return True
+
     def install(self) -> bool:
         """
         Default behavior of install a tool, including dependencies. It doesn't need to
@@ -210,10 +304,14 @@ class Tool(InitializableMixin):
         no_error_log: bool = False,
         no_info_log: bool = True,
         cwd: Optional[pathlib.PurePath] = None,
+        max_output_size: int = 0,
     ) -> Process:
         """
         Run a command async and return the Process. The process is used for async, or
         kill directly.
+
+        max_output_size: the max size of stdout or stderr in memory, 0 means no
+            limit. It's passed to the node.
         """
         if parameters:
             command = f"{self.command} {parameters}"
@@ -223,9 +321,12 @@ class Tool(InitializableMixin):
         # If the command exists in sbin, use the root permission, even the sudo
         # is not specified.
         sudo = sudo or self._use_sudo
-        command_key = f"{command}|{shell}|{sudo}|{cwd}"
-        process = self.__cached_results.get(command_key, None)
-        if force_run or not process:
+        command_key = f"{command}|{shell}|{sudo}|{cwd}|{max_output_size}"
+        if self.__cached_results.is_mutating(parameters, force_run, sudo):
+            # other results of the tool may be changed.
+            self.__cached_results.clear()
+        process = None if force_run else self.__cached_results.get(command_key)
+        if not process:
             process = self.node.execute_async(
                 command,
                 shell=shell,
@@ -233,8 +334,9 @@ class Tool(InitializableMixin):
                 no_error_log=no_error_log,
                 cwd=cwd,
                 no_info_log=no_info_log,
+                max_output_size=max_output_size,
             )
-            self.__cached_results[command_key] = process
+            self.__cached_results.put(command_key, process)
         else:
             self._log.debug(f"loaded cached result for command: [{command}]")
         return process
@@ -249,6 +351,7 @@ class Tool(InitializableMixin):
         no_info_log: bool = True,
         cwd: Optional[pathlib.PurePath] = None,
         timeout: int = 600,
+        max_output_size: int = 0,
     ) -> ExecutableResult:
         """
         Run a process and wait for result.
@@ -261,6 +364,7 @@ class Tool(InitializableMixin):
             no_error_log=no_error_log,
             no_info_log=no_info_log,
             cwd=cwd,
+            max_output_size=max_output_size,
         )
         return process.wait_result(timeout=timeout)
 
@@ -320,6 +424,7 @@ class CustomScript(Tool):
         no_error_log: bool = False,
         no_info_log: bool = True,
         cwd: Optional[pathlib.PurePath] = None,
+        max_output_size: int = 0,
     ) -> Process:
         if cwd is not None:
             raise LisaException("don't set cwd for script")
@@ -332,6 +437,7 @@ class CustomScript(Tool):
             no_error_log=no_error_log,
             no_info_log=no_info_log,
             cwd=self._cwd,
+            max_output_size=max_output_size,
         )
 
     def run(
@@ -344,6 +450,7 @@ class CustomScript(Tool):
         no_info_log: bool = True,
         cwd: Optional[pathlib.PurePath] = None,
         timeout: int = 600,
+        max_output_size: int = 0,
     ) -> ExecutableResult:
         process = self.run_async(
             parameters=parameters,
@@ -353,6 +460,7 @@ class CustomScript(Tool):
             no_error_log=no_error_log,
             no_info_log=no_info_log,
             cwd=cwd,
+            max_output_size=max_output_size,
         )
         return process.wait_result(timeout=timeout)
 
@@ -464,6 +572,23 @@ class Tools:
         self._node = node
         self._cache: Dict[str, Tool] = {}
 
+    def clear_cached_results(self) -> None:
+        """
+        Call it, when results of all tools may be changed, like after rebooted.
+        """
+        for tool in self._cache.values():
+            tool.cached_results.clear()
+
+    def get_cache_statistics(self) -> Dict[str, Tuple[int, int]]:
+        """
+        return hits and misses of tools, which ran commands.
+        """
+        return {
+            name: (tool.cached_results.hits, tool.cached_results.misses)
+            for name, tool in self._cache.items()
+            if tool.cached_results.hits or tool.cached_results.misses
+        }
+
     def __getattr__(self, key: str) -> Tool:
         """
         for shortcut access like node.tools.echo.call_method()
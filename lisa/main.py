@@ -12,7 +12,12 @@ from retry import retry
 
 from lisa.parameter_parser.argparser import parse_args
 from lisa.util import constants, get_datetime_path
-from lisa.util.logger import create_file_handler, get_logger, set_level
+from lisa.util.logger import (
+    create_file_handler,
+    enable_queued_writer,
+    get_logger,
+    set_level,
+)
 from lisa.util.perf_timer import create_timer
 from lisa.variable import add_secrets_from_pairs
 
@@ -62,6 +67,8 @@ def main() -> int:
 
         log_level = DEBUG if (args.debug) else INFO
         set_level(log_level)
+        if args.async_log:
+            enable_queued_writer()
 
         create_file_handler(
             Path(f"{constants.RUN_LOCAL_PATH}/lisa-{constants.RUN_ID}.log")
@@ -3,9 +3,23 @@
 
 from __future__ import annotations
 
+import re
+import shlex
+from functools import partial
 from pathlib import Path, PurePath, PurePosixPath, PureWindowsPath
 from random import randint
-from typing import Any, Dict, Iterable, List, Optional, Type, TypeVar, Union, cast
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Type,
+    TypeVar,
+    Union,
+    cast,
+)
 
 from lisa import schema
 from lisa.executable import Tools
@@ -21,11 +35,16 @@ from lisa.util import (
     subclasses,
 )
 from lisa.util.logger import Logger, get_logger
+from lisa.util.node_facts import NodeFacts, get_cache
+from lisa.util.parallel import ParallelException, run_in_parallel
 from lisa.util.process import ExecutableResult, Process
 from lisa.util.shell import ConnectionInfo, LocalShell, Shell, SshShell
 
 T = TypeVar("T")
 
+# how many nodes are initialized or closed concurrently in an environment.
+_MAX_PARALLEL_NODES = 8
+
 
 class Node(subclasses.BaseClassWithRunbookMixin, ContextMixin, InitializableMixin):
     _factory: Optional[subclasses.Factory[Node]] = None
@@ -61,6 +80,14 @@ class Node(subclasses.BaseClassWithRunbookMixin, ContextMixin, InitializableMixi
         self._local_log_path: Optional[Path] = None
         self._support_sudo: Optional[bool] = None
 
+        # The key to share cached facts across runs, like the image and vm size.
+        # If it's not set, remote nodes use the address, and the facts are valid
+        # in the same boot only.
+        self.facts_key: str = ""
+        # it's set, if the node facts cache is enabled.
+        self.facts: Optional[NodeFacts] = None
+        self._facts_cache_key: str = ""
+
     @property
     def shell(self) -> Shell:
         assert self._shell, "Shell is not initialized"
@@ -172,6 +199,7 @@ class Node(subclasses.BaseClassWithRunbookMixin, ContextMixin, InitializableMixi
         no_info_log: bool = True,
         cwd: Optional[PurePath] = None,
         timeout: int = 600,
+        max_output_size: int = 0,
     ) -> ExecutableResult:
         process = self.execute_async(
             cmd,
@@ -180,9 +208,116 @@ class Node(subclasses.BaseClassWithRunbookMixin, ContextMixin, InitializableMixi
             no_error_log=no_error_log,
             no_info_log=no_info_log,
             cwd=cwd,
+            max_output_size=max_output_size,
         )
         return process.wait_result(timeout=timeout)
 
+    def execute_batch(
+        self,
+        commands: List[str],
+        shell: bool = False,
+        sudo: bool = False,
+        no_error_log: bool = False,
+        no_info_log: bool = True,
+        cwd: Optional[PurePath] = None,
+        timeout: int = 600,
+    ) -> List[ExecutableResult]:
+        """
+        Run independent commands in one remote invocation, and return results in
+        the same order. The stdout, stderr and exit code of each command are framed
+        separately, so they are the same as running commands one by one. The
+        elapsed time is of the whole batch.
+        """
+        self.initialize()
+
+        if not self.shell.is_posix:
+            # the batch script needs a posix shell.
+            return [
+                self.execute(
+                    command,
+                    shell=shell,
+                    sudo=sudo,
+                    no_error_log=no_error_log,
+                    no_info_log=no_info_log,
+                    cwd=cwd,
+                    timeout=timeout,
+                )
+                for command in commands
+            ]
+
+        if sudo and not self.support_sudo:
+            raise LisaException(
+                f"node doesn't support [command] or [sudo], "
+                f"cannot execute: {commands}"
+            )
+
+        boundary = f"__lisa_batch_{randint(0, 0xFFFFFFFF):08x}__"
+        script_lines = ["exec 3>&1"]
+        if cwd:
+            script_lines.append(f"cd {shlex.quote(str(cwd))} || exit 1")
+        command_args_list: List[List[str]] = []
+        for index, command in enumerate(commands):
+            if shell:
+                command_args = ["sh", "-c", command]
+                if sudo:
+                    command_args = ["sudo", *command_args]
+                script = f"exec {_join_command(command_args)}"
+            else:
+                command_args = shlex.split(f"sudo {command}" if sudo else command)
+                # the same as spur, it's failed if the command doesn't exist.
+                script = (
+                    f"if command -v {shlex.quote(command_args[0])} "
+                    f">/dev/null 2>&1; then exec {_join_command(command_args)}; "
+                    f"else exit 1; fi"
+                )
+            command_args_list.append(command_args)
+            # each frame starts with a line, so an empty stdout is kept even if
+            # the whole output is stripped. The stdout is written to fd 3
+            # directly, the stderr is captured, and written after the exit code.
+            script_lines.append(f"printf '%s-start %s\\n' {boundary} {index}")
+            script_lines.append(f"err=$( {{ {script}; }} 2>&1 >&3 ); code=$?")
+            script_lines.append(
+                f"printf '\\n%s %s %s\\n%s\\n%s-end\\n' "
+                f'{boundary} {index} $code "$err" {boundary}'
+            )
+
+        batch_result = self.execute(
+            "\n".join(script_lines),
+            shell=True,
+            no_error_log=no_error_log,
+            no_info_log=no_info_log,
+            timeout=timeout,
+        )
+
+        results: List[Optional[ExecutableResult]] = [None] * len(commands)
+        escaped_boundary = re.escape(boundary)
+        frame_pattern = re.compile(
+            rf"{escaped_boundary}-start (?P<index>\d+)\r?\n(?P<stdout>.*?)\r?\n"
+            rf"{escaped_boundary} (?P=index) (?P<exit_code>\d+)\r?\n"
+            rf"(?P<stderr>.*?)\r?\n{escaped_boundary}-end",
+            re.DOTALL,
+        )
+        for match in frame_pattern.finditer(batch_result.stdout):
+            index = int(match.group("index"))
+            if index >= len(commands):
+                continue
+            results[index] = ExecutableResult(
+                match.group("stdout").strip(),
+                match.group("stderr").strip(),
+                int(match.group("exit_code")),
+                command_args_list[index],
+                batch_result.elapsed,
+            )
+        completed_results = [x for x in results if x is not None]
+        if len(completed_results) != len(commands):
+            raise LisaException(
+                f"failed to run batch commands, expected {len(commands)} "
+                f"results, but got {len(completed_results)}. exit code: "
+                f"{batch_result.exit_code}, stderr: {batch_result.stderr}"
+            )
+
+        return completed_results
+
     def execute_async(
         self,
         cmd: str,
@@ -191,7 +326,14 @@ class Node(subclasses.BaseClassWithRunbookMixin, ContextMixin, InitializableMixi
         no_error_log: bool = False,
         no_info_log: bool = True,
         cwd: Optional[PurePath] = None,
+        max_output_size: int = 0,
     ) -> Process:
+        """
+        max_output_size: the max size of stdout or stderr in memory, 0 means no
+            limit. If it's exceeded, the full output is saved to a file in the
+            log path of the node. The result keeps the head and tail, and the
+            full output can be read by get_full_stdout and get_full_stderr.
+        """
         self.initialize()
 
         if sudo and not self.support_sudo:
@@ -206,10 +348,17 @@ class Node(subclasses.BaseClassWithRunbookMixin, ContextMixin, InitializableMixi
             no_error_log=no_error_log,
             no_info_log=no_info_log,
             cwd=cwd,
+            max_output_size=max_output_size,
         )
 
     def close(self) -> None:
         self.log.debug("closing node connection...")
+        statistics = self.tools.get_cache_statistics()
+        if statistics:
+            self.log.debug(f"tool result cache hits and misses: {statistics}")
+        cache = get_cache()
+        if cache and self.facts:
+            cache.save(self._facts_cache_key, self.facts)
         if self._shell:
             self._shell.close()
 
@@ -224,7 +373,49 @@ class Node(subclasses.BaseClassWithRunbookMixin, ContextMixin, InitializableMixi
     def _initialize(self, *args: Any, **kwargs: Any) -> None:
         self.log.info(f"initializing node '{self.name}' {self}")
         self.shell.initialize()
-        self.os: OperatingSystem = OperatingSystem.create(self)
+        self._load_facts()
+        if self.facts and self.facts.os_type:
+            self.os: OperatingSystem = OperatingSystem.create_by_type_name(
+                self, self.facts.os_type
+            )
+        else:
+            self.os = OperatingSystem.create(self)
+            if self.facts:
+                self.facts.os_type = self.os.name
+
+    def invalidate_facts(self) -> None:
+        """
+        Call it, when facts of the node may be changed, for example, the kernel is
+        replaced. So they won't be reused by other nodes.
+        """
+        cache = get_cache()
+        if cache and self.facts:
+            cache.remove(self._facts_cache_key)
+        self.facts = None
+
+    def _get_facts_key(self) -> str:
+        return self.facts_key
+
+    def _load_facts(self) -> None:
+        cache = get_cache()
+        key = self._get_facts_key()
+        if not cache or not key or not self.shell.is_posix:
+            return
+
+        kernel_release, boot_id = self.execute_batch(
+            ["uname -r", "cat /proc/sys/kernel/random/boot_id"], no_error_log=True
+        )
+        stamp = kernel_release.stdout
+        if not self.facts_key:
+            # the key is not shared by other nodes, so make sure it's the same boot.
+            stamp = f"{stamp}|{boot_id.stdout}"
+
+        self._facts_cache_key = key
+        self.facts = cache.get(key, stamp)
+        if self.facts:
+            self.log.debug(f"loaded cached facts: {key}")
+        else:
+            self.facts = NodeFacts(stamp=stamp)
 
     def _execute(
         self,
@@ -234,6 +425,7 @@ class Node(subclasses.BaseClassWithRunbookMixin, ContextMixin, InitializableMixi
         no_error_log: bool = False,
         no_info_log: bool = False,
         cwd: Optional[PurePath] = None,
+        max_output_size: int = 0,
     ) -> Process:
         cmd_id = str(randint(0, 10000))
         process = Process(cmd_id, self.shell, parent_logger=self.log)
@@ -244,6 +436,8 @@ class Node(subclasses.BaseClassWithRunbookMixin, ContextMixin, InitializableMixi
             no_error_log=no_error_log,
             no_info_log=no_info_log,
             cwd=cwd,
+            max_output_size=max_output_size,
+            output_path=self.local_log_path if max_output_size else None,
         )
         return process
 
@@ -259,6 +453,9 @@ class RemoteNode(Node):
     def is_remote(self) -> bool:
         return True
 
+    def _get_facts_key(self) -> str:
+        return self.facts_key or str(self._connection_info)
+
     @property
     def connection_info(self) -> Dict[str, Any]:
         return fields_to_dict(
@@ -292,6 +489,7 @@ class RemoteNode(Node):
             constants.ENVIRONMENTS_NODES_REMOTE_PORT,
             constants.ENVIRONMENTS_NODES_REMOTE_PUBLIC_ADDRESS,
             constants.ENVIRONMENTS_NODES_REMOTE_PUBLIC_PORT,
+            constants.ENVIRONMENTS_NODES_REMOTE_MAX_SESSIONS,
         ]
         parameters = fields_to_dict(self.runbook, fields)
 
@@ -320,6 +518,7 @@ class RemoteNode(Node):
         username: str = "root",
         password: str = "",
         private_key_file: str = "",
+        max_sessions: int = 10,
     ) -> None:
         if hasattr(self, "_connection_info"):
             raise LisaException(
@@ -351,6 +550,7 @@ class RemoteNode(Node):
             username,
             password,
             private_key_file,
+            max_sessions,
         )
         self._shell = SshShell(self._connection_info)
 
@@ -469,17 +669,42 @@ class Nodes:
             yield node
 
     def initialize(self) -> None:
-        for node in self._list:
-            node.initialize()
+        # nodes connect in parallel, so multiple nodes don't wait each other.
+        self._run_on_nodes(lambda x: x.initialize())
 
     def close(self) -> None:
-        for node in self._list:
-            node.close()
+        self._run_on_nodes(lambda x: x.close())
+
+    def _run_on_nodes(self, action: Callable[[Node], None]) -> None:
+        """
+        All nodes run to the end. If any node fails, ParallelException is
+        raised with errors of all failed nodes by their names, even only one
+        node fails. So callers know which nodes are failed.
+        """
+        errors: Dict[str, Exception] = {}
+
+        def _run(name: str, node: Node) -> None:
+            try:
+                action(node)
+            except Exception as identifier:
+                errors[name] = identifier
+
+        tasks: Dict[str, Callable[[], None]] = {
+            f"node[{node.index}]": partial(_run, f"node[{node.index}]", node)
+            for node in self._list
+        }
+        run_in_parallel(tasks, max_workers=_MAX_PARALLEL_NODES)
+        if errors:
+            raise ParallelException({x: errors[x] for x in tasks if x in errors})
 
     def append(self, node: Node) -> None:
         self._list.append(node)
 
 
+def _join_command(command_args: List[str]) -> str:
+    return " ".join(shlex.quote(x) for x in command_args)
+
+
 def quick_connect(
     runbook: schema.Node,
     logger_name: str = "",
@@ -2,9 +2,10 @@
 # Licensed under the MIT license.
 
 import threading
+from collections import deque
 from dataclasses import dataclass
 from enum import Enum
-from typing import Any, Dict, List, Optional, Type
+from typing import Any, Callable, ClassVar, Deque, Dict, List, Optional, Type
 
 from lisa import schema
 from lisa.util import InitializableMixin, constants, subclasses
@@ -13,9 +14,18 @@ from lisa.util.logger import get_logger
 
 @dataclass
 class MessageBase:
+    # debug messages can be dropped, if the queue of a notifier is full.
+    is_debug: ClassVar[bool] = False
     type: str = ""
     elapsed: float = 0
 
+    def get_coalesce_key(self) -> str:
+        """
+        A queued message can be replaced by a later one with the same key, like
+        status updates of a test result. Empty means it cannot be replaced.
+        """
+        return ""
+
 
 TestRunStatus = Enum(
     "TestRunStatus",
@@ -66,6 +76,14 @@ class Notifier(subclasses.BaseClassWithRunbookMixin, InitializableMixin):
         """
         raise NotImplementedError
 
+    def _received_messages(self, messages: List[MessageBase]) -> None:
+        """
+        Called by notifier with queued messages in order. Override it to handle
+        messages in batches, like writing to a file or a service once.
+        """
+        for message in messages:
+            self._received_message(message=message)
+
     def _initialize(self, *args: Any, **kwargs: Any) -> None:
         """
         initialize is optional
@@ -73,12 +91,107 @@ class Notifier(subclasses.BaseClassWithRunbookMixin, InitializableMixin):
         pass
 
 
+# the max count of messages, which are delivered together.
+_MAX_BATCH_SIZE = 100
+
+
+class _Dispatcher:
+    """
+    It delivers messages to a notifier on its own thread, so a slow notifier
+    doesn't block callers and other notifiers. Messages are delivered in order.
+    """
+
+    def __init__(self, notifier: Notifier, queue_size: int, policy: str) -> None:
+        self._notifier = notifier
+        self._queue_size = queue_size
+        self._policy = policy
+        self._condition = threading.Condition()
+        # a slot holds a message, so a coalesced message keeps its order.
+        self._slots: Deque[List[MessageBase]] = deque()
+        self._coalesce_slots: Dict[str, List[MessageBase]] = {}
+        self._is_closed = False
+        self.dropped_count = 0
+        self.coalesced_count = 0
+        self._thread: Optional[threading.Thread] = None
+        if queue_size > 0:
+            self._thread = threading.Thread(
+                target=self._dispatch,
+                name=f"notifier {notifier.type_name()}",
+                daemon=True,
+            )
+            self._thread.start()
+
+    def put(self, message: MessageBase) -> None:
+        key = ""
+        if self._policy == constants.NOTIFIER_QUEUE_COALESCE:
+            key = message.get_coalesce_key()
+        with self._condition:
+            if self._is_closed or not self._thread:
+                self._deliver([message])
+                return
+            while len(self._slots) >= self._queue_size:
+                if key and key in self._coalesce_slots:
+                    self._coalesce_slots[key][0] = message
+                    self.coalesced_count += 1
+                    return
+                if self._policy == constants.NOTIFIER_QUEUE_DROP and message.is_debug:
+                    self.dropped_count += 1
+                    return
+                self._condition.wait()
+            slot = [message]
+            self._slots.append(slot)
+            if key:
+                self._coalesce_slots[key] = slot
+            self._condition.notify_all()
+
+    def close(self) -> None:
+        """
+        Deliver all queued messages, and stop the thread.
+        """
+        with self._condition:
+            self._is_closed = True
+            self._condition.notify_all()
+        if self._thread:
+            self._thread.join()
+        if self.dropped_count or self.coalesced_count:
+            self._notifier._log.debug(
+                f"dropped {self.dropped_count} messages, "
+                f"coalesced {self.coalesced_count} messages, "
+                "because the queue is full."
+            )
+
+    def _dispatch(self) -> None:
+        while True:
+            with self._condition:
+                while not self._slots and not self._is_closed:
+                    self._condition.wait()
+                if not self._slots:
+                    # closed and all messages are delivered.
+                    return
+                messages: List[MessageBase] = []
+                while self._slots and len(messages) < _MAX_BATCH_SIZE:
+                    slot = self._slots.popleft()
+                    if self._coalesce_slots:
+                        key = slot[0].get_coalesce_key()
+                        if self._coalesce_slots.get(key, None) is slot:
+                            del self._coalesce_slots[key]
+                    messages.append(slot[0])
+                self._condition.notify_all()
+            self._deliver(messages)
+
+    def _deliver(self, messages: List[MessageBase]) -> None:
+        try:
+            self._notifier._received_messages(messages)
+        except Exception as identifier:
+            self._notifier._log.exception(identifier)
+
+
 _notifiers: List[Notifier] = []
-_messages: Dict[type, List[Notifier]] = {}
-# prevent concurrent message conflict.
-_message_queue: List[MessageBase] = []
-_message_queue_lock = threading.Lock()
-_notifying_lock = threading.Lock()
+_dispatchers: List[_Dispatcher] = []
+_messages: Dict[type, List[_Dispatcher]] = {}
+# if it's set, messages are forwarded instead of notifying, like from a shard
+# process to the coordinator.
+_forward: Optional[Callable[[MessageBase], None]] = None
 
 
 # below methods uses to operate a global notifiers,
@@ -97,15 +210,19 @@ def initialize(runbooks: List[schema.Notifier]) -> None:
 
         notifier = factory.create_by_runbook(runbook=runbook)
         _notifiers.append(notifier)
+        dispatcher = _Dispatcher(
+            notifier, queue_size=runbook.queue_size, policy=runbook.queue_policy
+        )
+        _dispatchers.append(dispatcher)
 
         subscribed_message_types: List[
             Type[MessageBase]
         ] = notifier._subscribed_message_type()
 
         for message_type in subscribed_message_types:
-            registered_notifiers = _messages.get(message_type, [])
-            registered_notifiers.append(notifier)
-            _messages[message_type] = registered_notifiers
+            registered_dispatchers = _messages.get(message_type, [])
+            registered_dispatchers.append(dispatcher)
+            _messages[message_type] = registered_dispatchers
         log.debug(
             f"registered [{notifier.type_name()}] "
             f"on messages: {[x.type for x in subscribed_message_types]}"
@@ -114,27 +231,26 @@ def initialize(runbooks: List[schema.Notifier]) -> None:
         notifier.initialize()
 
 
+def set_forward(forward: Optional[Callable[[MessageBase], None]]) -> None:
+    global _forward
+    _forward = forward
+
+
 def notify(message: MessageBase) -> None:
-    # TODO make it async for performance consideration
-
-    # to make sure message get order as possible, use a queue to hold messages.
-    with _message_queue_lock:
-        _message_queue.append(message)
-    while len(_message_queue) > 0:
-        # send message one by one
-        with _notifying_lock:
-            with _message_queue_lock:
-                current_message: Optional[MessageBase] = None
-                if len(_message_queue) > 0:
-                    current_message = _message_queue.pop()
-            if current_message:
-                notifiers = _messages.get(type(current_message))
-                if notifiers:
-                    for notifier in notifiers:
-                        notifier._received_message(message=current_message)
+    if _forward:
+        _forward(message)
+        return
+
+    dispatchers = _messages.get(type(message))
+    if dispatchers:
+        for dispatcher in dispatchers:
+            dispatcher.put(message)
 
 
 def finalize() -> None:
+    # deliver queued messages, before notifiers are finalized.
+    for dispatcher in _dispatchers:
+        dispatcher.close()
     for notifier in _notifiers:
         try:
             notifier.finalize()
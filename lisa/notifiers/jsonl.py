@@ -0,0 +1,185 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+import dataclasses
+import json
+import sqlite3
+from dataclasses import dataclass
+from datetime import datetime
+from enum import Enum
+from pathlib import Path
+from typing import Any, Dict, List, Optional, TextIO, Type, cast
+
+from dataclasses_json import dataclass_json
+
+from lisa import schema
+from lisa.notifier import MessageBase, Notifier, TestRunMessage
+from lisa.testsuite import TestResultMessage
+from lisa.util import constants
+
+_CREATE_TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS runs (
+        run_id TEXT PRIMARY KEY,
+        run_name TEXT,
+        status TEXT,
+        test_project TEXT,
+        test_pass TEXT,
+        tags TEXT,
+        message TEXT,
+        elapsed REAL,
+        updated_time TEXT
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS results (
+        run_id TEXT,
+        id TEXT,
+        name TEXT,
+        suite TEXT,
+        status TEXT,
+        message TEXT,
+        elapsed REAL,
+        vm_size TEXT,
+        image TEXT,
+        information TEXT,
+        log_file TEXT,
+        updated_time TEXT,
+        PRIMARY KEY (run_id, id)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS results_status ON results (status)",
+    "CREATE INDEX IF NOT EXISTS results_suite ON results (suite)",
+    "CREATE INDEX IF NOT EXISTS results_vm_size ON results (vm_size)",
+    "CREATE INDEX IF NOT EXISTS results_image ON results (image)",
+]
+# later run messages may not have all fields, so empty fields don't overwrite.
+_UPSERT_RUN = (
+    "INSERT INTO runs VALUES "
+    "(:run_id, :run_name, :status, :test_project, :test_pass, :tags, :message, "
+    ":elapsed, :time) "
+    "ON CONFLICT(run_id) DO UPDATE SET "
+    "run_name = COALESCE(NULLIF(excluded.run_name, ''), run_name), "
+    "status = excluded.status, "
+    "test_project = COALESCE(NULLIF(excluded.test_project, ''), test_project), "
+    "test_pass = COALESCE(NULLIF(excluded.test_pass, ''), test_pass), "
+    "tags = COALESCE(excluded.tags, tags), "
+    "message = COALESCE(NULLIF(excluded.message, ''), message), "
+    "elapsed = excluded.elapsed, "
+    "updated_time = excluded.updated_time"
+)
+_UPSERT_RESULT = (
+    "INSERT OR REPLACE INTO results VALUES "
+    "(:run_id, :id_, :name, :suite, :status, :message, :elapsed, :vm_size, "
+    ":image, :information, :log_file, :time)"
+)
+
+
+@dataclass_json()
+@dataclass
+class JsonLinesSchema(schema.Notifier):
+    path: str = "lisa.jsonl"
+    # the path of SQLite database. If it's empty, the database is not used. The
+    # database can be shared by runs, and results are identified by run id.
+    database: str = ""
+
+
+class JsonLines(Notifier):
+    """
+    It streams test run and test result messages to a JSON lines file, and
+    optionally a SQLite database. Messages are written in batches, and nothing
+    is kept in memory, so it fits runs with many results. Both can be queried
+    when the run is in progress.
+    """
+
+    @classmethod
+    def type_name(cls) -> str:
+        return "jsonl"
+
+    @classmethod
+    def type_schema(cls) -> Type[schema.TypedSchema]:
+        return JsonLinesSchema
+
+    def finalize(self) -> None:
+        self._file.close()
+        self._log.info(f"results: {self._path}")
+        if self._connection:
+            self._connection.close()
+            self._log.info(f"results database: {self._database_path}")
+
+    def _received_message(self, message: MessageBase) -> None:
+        self._received_messages([message])
+
+    def _received_messages(self, messages: List[MessageBase]) -> None:
+        records = [self._to_record(x) for x in messages]
+        for record in records:
+            self._file.write(json.dumps(record, default=str) + "\n")
+        self._file.flush()
+
+        if self._connection:
+            run_records = [x for x in records if x["type"] == TestRunMessage.type]
+            result_records = [
+                self._to_result_row(x)
+                for x in records
+                if x["type"] == TestResultMessage.type
+            ]
+            # commit once for a batch.
+            with self._connection:
+                if run_records:
+                    self._connection.executemany(
+                        _UPSERT_RUN, [self._to_run_row(x) for x in run_records]
+                    )
+                if result_records:
+                    self._connection.executemany(_UPSERT_RESULT, result_records)
+
+    def _subscribed_message_type(self) -> List[Type[MessageBase]]:
+        return [TestResultMessage, TestRunMessage]
+
+    def _initialize(self, *args: Any, **kwargs: Any) -> None:
+        runbook = cast(JsonLinesSchema, self.runbook)
+        self._path = constants.RUN_LOCAL_PATH / runbook.path
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        self._file: TextIO = open(self._path, "a", encoding="utf-8")
+
+        self._connection: Optional[sqlite3.Connection] = None
+        if runbook.database:
+            self._database_path = constants.RUN_LOCAL_PATH / runbook.database
+            self._connection = self._connect(self._database_path)
+
+    def _connect(self, path: Path) -> sqlite3.Connection:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # messages are written by the thread of notifier.
+        connection = sqlite3.connect(str(path), check_same_thread=False)
+        # readers don't block the writer in WAL mode, so it can be queried
+        # during running.
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        with connection:
+            for statement in _CREATE_TABLES:
+                connection.execute(statement)
+        return connection
+
+    def _to_record(self, message: MessageBase) -> Dict[str, Any]:
+        record: Dict[str, Any] = {
+            "run_id": constants.RUN_ID,
+            "time": datetime.now().isoformat(),
+        }
+        for key, value in dataclasses.asdict(message).items():
+            record[key] = value.name if isinstance(value, Enum) else value
+        return record
+
+    def _to_run_row(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        row = dict(record)
+        # it's null, if tags are not set, so it doesn't overwrite.
+        row["tags"] = json.dumps(record["tags"]) if record["tags"] else None
+        return row
+
+    def _to_result_row(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        information: Dict[str, Any] = record["information"]
+        row = dict(record)
+        # the name is in format of suite.case.
+        row["suite"] = record["name"].split(".")[0]
+        row["vm_size"] = information.get("vmsize", "")
+        row["image"] = information.get("image", "")
+        row["information"] = json.dumps(information, default=str)
+        return row
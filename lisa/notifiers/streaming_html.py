@@ -0,0 +1,201 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+import html
+import json
+from dataclasses import dataclass
+from typing import Any, Dict, List, TextIO, Type, cast
+
+from dataclasses_json import dataclass_json
+
+from lisa import schema
+from lisa.notifier import MessageBase, Notifier, TestRunMessage
+from lisa.testsuite import TestResultMessage, TestStatus
+from lisa.util import constants
+
+# The page is appended by script elements, which add data to the page. The end
+# tags of body and html are optional, so the file is valid after each append.
+# The results are indexed by status, and rendered page by page in browser.
+_HEADER = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<style>
+body {{ font-family: sans-serif; margin: 20px; }}
+table {{ border-collapse: collapse; width: 100%; }}
+th, td {{ border: 1px solid #ccc; padding: 4px; text-align: left;
+  vertical-align: top; }}
+td pre {{ margin: 0; white-space: pre-wrap; }}
+.PASSED {{ color: green; }} .FAILED {{ color: red; }}
+.SKIPPED, .ATTEMPTED {{ color: orange; }}
+</style>
+<script>
+var run = {{}};
+var results = [];
+var index = {{"": []}};
+var page = 0;
+var pageSize = 100;
+var selectedStatus = "";
+var pending = false;
+function t(message) {{
+  for (var key in message) {{ run[key] = message[key]; }}
+  schedule();
+}}
+function r(message) {{
+  var position = results.length;
+  results.push(message);
+  index[""].push(position);
+  (index[message.status] = index[message.status] || []).push(position);
+  schedule();
+}}
+function schedule() {{
+  if (!pending) {{ pending = true; setTimeout(render, 0); }}
+}}
+function cell(row, text, className) {{
+  var element = row.insertCell();
+  var pre = document.createElement("pre");
+  pre.textContent = text;
+  element.appendChild(pre);
+  if (className) {{ element.className = className; }}
+}}
+function select(value) {{ selectedStatus = value; page = 0; render(); }}
+function move(step) {{ page += step; render(); }}
+function render() {{
+  pending = false;
+  if (!document.getElementById("results")) {{ return; }}
+  document.getElementById("run").textContent = [run.run_name,
+    run.test_project, run.test_pass, run.status].filter(Boolean).join(" | ");
+  var summary = document.getElementById("summary");
+  summary.innerHTML = "";
+  for (var key in index) {{
+    var link = document.createElement("button");
+    link.textContent = (key || "ALL") + ": " + index[key].length;
+    link.className = key;
+    link.onclick = select.bind(null, key);
+    summary.appendChild(link);
+  }}
+  var positions = index[selectedStatus] || [];
+  var pageCount = Math.max(1, Math.ceil(positions.length / pageSize));
+  page = Math.min(Math.max(page, 0), pageCount - 1);
+  document.getElementById("page").textContent =
+    "page " + (page + 1) + " / " + pageCount;
+  var body = document.getElementById("results").tBodies[0];
+  body.innerHTML = "";
+  var start = page * pageSize;
+  positions.slice(start, start + pageSize).forEach(function (position) {{
+    var result = results[position];
+    var row = body.insertRow();
+    cell(row, result.name);
+    cell(row, result.status, result.status);
+    cell(row, result.elapsed.toFixed(3));
+    cell(row, result.message);
+    cell(row, Object.keys(result.information).map(function (key) {{
+      return key + ": " + result.information[key];
+    }}).join("\\n"));
+  }});
+}}
+document.addEventListener("DOMContentLoaded", render);
+</script>
+</head>
+<body>
+<h1>{title}</h1>
+<div id="run"></div>
+<p id="summary"></p>
+<p>
+<button onclick="move(-1)">previous</button>
+<span id="page"></span>
+<button onclick="move(1)">next</button>
+</p>
+<table id="results">
+<thead><tr><th>name</th><th>status</th><th>elapsed</th><th>message</th>
+<th>information</th></tr></thead>
+<tbody></tbody>
+</table>
+"""
+
+_COMPLETED_STATUSES = [
+    TestStatus.FAILED,
+    TestStatus.PASSED,
+    TestStatus.SKIPPED,
+    TestStatus.ATTEMPTED,
+]
+
+
+@dataclass_json()
+@dataclass
+class StreamingHtmlSchema(schema.Notifier):
+    path: str = "report.html"
+
+
+class StreamingHtml(Notifier):
+    """
+    It writes a html report, which is appended when results complete. Unlike
+    the html notifier, the report is valid during running, or if the run crashes,
+    and results are not kept in memory.
+    """
+
+    @classmethod
+    def type_name(cls) -> str:
+        return "streaming_html"
+
+    @classmethod
+    def type_schema(cls) -> Type[schema.TypedSchema]:
+        return StreamingHtmlSchema
+
+    def finalize(self) -> None:
+        self._file.close()
+        self._log.info(f"report: {self._path}, summary: {self._summary}")
+
+    def _received_message(self, message: MessageBase) -> None:
+        self._received_messages([message])
+
+    def _received_messages(self, messages: List[MessageBase]) -> None:
+        for message in messages:
+            if isinstance(message, TestRunMessage):
+                # later messages may not have all fields, so keep set ones.
+                information = {
+                    "run_name": message.run_name,
+                    "test_project": message.test_project,
+                    "test_pass": message.test_pass,
+                    "status": message.status.name,
+                }
+                self._append(
+                    "t", {key: value for key, value in information.items() if value}
+                )
+            elif (
+                isinstance(message, TestResultMessage)
+                and message.status in _COMPLETED_STATUSES
+            ):
+                self._append(
+                    "r",
+                    {
+                        "name": message.name,
+                        "status": message.status.name,
+                        "elapsed": message.elapsed,
+                        "message": message.message,
+                        "information": message.information,
+                    },
+                )
+                status = message.status.name
+                self._summary[status] = self._summary.get(status, 0) + 1
+        # it's a checkpoint, the report is valid on disk.
+        self._file.flush()
+
+    def _subscribed_message_type(self) -> List[Type[MessageBase]]:
+        return [TestResultMessage, TestRunMessage]
+
+    def _initialize(self, *args: Any, **kwargs: Any) -> None:
+        runbook = cast(StreamingHtmlSchema, self.runbook)
+        self._path = constants.RUN_LOCAL_PATH / runbook.path
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        self._summary: Dict[str, int] = {}
+        self._file: TextIO = open(self._path, "w", encoding="utf-8")
+        self._file.write(_HEADER.format(title=html.escape(constants.RUN_NAME)))
+        self._file.flush()
+
+    def _append(self, function: str, data: Dict[str, Any]) -> None:
+        # "<" is in strings of json only. Escape it, so the content cannot close
+        # the script element.
+        content = json.dumps(data, default=str).replace("<", "\\u003c")
+        self._file.write(f"<script>{function}({content})</script>\n")
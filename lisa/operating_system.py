@@ -3,7 +3,7 @@
 
 import re
 import time
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass
 from functools import partial
 from typing import TYPE_CHECKING, Any, Iterable, List, Optional, Pattern, Type, Union
 
@@ -118,6 +118,19 @@ class OperatingSystem:
         log.debug(f"detected OS: '{result.name}' by pattern '{detected_info}'")
         return result
 
+    @classmethod
+    def create_by_type_name(cls, node: "Node", type_name: str) -> Any:
+        """
+        Create the OS by a known type name, like cached facts. It skips the
+        detection.
+        """
+        if type_name == Windows.__name__:
+            return Windows(node)
+        if cls.__posix_factory is None:
+            cls.__posix_factory = Factory[Posix](Posix)
+            cls.__posix_factory.initialize()
+        return cls.__posix_factory.create_by_type_name(type_name, node=node)
+
     @property
     def is_windows(self) -> bool:
         return not self._is_posix
@@ -129,7 +142,20 @@ class OperatingSystem:
     @property
     def information(self) -> OsInformation:
         if not self._information:
-            self._information = self._get_information()
+            facts = self._node.facts
+            if facts and facts.os_information:
+                information = dict(facts.os_information)
+                self._information = OsInformation(
+                    version=self._parse_version(information.pop("version")),
+                    **information,
+                )
+            else:
+                self._information = self._get_information()
+                if facts:
+                    facts.os_information = {
+                        key: str(value)
+                        for key, value in asdict(self._information).items()
+                    }
             self._log.debug(f"parsed os information: {self._information}")
 
         return self._information
@@ -141,41 +167,61 @@ class OperatingSystem:
     @classmethod
     def _get_detect_string(cls, node: Any) -> Iterable[str]:
         typed_node: Node = node
-        cmd_result = typed_node.execute(cmd="lsb_release -d", no_error_log=True)
-        yield get_matched_str(cmd_result.stdout, cls.__lsb_release_pattern)
+        # note, cat /etc/*release doesn't work in some images, so try them one by
+        # one. They are sent in one batch to save round trips.
+        (
+            cmd_result_lsb_release,
+            cmd_result_os_release,
+            cmd_result_redhat_release,
+            cmd_result_uname,
+            cmd_result_issue,
+            cmd_result_release,
+            cmd_result_lsb_release_file,
+            cmd_result_suse_release,
+        ) = typed_node.execute_batch(
+            [
+                "lsb_release -d",
+                "cat /etc/os-release",
+                # for RedHat, CentOS 6.x
+                "cat /etc/redhat-release",
+                # for FreeBSD
+                "uname",
+                # for Debian
+                "cat /etc/issue",
+                # try best for other distros, like Sapphire
+                "cat /etc/release",
+                # try best for other distros, like VeloCloud
+                "cat /etc/lsb-release",
+                # try best for some suse derives, like netiq
+                "cat /etc/SuSE-release",
+            ],
+            no_error_log=True,
+        )
+        yield get_matched_str(cmd_result_lsb_release.stdout, cls.__lsb_release_pattern)
 
-        cmd_result = typed_node.execute(cmd="cat /etc/os-release", no_error_log=True)
-        yield get_matched_str(cmd_result.stdout, cls.__os_release_pattern_name)
-        yield get_matched_str(cmd_result.stdout, cls.__os_release_pattern_id)
-        cmd_result_os_release = cmd_result
+        yield get_matched_str(
+            cmd_result_os_release.stdout, cls.__os_release_pattern_name
+        )
+        yield get_matched_str(cmd_result_os_release.stdout, cls.__os_release_pattern_id)
 
-        # for RedHat, CentOS 6.x
-        cmd_result = typed_node.execute(
-            cmd="cat /etc/redhat-release", no_error_log=True
+        yield get_matched_str(
+            cmd_result_redhat_release.stdout, cls.__redhat_release_pattern_header
+        )
+        yield get_matched_str(
+            cmd_result_redhat_release.stdout, cls.__redhat_release_pattern_bracket
         )
-        yield get_matched_str(cmd_result.stdout, cls.__redhat_release_pattern_header)
-        yield get_matched_str(cmd_result.stdout, cls.__redhat_release_pattern_bracket)
 
-        # for FreeBSD
-        cmd_result = typed_node.execute(cmd="uname", no_error_log=True)
-        yield cmd_result.stdout
+        yield cmd_result_uname.stdout
 
-        # for Debian
-        cmd_result = typed_node.execute(cmd="cat /etc/issue", no_error_log=True)
-        yield get_matched_str(cmd_result.stdout, cls.__debian_issue_pattern)
+        yield get_matched_str(cmd_result_issue.stdout, cls.__debian_issue_pattern)
 
-        # note, cat /etc/*release doesn't work in some images, so try them one by one
-        # try best for other distros, like Sapphire
-        cmd_result = typed_node.execute(cmd="cat /etc/release", no_error_log=True)
-        yield get_matched_str(cmd_result.stdout, cls.__release_pattern)
+        yield get_matched_str(cmd_result_release.stdout, cls.__release_pattern)
 
-        # try best for other distros, like VeloCloud
-        cmd_result = typed_node.execute(cmd="cat /etc/lsb-release", no_error_log=True)
-        yield get_matched_str(cmd_result.stdout, cls.__release_pattern)
+        yield get_matched_str(cmd_result_lsb_release_file.stdout, cls.__release_pattern)
 
-        # try best for some suse derives, like netiq
-        cmd_result = typed_node.execute(cmd="cat /etc/SuSE-release", no_error_log=True)
-        yield get_matched_str(cmd_result.stdout, cls.__suse_release_pattern)
+        yield get_matched_str(
+            cmd_result_suse_release.stdout, cls.__suse_release_pattern
+        )
 
         # try best from distros'family through ID_LIKE
         yield get_matched_str(
@@ -32,6 +32,16 @@ def support_debug(parser: ArgumentParser) -> None:
     )
 
 
+def support_async_log(parser: ArgumentParser) -> None:
+    parser.add_argument(
+        "--async-log",
+        dest="async_log",
+        action="store_true",
+        help="Write logs on a dedicated thread. Secrets masking, formatting and "
+        "file writing are moved out of the threads, which run tests.",
+    )
+
+
 def support_variable(parser: ArgumentParser) -> None:
     parser.add_argument(
         "--variable",
@@ -45,12 +55,25 @@ def support_variable(parser: ArgumentParser) -> None:
     )
 
 
+def support_resume(parser: ArgumentParser) -> None:
+    parser.add_argument(
+        "--resume",
+        dest="resume",
+        type=Path,
+        help="Specify the local path of a previous run. Completed test cases in "
+        "the run are skipped, and deployed environments are re-attached, if the "
+        "platform supports it.",
+    )
+
+
 def parse_args() -> Namespace:
     """This wraps Python's 'ArgumentParser' to setup our CLI."""
     parser = ArgumentParser(prog="lisa")
     support_debug(parser)
+    support_async_log(parser)
     support_runbook(parser, required=False)
     support_variable(parser)
+    support_resume(parser)
 
     # Default to ‘run’ when no subcommand is given.
     parser.set_defaults(func=commands.run)
@@ -60,6 +83,7 @@ def parse_args() -> Namespace:
     # Entry point for ‘run’.
     run_parser = subparsers.add_parser("run")
     run_parser.set_defaults(func=commands.run)
+    support_resume(run_parser)
 
     # Entry point for ‘list-start’.
     list_parser = subparsers.add_parser(constants.LIST)
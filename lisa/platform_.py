@@ -3,12 +3,14 @@
 
 from __future__ import annotations
 
+import hashlib
+import json
 from dataclasses import dataclass
 from enum import Enum
 from functools import partial
-from typing import Any, Dict, List, Type, cast
+from typing import Any, ClassVar, Dict, List, Type, cast
 
-from lisa import schema
+from lisa import environment_pool, schema
 from lisa.environment import Environment, EnvironmentStatus
 from lisa.feature import Feature, Features
 from lisa.node import RemoteNode
@@ -17,8 +19,11 @@ from lisa.parameter_parser.runbook import RunbookBuilder
 from lisa.util import (
     InitializableMixin,
     LisaException,
+    artifact_cache,
+    checkpoint,
     constants,
     hookimpl,
+    node_facts,
     plugin_manager,
     subclasses,
 )
@@ -37,6 +42,7 @@ PlatformStatus = Enum(
 
 @dataclass
 class PlatformMessage(MessageBase):
+    is_debug: ClassVar[bool] = True
     type: str = "Platform"
     name: str = ""
     status: PlatformStatus = PlatformStatus.INITIALIZED
@@ -52,6 +58,17 @@ class Platform(subclasses.BaseClassWithRunbookMixin, InitializableMixin):
         self._log = get_logger("", self.type_name())
         plugin_manager.register(self)
 
+        if runbook.node_facts_cache_ttl:
+            node_facts.enable_cache(runbook.node_facts_cache_ttl)
+        if runbook.artifact_cache_ttl:
+            artifact_cache.enable_cache(runbook.artifact_cache_ttl)
+        if runbook.environment_pool_ttl:
+            environment_pool.enable_pool(
+                ttl=runbook.environment_pool_ttl,
+                max_idle=runbook.environment_pool_max_idle,
+                reset=runbook.environment_pool_reset,
+            )
+
     @classmethod
     def type_schema(cls) -> Type[schema.TypedSchema]:
         return schema.Platform
@@ -97,6 +114,32 @@ class Platform(subclasses.BaseClassWithRunbookMixin, InitializableMixin):
     def _get_environment_information(self, environment: Environment) -> Dict[str, str]:
         return {}
 
+    def _get_environment_checkpoint(self, environment: Environment) -> Dict[str, Any]:
+        """
+        Return the data to re-attach a deployed environment, if the run is
+        resumed. Empty means it cannot be re-attached.
+        """
+        return {}
+
+    def _get_environment_settings(self, environment: Environment) -> Dict[str, Any]:
+        """
+        Return settings of a prepared environment, which are chosen by the
+        platform and not in the node requirement, like vm sizes and locations.
+        Deployed environments are re-attached only if the settings are the same.
+        """
+        return {}
+
+    def _reattach_environment(
+        self, environment: Environment, data: Dict[str, Any], log: Logger
+    ) -> bool:
+        """
+        Re-attach a deployed environment of a previous run by its checkpoint data,
+        instead of deploying a new one.
+
+        return True, if it's re-attached. False, if it doesn't exist anymore.
+        """
+        return False
+
     @hookimpl
     def get_environment_information(self, environment: Environment) -> Dict[str, str]:
         information: Dict[str, str] = {}
@@ -154,7 +197,21 @@ class Platform(subclasses.BaseClassWithRunbookMixin, InitializableMixin):
         log.info(f"deploying environment: {environment.name}")
         timer = create_timer()
         environment.platform = self
-        self._deploy_environment(environment, log)
+        run_checkpoint = checkpoint.get_checkpoint()
+        if run_checkpoint:
+            requirement = self._get_environment_requirement(environment)
+            data = run_checkpoint.take_environment(requirement)
+            if data and self._reattach_environment(environment, data, log):
+                log.info(f"re-attached deployed environment: {data}")
+            else:
+                if data:
+                    run_checkpoint.remove_environment(data)
+                self._deploy_environment(environment, log)
+            data = self._get_environment_checkpoint(environment)
+            if data:
+                run_checkpoint.add_environment(requirement, data)
+        else:
+            self._deploy_environment(environment, log)
         environment.status = EnvironmentStatus.Deployed
 
         # initialize features
@@ -169,8 +226,31 @@ class Platform(subclasses.BaseClassWithRunbookMixin, InitializableMixin):
         environment.close()
         environment.status = EnvironmentStatus.Deleted
         self._delete_environment(environment, log)
+        run_checkpoint = checkpoint.get_checkpoint()
+        if run_checkpoint:
+            data = self._get_environment_checkpoint(environment)
+            if data:
+                run_checkpoint.remove_environment(data)
         log.debug("deleted")
 
+    def _get_environment_requirement(self, environment: Environment) -> str:
+        # environments are re-attached by requirements, because names of
+        # generated environments may be different in the resumed run. The
+        # platform runbook is included, so changed settings like images don't
+        # reuse environments of the previous run. It's hashed, so credentials
+        # in it aren't saved.
+        nodes_requirement = environment.runbook.nodes_requirement or []
+        content = json.dumps(
+            {
+                "platform": self.runbook.to_dict(),
+                "nodes": [x.to_dict() for x in nodes_requirement],  # type: ignore
+                "settings": self._get_environment_settings(environment),
+            },
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
 
 def load_platform(platforms_runbook: List[schema.Platform]) -> Platform:
     log = _get_init_logger()
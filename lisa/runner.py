@@ -2,22 +2,56 @@
 # Licensed under the MIT license.
 
 import copy
+import multiprocessing
+import time
 from logging import FileHandler
+from multiprocessing.synchronize import Event
 from pathlib import Path
-from threading import Lock
-from typing import Any, Callable, Dict, Iterator, List, Optional
+from queue import Empty
+from threading import Lock, Thread
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 
-from lisa import notifier, schema, transformer
+from lisa import environment, environment_pool, notifier, schema, transformer
 from lisa.action import Action
 from lisa.combinator import Combinator
 from lisa.parameter_parser.runbook import RunbookBuilder
-from lisa.testsuite import TestResult, TestStatus
-from lisa.util import BaseClassMixin, InitializableMixin, constants
-from lisa.util.logger import create_file_handler, get_logger, remove_handler
+from lisa.testsuite import TestResult, TestResultMessage, TestStatus
+from lisa.util import BaseClassMixin, InitializableMixin, LisaException, constants
+from lisa.util.logger import (
+    Logger,
+    create_file_handler,
+    disable_queued_writer,
+    get_logger,
+    remove_handler,
+)
 from lisa.util.parallel import TaskManager, cancel, set_global_task_manager
 from lisa.util.subclasses import Factory
 from lisa.variable import VariableEntry, get_case_variables, replace_variables
 
+# the kinds of items, which are sent from shard processes to the coordinator.
+_SHARD_MESSAGE = "message"
+_SHARD_DONE = "done"
+_SHARD_ERROR = "error"
+# seconds to wait shard processes exiting, before terminating them.
+_SHARD_EXIT_TIMEOUT = 60
+# seconds to check the cancel event in shard processes.
+_SHARD_CANCEL_INTERVAL = 1
+# environment ids of a shard start from its index times the stride, so ids and
+# names of environments, like names of resource groups, are unique in shards.
+_SHARD_ENVIRONMENT_ID_STRIDE = 100000
+
+
+def split_concurrency(concurrency: int, shard_count: int) -> List[int]:
+    """
+    Split the concurrency to shards, so the total is the same. Each shard has 1
+    at least, so the shard count is not more than the concurrency.
+    """
+    shard_count = max(1, min(shard_count, concurrency))
+    return [
+        concurrency // shard_count + (1 if index < concurrency % shard_count else 0)
+        for index in range(shard_count)
+    ]
+
 
 def parse_testcase_filters(raw_filters: List[Any]) -> List[schema.BaseTestCaseFilter]:
     if raw_filters:
@@ -33,6 +67,76 @@ def parse_testcase_filters(raw_filters: List[Any]) -> List[schema.BaseTestCaseFi
     return filters
 
 
+class _ShardReceiver:
+    """
+    It receives items from shard processes, and tracks running shards.
+    """
+
+    def __init__(
+        self,
+        queue: "multiprocessing.Queue[Tuple[str, int, Any]]",
+        processes: List[Any],
+        cancel_event: Event,
+        log: Logger,
+    ) -> None:
+        self._queue = queue
+        self._processes = processes
+        self._cancel_event = cancel_event
+        self._log = log
+        self.messages: Dict[str, TestResultMessage] = {}
+        self.errors: List[str] = []
+        self.running_shards = set(range(len(processes)))
+
+    def receive(self, timeout: float) -> None:
+        try:
+            kind, index, data = self._queue.get(timeout=timeout)
+        except Empty:
+            self._check_exited_shards()
+            return
+        self._receive(kind, index, data)
+
+    def _receive(self, kind: str, index: int, data: Any) -> None:
+        if kind == _SHARD_MESSAGE:
+            # ids are unique in a shard only.
+            data.id_ = f"shard_{index}_{data.id_}"
+            self.messages[data.id_] = data
+            notifier.notify(data)
+        elif kind == _SHARD_DONE:
+            self.running_shards.discard(index)
+        elif kind == _SHARD_ERROR:
+            self._fail(index, str(data))
+
+    def _check_exited_shards(self) -> None:
+        exited_shards = [
+            x for x in self.running_shards if not self._processes[x].is_alive()
+        ]
+        if not exited_shards:
+            return
+        # shards put all items before exiting, so read remaining items of exited
+        # shards, before checking whether they are done.
+        while True:
+            try:
+                kind, index, data = self._queue.get_nowait()
+            except Empty:
+                break
+            self._receive(kind, index, data)
+        for index in exited_shards:
+            if index not in self.running_shards:
+                continue
+            exit_code = self._processes[index].exitcode
+            if exit_code:
+                self._fail(index, f"exited with code {exit_code}")
+            else:
+                self._log.debug(f"shard {index} exited without done message")
+                self.running_shards.remove(index)
+
+    def _fail(self, index: int, error: str) -> None:
+        self.errors.append(f"shard {index}: {error}")
+        self.running_shards.discard(index)
+        # other shards are cancelled.
+        self._cancel_event.set()
+
+
 class BaseRunner(BaseClassMixin, InitializableMixin):
     """
     Base runner of other runners. And other runners derived from this one.
@@ -52,6 +156,14 @@ class BaseRunner(BaseClassMixin, InitializableMixin):
         self._log_handler: Optional[FileHandler] = None
         self._case_variables = case_variables
         self.canceled = False
+        # the runner runs a part of test cases, if it's in a shard process.
+        self.shard_index = 0
+        self.shard_count = 1
+        # the index and variables of the combinator iteration, which identify
+        # test results with the same name across iterations. The index is
+        # counted in all shards, so it doesn't change with the shard count.
+        self.iteration = 0
+        self.iteration_variables: Dict[str, Any] = {}
 
     def __repr__(self) -> str:
         return self.id
@@ -104,6 +216,9 @@ class RootRunner(Action):
         self._runners: List[BaseRunner] = []
         self._results: List[TestResult] = []
         self._results_lock: Lock = Lock()
+        # it's set in shard processes.
+        self._shard_index = 0
+        self._shard_count = 1
 
     async def start(self) -> None:
         await super().start()
@@ -122,18 +237,26 @@ class RootRunner(Action):
             self._max_concurrency = runbook.concurrency
             self._log.debug(f"max concurrency is {self._max_concurrency}")
 
-            self._start_loop()
+            if runbook.shard_count > 1:
+                self._check_shard_environments(runbook)
+                shard_messages = self._start_shards(runbook.shard_count)
+                summary = [(x.name, x.status, x.message) for x in shard_messages]
+            else:
+                self._start_loop()
+                summary = [
+                    (x.runtime_data.metadata.full_name, x.status, x.message)
+                    for x in self._results
+                ]
         except Exception as identifer:
             cancel()
             raise identifer
         finally:
-            for runner in self._runners:
-                runner.close()
+            self._close_runners()
 
-        self._output_results(self._results)
+        self._output_results(summary)
 
         # pass failed count to exit code
-        self.exit_code = sum(1 for x in self._results if x.status == TestStatus.FAILED)
+        self.exit_code = sum(1 for x in summary if x[1] == TestStatus.FAILED)
 
     async def stop(self) -> None:
         await super().stop()
@@ -142,6 +265,94 @@ class RootRunner(Action):
     async def close(self) -> None:
         await super().close()
 
+    def _close_runners(self) -> None:
+        for runner in self._runners:
+            runner.close()
+        pool = environment_pool.get_pool()
+        if pool:
+            pool.clear()
+
+    def _start_shards(self, shard_count: int) -> List[TestResultMessage]:
+        """
+        Run shards in forked processes, and merge test result messages of them
+        to notifiers. If a shard fails, or the coordinator is interrupted, other
+        shards are cancelled.
+        """
+        concurrencies = split_concurrency(self._max_concurrency, shard_count)
+        self._log.info(
+            f"running in {len(concurrencies)} shard processes, "
+            f"concurrency: {concurrencies}"
+        )
+        context = multiprocessing.get_context("fork")
+        queue: "multiprocessing.Queue[Tuple[str, int, Any]]" = context.Queue()
+        cancel_event = context.Event()
+        processes: List[Any] = []
+        for index, concurrency in enumerate(concurrencies):
+            process = context.Process(
+                target=self._run_shard,
+                args=(index, len(concurrencies), concurrency, queue, cancel_event),
+                name=f"shard_{index}",
+            )
+            process.start()
+            processes.append(process)
+
+        receiver = _ShardReceiver(queue, processes, cancel_event, self._log)
+        try:
+            while receiver.running_shards:
+                receiver.receive(timeout=1)
+        except BaseException:
+            cancel_event.set()
+            raise
+        finally:
+            for process in processes:
+                process.join(_SHARD_EXIT_TIMEOUT)
+                if process.is_alive():
+                    process.terminate()
+        if receiver.errors:
+            raise LisaException(f"shards failed: {receiver.errors}")
+        return list(receiver.messages.values())
+
+    def _run_shard(
+        self,
+        index: int,
+        shard_count: int,
+        concurrency: int,
+        queue: "multiprocessing.Queue[Tuple[str, int, Any]]",
+        cancel_event: Event,
+    ) -> None:
+        """
+        It runs in a forked process.
+        """
+
+        def _forward(message: notifier.MessageBase) -> None:
+            # only test results are merged by the coordinator.
+            if isinstance(message, TestResultMessage):
+                queue.put((_SHARD_MESSAGE, index, message))
+
+        def _wait_cancel() -> None:
+            # don't wait on the event. If the process exits during waiting, the
+            # waiter is never woken, and setting the event blocks forever.
+            while not cancel_event.is_set():
+                time.sleep(_SHARD_CANCEL_INTERVAL)
+            cancel()
+
+        notifier.set_forward(_forward)
+        Thread(target=_wait_cancel, name="shard cancel", daemon=True).start()
+        self._shard_index = index
+        environment.set_environment_id_start(index * _SHARD_ENVIRONMENT_ID_STRIDE)
+        self._shard_count = shard_count
+        self._max_concurrency = concurrency
+        try:
+            self._start_loop()
+            queue.put((_SHARD_DONE, index, None))
+        except BaseException as identifier:
+            self._log.exception(f"shard {index} failed", exc_info=identifier)
+            queue.put((_SHARD_ERROR, index, str(identifier)))
+        finally:
+            self._close_runners()
+            # the process exits without exit handlers, so write queued logs.
+            disable_queued_writer()
+
     def _fetch_runners(self) -> Iterator[BaseRunner]:
         root_runbook = self._runbook_builder.resolve(self._runbook_builder.variables)
 
@@ -154,23 +365,44 @@ class RootRunner(Action):
                 f"found combinator '{combinator.type_name()}', to expand runbook."
             )
             combinator.initialize()
+            iteration = -1
             while True:
                 variables = combinator.fetch(self._runbook_builder.variables)
                 if variables is None:
                     break
+                iteration += 1
+                # iterations are split into shards.
+                if iteration % self._shard_count != self._shard_index:
+                    continue
                 sub_runbook = self._runbook_builder.resolve(variables)
-                runners = self._generate_runners(sub_runbook, variables)
+                iteration_variables = {
+                    name: value.data
+                    for name, value in variables.items()
+                    if self._runbook_builder.variables.get(name, None) is not value
+                }
+                runners = self._generate_runners(
+                    sub_runbook,
+                    variables,
+                    iteration=iteration,
+                    iteration_variables=iteration_variables,
+                )
                 for runner in runners:
                     yield runner
         else:
-            # no combinator, use the root runbook
+            # no combinator, use the root runbook, and test cases are split into
+            # shards.
             for runner in self._generate_runners(
-                root_runbook, self._runbook_builder.variables
+                root_runbook, self._runbook_builder.variables, shard_cases=True
             ):
                 yield runner
 
     def _generate_runners(
-        self, runbook: schema.Runbook, variables: Dict[str, VariableEntry]
+        self,
+        runbook: schema.Runbook,
+        variables: Dict[str, VariableEntry],
+        shard_cases: bool = False,
+        iteration: int = 0,
+        iteration_variables: Optional[Dict[str, Any]] = None,
     ) -> Iterator[BaseRunner]:
         # group filters by runner type
         case_variables = get_case_variables(variables)
@@ -188,9 +420,20 @@ class RootRunner(Action):
             else:
                 self._log.debug(f"Skip disabled filter: {raw_filter}.")
 
+        if shard_cases:
+            self._split_shard_environments(runbook)
+
         # initialize runners
         factory = Factory[BaseRunner](BaseRunner)
         for runner_name, raw_filters in runner_filters.items():
+            if (
+                shard_cases
+                and self._shard_index > 0
+                and runner_name != constants.TESTCASE_TYPE_LISA
+            ):
+                # only lisa runner can split test cases, others run in the first
+                # shard.
+                continue
             self._log.debug(
                 f"create runner {runner_name} with {len(raw_filters)} filter(s)."
             )
@@ -203,21 +446,54 @@ class RootRunner(Action):
                 index=len(self._runners),
                 case_variables=case_variables,
             )
+            if shard_cases and runner_name == constants.TESTCASE_TYPE_LISA:
+                runner.shard_index = self._shard_index
+                runner.shard_count = self._shard_count
+            runner.iteration = iteration
+            if iteration_variables:
+                runner.iteration_variables = iteration_variables
             runner.initialize()
             self._runners.append(runner)
             yield runner
 
-    def _output_results(self, test_results: List[TestResult]) -> None:
+    def _check_shard_environments(self, runbook: schema.Runbook) -> None:
+        if runbook.combinator or not runbook.environment:
+            # iterations are split, so shards don't share environments.
+            return
+        shard_count = len(split_concurrency(runbook.concurrency, runbook.shard_count))
+        existing_count = sum(1 for x in runbook.environment.environments if x.nodes)
+        if 0 < existing_count < shard_count:
+            raise LisaException(
+                f"environments with existing nodes are split into shards, so "
+                f"their count {existing_count} cannot be less than the shard "
+                f"count {shard_count}."
+            )
+
+    def _split_shard_environments(self, runbook: schema.Runbook) -> None:
+        """
+        Environments with existing nodes are split into shards, so the nodes
+        don't run test cases of shards at the same time. Environments, which
+        are deployed by platforms, are kept in all shards.
+        """
+        if self._shard_count <= 1 or not runbook.environment:
+            return
+        environments = runbook.environment.environments
+        existing_environments = [x for x in environments if x.nodes]
+        runbook.environment.environments = [
+            x for x in environments if not x.nodes
+        ] + existing_environments[self._shard_index :: self._shard_count]
+
+    def _output_results(self, test_results: List[Tuple[str, TestStatus, str]]) -> None:
+        """
+        test_results: name, status and message of test results.
+        """
         self._log.info("________________________________________")
         result_count_dict: Dict[TestStatus, int] = {}
-        for test_result in test_results:
-            self._log.info(
-                f"{test_result.runtime_data.metadata.full_name:>50}: "
-                f"{test_result.status.name:<8} {test_result.message}"
-            )
-            result_count = result_count_dict.get(test_result.status, 0)
+        for name, status, message in test_results:
+            self._log.info(f"{name:>50}: {status.name:<8} {message}")
+            result_count = result_count_dict.get(status, 0)
             result_count += 1
-            result_count_dict[test_result.status] = result_count
+            result_count_dict[status] = result_count
 
         self._log.info("test result summary")
         self._log.info(f"    TOTAL    : {len(test_results)}")
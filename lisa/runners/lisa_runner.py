@@ -2,10 +2,13 @@
 # Licensed under the MIT license.
 
 import copy
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from functools import partial
-from typing import Any, Callable, Dict, List, Optional, cast
+from threading import Lock
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple, cast
 
-from lisa import notifier, schema, search_space
+from lisa import environment_pool, notifier, schema, search_space
 from lisa.action import ActionStatus
 from lisa.environment import (
     Environment,
@@ -22,10 +25,21 @@ from lisa.platform_ import (
 from lisa.runner import BaseRunner
 from lisa.testselector import select_testcases
 from lisa.testsuite import TestCaseRequirement, TestResult, TestStatus, TestSuite
-from lisa.util import LisaException, constants, deep_update_dict
+from lisa.util import (
+    LisaException,
+    checkpoint,
+    constants,
+    deep_update_dict,
+    duration_history,
+)
 from lisa.util.parallel import check_cancelled
 from lisa.variable import VariableEntry
 
+# the wait is bounded, so other runners can fetch tasks.
+_PREDEPLOY_WAIT_TIMEOUT = 1
+# environments, which wait for more resource, are not deployed ahead before it.
+_PREDEPLOY_RETRY_DELAY = 60
+
 
 class LisaRunner(BaseRunner):
     @classmethod
@@ -38,12 +52,39 @@ class LisaRunner(BaseRunner):
 
         # select test cases
         selected_test_cases = select_testcases(filters=self._runbook.testcase)
+        if self.shard_count > 1:
+            # split by suites, so cases of a suite can share environments.
+            suite_names = sorted({x.metadata.suite.name for x in selected_test_cases})
+            shard_suite_names = set(suite_names[self.shard_index :: self.shard_count])
+            selected_test_cases = [
+                x
+                for x in selected_test_cases
+                if x.metadata.suite.name in shard_suite_names
+            ]
 
         # create test results
         self.test_results = [
             TestResult(f"{self.id}_{index}", runtime_data=case)
             for index, case in enumerate(selected_test_cases)
         ]
+        self._resume_test_results()
+        self._duration_history: Optional[duration_history.DurationHistory] = None
+        # predicted elapsed seconds of test results, 0 means no history.
+        self._predicted_durations: Dict[int, float] = {}
+        if self._runbook.schedule_by_duration:
+            self._duration_history = duration_history.get_history()
+            for test_result in self.test_results:
+                self._predicted_durations[id(test_result)] = self._duration_history.get(
+                    test_result.runtime_data.metadata.full_name
+                )
+        self._initialize_scheduling_index()
+        # ids of environments, which are released to the environment pool.
+        self._released_environments: Set[int] = set()
+        # deployments ahead run out of the workers of test cases.
+        self._predeploy_pool: Optional[ThreadPoolExecutor] = None
+        self._predeploy_futures: List[Future[None]] = []
+        # the time to deploy ahead again, by ids of environments.
+        self._predeploy_retry_times: Dict[int, float] = {}
         # load predefined environments
         self.platform = load_platform(self._runbook.platform)
         self.platform.initialize()
@@ -52,13 +93,15 @@ class LisaRunner(BaseRunner):
 
     @property
     def is_done(self) -> bool:
-        is_all_results_completed = all(
-            result.is_completed for result in self.test_results
-        )
+        self._update_scheduling_index()
+        is_all_results_completed = not any(self._pending_results.values())
         # all environment should not be used and not be deployed.
         is_all_environment_completed = hasattr(self, "environments") and all(
             (not env.is_in_use)
-            and (env.status in [EnvironmentStatus.Prepared, EnvironmentStatus.Deleted])
+            and (
+                env.status in [EnvironmentStatus.Prepared, EnvironmentStatus.Deleted]
+                or env.id in self._released_environments
+            )
             for env in self.environments
         )
         return is_all_results_completed and is_all_environment_completed
@@ -72,21 +115,27 @@ class LisaRunner(BaseRunner):
             # return failed prepared results
             return lambda: test_results
 
+        self._update_scheduling_index()
+
+        if self._runbook.predeploy_count and any(
+            x.is_in_use for x in self.environments
+        ):
+            self._predeploy_environments()
+
         # sort environments by status
         available_environments = self._sort_environments(self.environments)
-        available_results = [x for x in self.test_results if x.can_run]
-        self._sort_test_results(available_results)
+        has_available_results = any(x.can_run for x in self._get_pending_results())
 
         # check deleteable environments
         delete_task = self._delete_unused_environments()
         if delete_task:
             return delete_task
 
-        if available_results and available_environments:
-            for priority in range(6):
-                can_run_results = self._get_results_by_priority(
-                    available_results, priority
-                )
+        if has_available_results and available_environments:
+            for priority in sorted(self._pending_results):
+                can_run_results = [
+                    x for x in self._pending_results[priority].values() if x.can_run
+                ]
                 if not can_run_results:
                     continue
 
@@ -117,18 +166,32 @@ class LisaRunner(BaseRunner):
                     skipped_test_results = self._skip_test_results(can_run_results)
                     if skipped_test_results:
                         return lambda: skipped_test_results
-        elif available_results:
+        elif has_available_results:
             # no available environments, so mark all test results skipped.
+            available_results = [x for x in self._get_pending_results() if x.can_run]
             skipped_test_results = self._skip_test_results(available_results)
 
             self.status = ActionStatus.SUCCESS
             return lambda: skipped_test_results
+
+        self._wait_predeployment()
         return None
 
     def close(self) -> None:
+        if self._predeploy_pool:
+            self._predeploy_pool.shutdown()
         if hasattr(self, "environments") and self.environments:
             for environment in self.environments:
-                self._delete_environment_task(environment, [])
+                if environment.id not in self._released_environments:
+                    self._delete_environment_task(environment, [])
+        if self._duration_history:
+            self._report_durations()
+            self._duration_history.save()
+        check_cache = search_space.get_check_cache()
+        self._log.debug(
+            f"requirement check cache: hits {check_cache.hits}, "
+            f"misses {check_cache.misses}, size {len(check_cache)}"
+        )
         super().close()
 
     def _associate_environment_test_results(
@@ -140,6 +203,15 @@ class LisaRunner(BaseRunner):
         can_run_results = test_results
         # deploy
         if environment.status == EnvironmentStatus.Prepared and can_run_results:
+            leased_environment = self._lease_environment(can_run_results)
+            if leased_environment:
+                # keep the prepared environment, in case more environments are
+                # needed.
+                if leased_environment not in self.environments:
+                    self.environments.insert(0, leased_environment)
+                return self._associate_environment_test_results(
+                    environment=leased_environment, test_results=can_run_results
+                )
             return self._generate_task(
                 task_method=self._deploy_environment_task,
                 environment=environment,
@@ -203,7 +275,7 @@ class LisaRunner(BaseRunner):
                 continue
 
             can_run_results = self._get_runnable_test_results(
-                self.test_results, environment=environment
+                self._get_pending_results(), environment=environment
             )
             if not can_run_results:
                 # no more test need this environment, delete it.
@@ -302,6 +374,114 @@ class LisaRunner(BaseRunner):
             )
             self._delete_environment_task(environment=environment, test_results=[])
 
+    def _predeploy_environments(self) -> None:
+        """
+        Deploy prepared environments, which have queued test cases, so they are
+        ready when workers are free. The environments, which are deploying or
+        deployed but not used, are limited by the predeploy count. If active
+        environments reach the concurrency, only test cases, which cannot run on
+        active environments, need more environments.
+        """
+        self._predeploy_futures = [x for x in self._predeploy_futures if not x.done()]
+        predeployed_count = len(self._predeploy_futures) + sum(
+            1
+            for x in self.environments
+            if x.status == EnvironmentStatus.Deployed and x.is_new and not x.is_in_use
+        )
+        if predeployed_count >= self._runbook.predeploy_count:
+            return
+
+        environments = self._sort_environments(self.environments)
+        active_environments = [
+            x
+            for x in environments
+            if x.is_in_use
+            or x.status in [EnvironmentStatus.Deployed, EnvironmentStatus.Connected]
+        ]
+        for environment in environments:
+            if predeployed_count >= self._runbook.predeploy_count:
+                break
+            if environment.status != EnvironmentStatus.Prepared or (
+                environment.is_in_use
+            ):
+                continue
+            if time.time() < self._predeploy_retry_times.get(environment.id, 0):
+                continue
+            pending_results = self._get_pending_results()
+            if len(active_environments) >= self._runbook.concurrency:
+                pending_results = [
+                    x
+                    for x in pending_results
+                    if not any(
+                        self._check_environment(result=x, environment=y)
+                        for y in active_environments
+                    )
+                ]
+            test_results = self._get_runnable_test_results(
+                pending_results, environment=environment
+            )
+            if not test_results:
+                continue
+
+            if not self._predeploy_pool:
+                self._predeploy_pool = ThreadPoolExecutor(
+                    max_workers=self._runbook.predeploy_count,
+                    thread_name_prefix="predeploy",
+                )
+            self._log.debug(f"deploying '{environment.name}' ahead")
+            environment.is_in_use = True
+            self._predeploy_futures.append(
+                self._predeploy_pool.submit(
+                    self._predeploy_task, environment, test_results
+                )
+            )
+            active_environments.append(environment)
+            predeployed_count += 1
+
+    def _predeploy_task(
+        self, environment: Environment, test_results: List[TestResult]
+    ) -> None:
+        try:
+            self.platform.deploy_environment(environment)
+        except WaitMoreResourceError as identifier:
+            # it's still prepared, so back off to not deploy it again at once.
+            self._predeploy_retry_times[environment.id] = (
+                time.time() + _PREDEPLOY_RETRY_DELAY
+            )
+            self._log.info(
+                f"[{environment.name}] waiting for more resource: {identifier}, "
+                f"skip deploying ahead in {_PREDEPLOY_RETRY_DELAY} seconds"
+            )
+        except Exception as identifier:
+            # attach the error as the normal deployment, so it can be tracked.
+            queued_results = [x for x in test_results if x.is_queued]
+            if queued_results:
+                self._attach_failed_environment_to_result(
+                    environment=environment,
+                    result=queued_results[0],
+                    exception=identifier,
+                )
+            else:
+                self._log.info(
+                    f"[{environment.name}] failed on deploying ahead: {identifier}"
+                )
+            self._delete_environment_task(environment=environment, test_results=[])
+        finally:
+            environment.is_in_use = False
+
+    def _wait_predeployment(self) -> None:
+        # if no other environment is in use, the deployment is on critical path,
+        # so wait it shortly instead of polling.
+        predeploy_futures = [x for x in self._predeploy_futures if not x.done()]
+        if predeploy_futures and sum(
+            1 for x in self.environments if x.is_in_use
+        ) <= len(predeploy_futures):
+            wait(
+                predeploy_futures,
+                timeout=_PREDEPLOY_WAIT_TIMEOUT,
+                return_when=FIRST_COMPLETED,
+            )
+
     def _initialize_environment_task(
         self, environment: Environment, test_results: List[TestResult]
     ) -> None:
@@ -343,6 +523,23 @@ class LisaRunner(BaseRunner):
             case_variables=case_variables,
         )
 
+    def _lease_environment(
+        self, test_results: List[TestResult]
+    ) -> Optional[Environment]:
+        pool = environment_pool.get_pool()
+        if not pool:
+            return None
+        environment = pool.lease(
+            self.platform,
+            lambda x: bool(
+                self._get_runnable_test_results(test_results, environment=x)
+            ),
+        )
+        if environment:
+            # it may be released by this runner before.
+            self._released_environments.discard(environment.id)
+        return environment
+
     def _delete_environment_task(
         self, environment: Environment, test_results: List[TestResult]
     ) -> None:
@@ -360,22 +557,14 @@ class LisaRunner(BaseRunner):
         ) or (
             environment.status == EnvironmentStatus.Prepared and environment.is_in_use
         ):
-            self.platform.delete_environment(environment)
+            pool = environment_pool.get_pool()
+            if pool and pool.release(environment):
+                self._released_environments.add(environment.id)
+            else:
+                self.platform.delete_environment(environment)
         else:
             environment.status = EnvironmentStatus.Deleted
 
-    def _get_results_by_priority(
-        self, test_results: List[TestResult], priority: int
-    ) -> List[TestResult]:
-        if not test_results:
-            return []
-
-        test_results = [
-            x for x in test_results if x.runtime_data.metadata.priority == priority
-        ]
-
-        return test_results
-
     def _generate_task(
         self,
         task_method: Callable[..., None],
@@ -458,7 +647,7 @@ class LisaRunner(BaseRunner):
             results = [
                 x
                 for x in results
-                if x.check_environment(environment=environment, save_reason=True)
+                if self._check_environment(result=x, environment=environment)
                 and (not x.runtime_data.use_new_environment or environment.is_new)
             ]
 
@@ -512,6 +701,142 @@ class LisaRunner(BaseRunner):
 
         return to_run_results
 
+    def _initialize_scheduling_index(self) -> None:
+        """
+        Build queues of not completed results by priority. The queues are
+        sorted once, and then updated by status changes of test results, so
+        fetching a task doesn't need to rescan all results.
+        """
+        self._pending_results: Dict[int, Dict[int, TestResult]] = {}
+        # results are changed by worker threads, so they are recorded here and
+        # applied to queues in the thread, which fetches tasks.
+        self._changed_results: Set[int] = set()
+        self._changed_results_lock = Lock()
+        # cache of matching between results and environments. The capability of
+        # an environment is different by its status, so status is a part of key.
+        self._environment_fit_cache: Dict[
+            Tuple[int, EnvironmentStatus], Dict[int, bool]
+        ] = {}
+
+        for test_result in self._sort_test_results(self.test_results):
+            if not test_result.is_completed:
+                priority = test_result.runtime_data.metadata.priority
+                results = self._pending_results.setdefault(priority, {})
+                results[id(test_result)] = test_result
+            test_result.add_status_listener(self._on_result_status_changed)
+
+    def _resume_test_results(self) -> None:
+        # keys identify test results across runs, so a resumed run can skip
+        # completed ones. Runner ids are not used, because they are counted in
+        # each shard.
+        self._checkpoint_keys: Dict[int, str] = {}
+        name_counts: Dict[str, int] = {}
+        for test_result in self.test_results:
+            name = test_result.runtime_data.metadata.full_name
+            name_count = name_counts.get(name, 0)
+            name_counts[name] = name_count + 1
+            key = f"{self.iteration}/{name}/{name_count}"
+            self._checkpoint_keys[id(test_result)] = key
+
+        run_checkpoint = checkpoint.get_checkpoint()
+        if not run_checkpoint:
+            return
+        resumed_count = 0
+        for test_result in self.test_results:
+            key = self._checkpoint_keys[id(test_result)]
+            record = run_checkpoint.get_result(key, self.iteration_variables)
+            if record:
+                test_result.set_status(TestStatus[record["status"]], record["message"])
+                run_checkpoint.add_result(
+                    key, self.iteration_variables, record["status"], record["message"]
+                )
+                resumed_count += 1
+        if resumed_count:
+            self._log.info(f"skipped {resumed_count} test results completed already")
+
+    def _on_result_status_changed(self, test_result: TestResult) -> None:
+        # May be called async
+        if test_result.is_completed:
+            with self._changed_results_lock:
+                self._changed_results.add(id(test_result))
+            run_checkpoint = checkpoint.get_checkpoint()
+            if run_checkpoint:
+                run_checkpoint.add_result(
+                    self._checkpoint_keys[id(test_result)],
+                    self.iteration_variables,
+                    test_result.status.name,
+                    test_result.message,
+                )
+            if (
+                self._duration_history
+                and test_result.status in [TestStatus.PASSED, TestStatus.FAILED]
+                and test_result.elapsed
+            ):
+                self._duration_history.add(
+                    test_result.runtime_data.metadata.full_name,
+                    test_result.elapsed,
+                    vm_size=test_result.information.get("vmsize", ""),
+                )
+
+    def _report_durations(self) -> None:
+        predicted_total: float = 0
+        actual_total: float = 0
+        count = 0
+        for test_result in self.test_results:
+            predicted = self._predicted_durations.get(id(test_result), 0)
+            if not predicted or test_result.status not in [
+                TestStatus.PASSED,
+                TestStatus.FAILED,
+            ]:
+                continue
+            self._log.debug(
+                f"{test_result.runtime_data.metadata.full_name}: predicted "
+                f"{predicted:.3f} sec, actual {test_result.elapsed:.3f} sec"
+            )
+            predicted_total += predicted
+            actual_total += test_result.elapsed
+            count += 1
+        if count:
+            self._log.info(
+                f"{count} test case(s) with history, predicted {predicted_total:.3f} "
+                f"sec, actual {actual_total:.3f} sec"
+            )
+
+    def _update_scheduling_index(self) -> None:
+        with self._changed_results_lock:
+            changed_results = self._changed_results
+            self._changed_results = set()
+        if changed_results:
+            for results in self._pending_results.values():
+                for result_id in changed_results.intersection(results):
+                    del results[result_id]
+            for priority in [x for x, y in self._pending_results.items() if not y]:
+                del self._pending_results[priority]
+
+        # remove cached matching of environments, which status is changed.
+        if hasattr(self, "environments"):
+            current_keys = {(x.id, x.status) for x in self.environments}
+            for key in [
+                x for x in self._environment_fit_cache if x not in current_keys
+            ]:
+                del self._environment_fit_cache[key]
+
+    def _get_pending_results(self) -> List[TestResult]:
+        results: List[TestResult] = []
+        for priority in sorted(self._pending_results):
+            results.extend(self._pending_results[priority].values())
+        return results
+
+    def _check_environment(self, result: TestResult, environment: Environment) -> bool:
+        environment_fits = self._environment_fit_cache.setdefault(
+            (environment.id, environment.status), {}
+        )
+        is_fit = environment_fits.get(id(result), None)
+        if is_fit is None:
+            is_fit = result.check_environment(environment=environment, save_reason=True)
+            environment_fits[id(result)] = is_fit
+        return is_fit
+
     def _sort_environments(self, environments: List[Environment]) -> List[Environment]:
         results: List[Environment] = []
         # sort environments by the status list
@@ -524,16 +849,23 @@ class LisaRunner(BaseRunner):
         if environments:
             for status in sorted_status:
                 results.extend(
-                    x for x in environments if x.status == status and x.is_alive
+                    x
+                    for x in environments
+                    if x.status == status
+                    and x.is_alive
+                    and x.id not in self._released_environments
                 )
         return results
 
     def _sort_test_results(self, test_results: List[TestResult]) -> List[TestResult]:
         results = test_results.copy()
         # sort by priority, use new environment, environment status and suite name.
-        results.sort(
-            key=lambda r: str(r.runtime_data.metadata.suite.name),
-        )
+        if self._duration_history:
+            self._sort_by_duration(results)
+        else:
+            results.sort(
+                key=lambda r: str(r.runtime_data.metadata.suite.name),
+            )
         # this step make sure Deployed is before Connected
         results.sort(
             reverse=True,
@@ -546,6 +878,26 @@ class LisaRunner(BaseRunner):
         results.sort(key=lambda r: r.runtime_data.metadata.priority)
         return results
 
+    def _sort_by_duration(self, test_results: List[TestResult]) -> None:
+        """
+        Longer suites run earlier, and cases of a suite are kept together, so
+        they can run in the same environment. In a suite, longer cases run
+        earlier.
+        """
+        suite_durations: Dict[str, float] = {}
+        for test_result in test_results:
+            suite_name = test_result.runtime_data.metadata.suite.name
+            suite_durations[suite_name] = suite_durations.get(
+                suite_name, 0
+            ) + self._predicted_durations.get(id(test_result), 0)
+        test_results.sort(
+            key=lambda r: (
+                -suite_durations[r.runtime_data.metadata.suite.name],
+                str(r.runtime_data.metadata.suite.name),
+                -self._predicted_durations.get(id(r), 0),
+            )
+        )
+
     def _skip_test_results(
         self,
         test_results: List[TestResult],
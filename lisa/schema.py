@@ -4,7 +4,18 @@
 import copy
 from dataclasses import dataclass, field
 from enum import Enum
-from typing import Any, Callable, Dict, List, Optional, Type, TypeVar, Union, cast
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Hashable,
+    List,
+    Optional,
+    Type,
+    TypeVar,
+    Union,
+    cast,
+)
 
 from dataclasses_json import (
     CatchAll,
@@ -345,6 +356,23 @@ class Notifier(TypedSchema, ExtendableSchemaMixin):
     # A notifier is disabled, if it's false. It helps to disable notifier by
     # variables.
     enabled: bool = True
+    # messages are delivered by a thread of the notifier. If the queue is full,
+    # block: wait for the space; drop: drop debug messages, and wait for others;
+    # coalesce: replace queued status updates of the same test result, and wait
+    # for others. If it's 0, messages are delivered on the caller's thread.
+    queue_size: int = 1000
+    queue_policy: str = field(
+        default=constants.NOTIFIER_QUEUE_BLOCK,
+        metadata=metadata(
+            validate=validate.OneOf(
+                [
+                    constants.NOTIFIER_QUEUE_BLOCK,
+                    constants.NOTIFIER_QUEUE_DROP,
+                    constants.NOTIFIER_QUEUE_COALESCE,
+                ]
+            ),
+        ),
+    )
 
 
 @dataclass_json()
@@ -460,6 +488,23 @@ class NodeSpace(search_space.RequirementMixin, TypedSchema, ExtendableSchemaMixi
             f"{super().__repr__()}"
         )
 
+    def _get_fingerprint(self) -> Hashable:
+        # keep the same fields as __eq__, so equal spaces have same fingerprint.
+        return (
+            "NodeSpace",
+            self.type,
+            search_space.get_fingerprint(self.node_count),
+            search_space.get_fingerprint(self.core_count),
+            search_space.get_fingerprint(self.memory_mb),
+            search_space.get_fingerprint(self.data_disk_count),
+            self.data_disk_caching_type,
+            search_space.get_fingerprint(self.data_disk_iops),
+            search_space.get_fingerprint(self.nic_count),
+            search_space.get_fingerprint(self.gpu_count),
+            search_space.get_fingerprint(self.features),
+            search_space.get_fingerprint(self.excluded_features),
+        )
+
     def check(self, capability: Any) -> search_space.ResultReason:
         result = search_space.ResultReason()
         if capability is None:
@@ -650,6 +695,12 @@ class RemoteNode(Node):
     username: str = constants.DEFAULT_USER_NAME
     password: str = ""
     private_key_file: str = ""
+    # the max sessions per connection, which is MaxSessions of sshd. One is
+    # used by sftp, and others by commands.
+    max_sessions: int = field(
+        default=10,
+        metadata=metadata(field_function=fields.Int, validate=validate.Range(min=2)),
+    )
 
     def __post_init__(self, *args: Any, **kwargs: Any) -> None:
         add_secret(self.username, PATTERN_HEADTAIL)
@@ -723,6 +774,21 @@ class Platform(TypedSchema, ExtendableSchemaMixin):
     # yes/always/True: means to keep the environment regardless case fail or pass
     keep_environment: Optional[Union[str, bool]] = False
 
+    # cache facts of nodes, like the OS and builtin tools, across runs. The value
+    # is the time to live in seconds. 0 means disabled.
+    node_facts_cache_ttl: int = 0
+    # cache downloaded artifacts on the controller, and copy them to nodes. The
+    # value is the time to live in seconds. 0 means disabled.
+    artifact_cache_ttl: int = 0
+    # keep deployed environments in a pool after used, so later runners with the
+    # same platform settings can reuse them. The value is the time to live in
+    # seconds since it's pooled first time. 0 means disabled.
+    environment_pool_ttl: int = 0
+    # idle environments in the pool are deleted after the seconds.
+    environment_pool_max_idle: int = 600
+    # reboot nodes before reusing a pooled environment.
+    environment_pool_reset: bool = False
+
     # platform can specify a default environment requirement
     requirement: Optional[Dict[str, Any]] = None
 
@@ -880,6 +946,21 @@ class Runbook:
     test_pass: str = ""
     tags: Optional[List[str]] = None
     concurrency: int = 1
+    # how many transformers run at the same time. If it's more than 1, the
+    # independent transformers run concurrently, and a transformer can use
+    # variables from transformers in its depends_on only.
+    transformer_concurrency: int = 1
+    # deploy environments ahead for queued test cases, while other test cases
+    # are running. The value is how many environments can be deployed ahead and
+    # not used yet. 0 means disabled.
+    predeploy_count: int = 0
+    # save elapsed time of test cases across runs, and run longer test cases
+    # earlier in the same priority, so they don't extend the end of run.
+    schedule_by_duration: bool = False
+    # run in the count of processes. Combinator iterations, or test suites if
+    # there is no combinator, are split into the processes, and the concurrency
+    # is shared by them. It works on Linux only.
+    shard_count: int = 1
     include: Optional[List[Include]] = field(default=None)
     extension: Optional[List[Union[str, Extension]]] = field(default=None)
     variable: Optional[List[Variable]] = field(default=None)
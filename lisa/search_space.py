@@ -3,8 +3,10 @@
 
 import sys
 from abc import abstractmethod
+from collections import OrderedDict
 from dataclasses import dataclass, field
-from typing import Any, Iterable, List, Optional, Set, TypeVar, Union
+from threading import Lock
+from typing import Any, Hashable, Iterable, List, Optional, Set, Tuple, TypeVar, Union
 
 from dataclasses_json import dataclass_json
 
@@ -47,6 +49,11 @@ class ResultReason:
         for reason in sub_result.reasons:
             self.add_reason(reason, name)
 
+    def copy(self) -> "ResultReason":
+        return ResultReason(
+            result=self.result, reasons=self.reasons.copy(), _prefix=self._prefix
+        )
+
 
 class RequirementMixin:
     @abstractmethod
@@ -57,6 +64,13 @@ class RequirementMixin:
     def _generate_min_capability(self, capability: Any) -> Any:
         raise NotImplementedError()
 
+    def _get_fingerprint(self) -> Hashable:
+        """
+        Return a canonical and hashable value, which is equal for two search
+        spaces, if their check results are the same on any capability.
+        """
+        raise NotImplementedError()
+
     def generate_min_capability(self, capability: Any) -> Any:
         check_result = self.check(capability)
         if not check_result.result:
@@ -94,6 +108,9 @@ class IntRange(RequirementMixin):
             max_inclusive = "(inc)" if self.max_inclusive else "(exc)"
         return f"[{self.min},{max_value}{max_inclusive}]"
 
+    def _get_fingerprint(self) -> Hashable:
+        return ("IntRange", self.min, self.max, self.max_inclusive)
+
     def check(self, capability: Any) -> ResultReason:
         result = ResultReason()
         if capability is None:
@@ -236,6 +253,9 @@ class SetSpace(RequirementMixin, Set[T]):
     def __post_init__(self, *args: Any, **kwargs: Any) -> None:
         self.update(self.items)
 
+    def _get_fingerprint(self) -> Hashable:
+        return ("SetSpace", self.is_allow_set, frozenset(self))
+
     def check(self, capability: Any) -> ResultReason:
         result = ResultReason()
         if self.is_allow_set and len(self) > 0 and not capability:
@@ -434,6 +454,79 @@ def generate_min_capability(
     return result
 
 
+def get_fingerprint(value: Any) -> Hashable:
+    """
+    Return a hashable fingerprint of a search space, including CountSpace and
+    lists of search spaces. The fingerprint can be used as a key of caches.
+    """
+    if value is None or isinstance(value, (bool, int, str)):
+        result: Hashable = value
+    elif isinstance(value, list):
+        result = tuple(get_fingerprint(x) for x in value)
+    else:
+        assert isinstance(value, RequirementMixin), f"actual: {type(value)}"
+        result = value._get_fingerprint()
+    return result
+
+
+class CheckCache:
+    """
+    A bounded cache of check results between requirements and capabilities. Most
+    test cases share a handful of requirement shapes, so the results of repeated
+    checks can be looked up by their fingerprints.
+    """
+
+    def __init__(self, max_size: int = 4096) -> None:
+        self.max_size = max_size
+        self.hits: int = 0
+        self.misses: int = 0
+        self._results: OrderedDict[
+            Tuple[Hashable, Hashable], ResultReason
+        ] = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+    def check(self, requirement: Any, capability: Any) -> ResultReason:
+        key = (get_fingerprint(requirement), get_fingerprint(capability))
+        with self._lock:
+            result = self._results.get(key, None)
+            if result is not None:
+                self.hits += 1
+                self._results.move_to_end(key)
+        if result is None:
+            result = check(requirement, capability)
+            with self._lock:
+                self.misses += 1
+                self._results[key] = result
+                if len(self._results) > self.max_size:
+                    self._results.popitem(last=False)
+        # the result may be merged by callers, so return a copy.
+        return result.copy()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._results.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+_check_cache = CheckCache()
+
+
+def get_check_cache() -> CheckCache:
+    return _check_cache
+
+
+def check_with_cache(requirement: Any, capability: Any) -> ResultReason:
+    """
+    Same as check, but the result is cached by fingerprints of requirement and
+    capability.
+    """
+    return _check_cache.check(requirement, capability)
+
+
 def equal_list(first: Optional[List[Any]], second: Optional[List[Any]]) -> bool:
     if first is None or second is None:
         result = first is second
@@ -2,7 +2,8 @@
 # Licensed under the MIT license.
 
 import re
-from typing import Any, List, Optional, Pattern, Set, Tuple, Union
+from threading import Lock
+from typing import Any, Dict, Iterable, List, Optional, Pattern, Set, Tuple, Union
 
 PATTERN_GUID = (
     re.compile(r"^([0-9a-f]{8})-(?:[0-9a-f]{4}-){3}[0-9a-f]{8}([0-9a-f]{4})$"),
@@ -40,13 +41,27 @@ def replace(
         return sub
 
 
+# It's faster to check secrets one by one, if there are not many secrets.
+_MATCHER_MIN_SECRETS = 100
+
 _secret_list: List[Tuple[str, str]] = []
 _secret_set: Set[str] = set()
+_secret_masks: Dict[str, str] = {}
+# below fields are built lazily, when secrets are changed. They are replaced
+# as a whole, so other threads can mask without locking.
+_is_dirty = False
+_build_lock = Lock()
+_sorted_secrets: List[Tuple[str, str]] = []
+_min_length = 0
+_matcher: Optional[Pattern[str]] = None
 
 
 def reset() -> None:
+    global _is_dirty
     _secret_set.clear()
     _secret_list.clear()
+    _secret_masks.clear()
+    _is_dirty = True
 
 
 def add_secret(
@@ -54,18 +69,115 @@ def add_secret(
     mask: Optional[Union[Pattern[str], Tuple[Pattern[str], str]]] = None,
     sub: str = "******",
 ) -> None:
-    global _secret_list
+    global _is_dirty
     if origin and origin not in _secret_set:
         if not isinstance(origin, str):
             origin = str(origin)
         _secret_set.add(origin)
-        _secret_list.append((origin, replace(origin, sub=sub, mask=mask)))
-        # deal with longer first, in case it's broken by shorter
-        _secret_list = sorted(_secret_list, reverse=True, key=lambda x: len(x[0]))
+        masked = replace(origin, sub=sub, mask=mask)
+        _secret_masks[origin] = masked
+        _secret_list.append((origin, masked))
+        _is_dirty = True
 
 
 def mask(input: str) -> str:
-    for secret in _secret_list:
+    if _is_dirty:
+        _build()
+    if len(input) < _min_length or not _sorted_secrets:
+        return input
+    matcher = _matcher
+    if matcher:
+        return _mask_by_matcher(matcher, input)
+    for secret in _sorted_secrets:
         if secret[0] in input:
             input = input.replace(secret[0], secret[1])
     return input
+
+
+def _mask_by_matcher(matcher: Pattern[str], input: str) -> str:
+    """
+    The matcher finds the longest secret on each position. Mask longer secrets
+    first, and skip shorter ones, which overlap them. So a shorter secret cannot
+    break a longer one, and it's the same as the loop.
+    """
+    matches = [(x.start(), x.group(1)) for x in matcher.finditer(input)]
+    if not matches:
+        return input
+    matches.sort(key=lambda x: len(x[1]), reverse=True)
+    covered = bytearray(len(input))
+    selected: List[Tuple[int, str]] = []
+    for start, secret in matches:
+        end = start + len(secret)
+        if covered.find(1, start, end) >= 0:
+            continue
+        covered[start:end] = b"\x01" * len(secret)
+        selected.append((start, secret))
+    selected.sort()
+    parts: List[str] = []
+    position = 0
+    for start, secret in selected:
+        parts.append(input[position:start])
+        parts.append(_secret_masks[secret])
+        position = start + len(secret)
+    parts.append(input[position:])
+    return "".join(parts)
+
+
+def _build() -> None:
+    global _is_dirty, _sorted_secrets, _min_length, _matcher
+    with _build_lock:
+        if not _is_dirty:
+            return
+        # reset the flag before copying, so secrets added in the meantime
+        # trigger another build.
+        _is_dirty = False
+        # deal with longer first, in case it's broken by shorter
+        secrets = sorted(_secret_list, reverse=True, key=lambda x: len(x[0]))
+        if len(secrets) >= _MATCHER_MIN_SECRETS:
+            # the lookahead finds secrets on all positions, including overlapped.
+            pattern = _trie_to_pattern(_build_trie(x[0] for x in secrets))
+            _matcher = re.compile(f"(?=({pattern}))")
+        else:
+            _matcher = None
+        _min_length = len(secrets[-1][0]) if secrets else 0
+        _sorted_secrets = secrets
+
+
+def _build_trie(secrets: Iterable[str]) -> Dict[str, Any]:
+    trie: Dict[str, Any] = {}
+    for secret in secrets:
+        node = trie
+        for char in secret:
+            node = node.setdefault(char, {})
+        # empty key marks the end of a secret
+        node[""] = {}
+    return trie
+
+
+def _trie_to_pattern(node: Dict[str, Any]) -> str:
+    """
+    The pattern shares prefixes of secrets, so the regex engine matches all
+    secrets in one pass. The longer secret is tried first on a position, so the
+    longest secret on the position is matched.
+    """
+    branches: List[str] = []
+    for char, child in sorted(node.items()):
+        if not char:
+            continue
+        literal = re.escape(char)
+        # merge the chain of single child, to reduce groups and recursion.
+        while len(child) == 1 and "" not in child:
+            char, child = next(iter(child.items()))
+            literal += re.escape(char)
+        branches.append(literal + _trie_to_pattern(child))
+
+    if not branches:
+        return ""
+    if len(branches) == 1:
+        pattern = branches[0]
+    else:
+        pattern = f"(?:{'|'.join(branches)})"
+    if "" in node:
+        # it's greedy, so longer secrets are matched first.
+        pattern = f"(?:{pattern})?"
+    return pattern
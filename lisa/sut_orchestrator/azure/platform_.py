@@ -6,15 +6,15 @@ import json
 import logging
 import os
 import re
+from bisect import bisect_left
 from copy import deepcopy
 from dataclasses import dataclass, field
 from datetime import datetime
-from difflib import SequenceMatcher
-from functools import lru_cache
+from functools import lru_cache, partial
 from pathlib import Path
 from threading import Lock
 from types import SimpleNamespace
-from typing import Any, Dict, List, Optional, Tuple, Type, Union
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type, Union
 
 from azure.core.exceptions import HttpResponseError
 from azure.identity import DefaultAzureCredential
@@ -35,7 +35,7 @@ from azure.mgmt.resource.resources.models import (  # type: ignore
     DeploymentProperties,
 )
 from dataclasses_json import dataclass_json
-from marshmallow import fields, validate
+from marshmallow import validate
 from retry import retry
 
 from lisa import schema, search_space
@@ -58,6 +58,7 @@ from lisa.util import (
     set_filtered_fields,
 )
 from lisa.util.logger import Logger
+from lisa.util.parallel import run_in_parallel
 
 from . import features
 from .common import (
@@ -147,32 +148,80 @@ SAS_COPIED_CONTAINER_NAME = "lisa-sas-copied"
 
 _global_sas_vhd_copy_lock = Lock()
 
+# max count of locations to query skus at the same time.
+_MAX_PARALLEL_LOCATIONS = 5
+
+# The resource sku capabilities, which are used to generate node capability.
+_SKU_CAPABILITY_NAMES = {
+    "vCPUs",
+    "MaxDataDiskCount",
+    "MemoryGB",
+    "MaxNetworkInterfaces",
+    "GPUs",
+    "AcceleratedNetworkingEnabled",
+    "PremiumIO",
+    "EphemeralOSDiskSupported",
+}
+
 
-@dataclass_json()
 @dataclass
 class AzureCapability:
     location: str
     vm_size: str
     capability: schema.NodeSpace
     estimated_cost: int
+    # the compact resource sku, which is saved in cache. It includes fields,
+    # which are used to generate the capability only.
     resource_sku: Dict[str, Any]
 
 
-@dataclass_json()
 @dataclass
 class AzureLocation:
-    updated_time: datetime = field(
-        default_factory=datetime.now,
-        metadata=schema.metadata(
-            fields.DateTime,
-            encoder=datetime.isoformat,
-            decoder=datetime.fromisoformat,
-            format="iso",
-        ),
-    )
+    updated_time: datetime = field(default_factory=datetime.now)
     location: str = ""
     capabilities: List[AzureCapability] = field(default_factory=list)
 
+    def __post_init__(self, *args: Any, **kwargs: Any) -> None:
+        # sorted suffixes of lower case vm sizes, with indexes of capabilities.
+        # A substring is a prefix of suffixes, so it's found by bisect. It's
+        # built on first use.
+        self._vm_size_suffixes: Optional[List[Tuple[str, int]]] = None
+
+    def match_capability(self, vm_size: str) -> Optional[AzureCapability]:
+        """
+        find the best matched capability, whose vm size contains the given
+        vm size. The shortest one is the most similar one, and it's the exact
+        match if there is. If lengths are the same, the first one wins.
+        """
+        if self._vm_size_suffixes is None:
+            self._vm_size_suffixes = self._build_vm_size_suffixes()
+        key = vm_size.lower()
+        if not key:
+            return None
+
+        matched_indexes: List[int] = []
+        position = bisect_left(self._vm_size_suffixes, (key, -1))
+        while position < len(self._vm_size_suffixes):
+            suffix, index = self._vm_size_suffixes[position]
+            if not suffix.startswith(key):
+                break
+            matched_indexes.append(index)
+            position += 1
+        if not matched_indexes:
+            return None
+        best_index = min(
+            matched_indexes, key=lambda x: (len(self.capabilities[x].vm_size), x)
+        )
+        return self.capabilities[best_index]
+
+    def _build_vm_size_suffixes(self) -> List[Tuple[str, int]]:
+        suffixes: List[Tuple[str, int]] = []
+        for index, capability in enumerate(self.capabilities):
+            name = capability.vm_size.lower()
+            suffixes.extend((name[start:], index) for start in range(len(name)))
+        suffixes.sort()
+        return suffixes
+
 
 @dataclass_json()
 @dataclass
@@ -273,6 +322,8 @@ class AzurePlatform(Platform):
         super().__init__(runbook=runbook)
         self._eligible_capabilities: Dict[str, List[AzureCapability]] = {}
         self._locations_data_cache: Dict[str, AzureLocation] = {}
+        # locations are loaded by multiple threads on prefetching.
+        self._locations_lock = Lock()
 
     @classmethod
     def type_name(cls) -> str:
@@ -346,7 +397,8 @@ class AzurePlatform(Platform):
 
             # check eligible locations
             found_or_skipped = False
-            for location_name in locations:
+            for location_index, location_name in enumerate(locations):
+                self._prefetch_eligible_vm_sizes(locations, location_index, log)
                 predefined_cost = 0
                 predefined_caps = [None] * node_count
                 for req_index, req in enumerate(nodes_requirement):
@@ -361,17 +413,7 @@ class AzurePlatform(Platform):
                     location_info: AzureLocation = self._get_location_info(
                         location_name, log
                     )
-                    matched_score: float = 0
-                    matched_cap: Optional[AzureCapability] = None
-                    matcher = SequenceMatcher(None, node_runbook.vm_size.lower(), "")
-                    for azure_cap in location_info.capabilities:
-                        matcher.set_seq2(azure_cap.vm_size.lower())
-                        if (
-                            node_runbook.vm_size.lower() in azure_cap.vm_size.lower()
-                            and matched_score < matcher.ratio()
-                        ):
-                            matched_cap = azure_cap
-                            matched_score = matcher.ratio()
+                    matched_cap = location_info.match_capability(node_runbook.vm_size)
                     if matched_cap:
                         predefined_cost += matched_cap.estimated_cost
                         min_cap: schema.NodeSpace = self._node_generate_min_capability(
@@ -410,7 +452,7 @@ class AzurePlatform(Platform):
                     f"in locations {locations}. "
                     f"it may not be supported in current subscription."
                 )
-            for location_name in locations:
+            for location_index, location_name in enumerate(locations):
                 # in each location, all node must be found
                 # fill them as None and check after met capability
                 found_capabilities: List[Any] = list(predefined_caps)
@@ -418,6 +460,7 @@ class AzurePlatform(Platform):
                 # skip unmatched location
                 if existing_location and existing_location != location_name:
                     continue
+                self._prefetch_eligible_vm_sizes(locations, location_index, log)
 
                 estimated_cost: int = 0
                 location_caps = self._get_eligible_vm_sizes(location_name, log)
@@ -526,6 +569,57 @@ class AzurePlatform(Platform):
                 self._delete_environment(environment, log)
                 raise identifier
 
+    def _get_environment_checkpoint(self, environment: Environment) -> Dict[str, Any]:
+        assert self._azure_runbook
+        environment_context = get_environment_context(environment=environment)
+        # only resource groups created by runs are re-attached.
+        if (
+            not environment_context.resource_group_is_created
+            or self._azure_runbook.dry_run
+        ):
+            return {}
+        return {AZURE_RG_NAME_KEY: environment_context.resource_group_name}
+
+    def _get_environment_settings(self, environment: Environment) -> Dict[str, Any]:
+        # vm sizes and locations are chosen on preparing, and they are in the
+        # extended runbook of nodes only.
+        nodes_requirement = environment.runbook.nodes_requirement or []
+        return {
+            "nodes": [
+                x.get_extended_runbook(AzureNodeSchema, AZURE).to_dict()  # type: ignore
+                for x in nodes_requirement
+            ]
+        }
+
+    def _reattach_environment(
+        self, environment: Environment, data: Dict[str, Any], log: Logger
+    ) -> bool:
+        assert self._rm_client
+        assert environment.runbook.nodes_requirement
+        resource_group_name: str = data.get(AZURE_RG_NAME_KEY, "")
+        if (
+            not resource_group_name
+            or not self._rm_client.resource_groups.check_existence(resource_group_name)
+        ):
+            return False
+
+        # list vms directly, because loading vms retries until they are found.
+        vm_count = len(
+            list(get_compute_client(self).virtual_machines.list(resource_group_name))
+        )
+        if vm_count < len(environment.runbook.nodes_requirement):
+            log.debug(f"vms are not found in resource group: {resource_group_name}")
+            return False
+
+        environment_context = get_environment_context(environment=environment)
+        environment_context.resource_group_name = resource_group_name
+        # it's deleted by this run, as it's created by the previous run.
+        environment_context.resource_group_is_created = True
+        log.info(f"reusing resource group: [{resource_group_name}]")
+        self._create_deployment_parameters(resource_group_name, environment, log)
+        self._initialize_nodes(environment, log)
+        return True
+
     def _delete_environment(self, environment: Environment, log: Logger) -> None:
         environment_context = get_environment_context(environment=environment)
         resource_group_name = environment_context.resource_group_name
@@ -758,8 +852,16 @@ class AzurePlatform(Platform):
             try:
                 with open(cached_file_name, "r") as f:
                     loaded_data: Dict[str, Any] = json.load(f)
-                loaded_obj = AzureLocation.schema().load(  # type:ignore
-                    loaded_data
+                # it's faster to generate capabilities from compact skus, than
+                # deserializing them.
+                location = loaded_data["location"]
+                loaded_obj = AzureLocation(
+                    updated_time=datetime.fromisoformat(loaded_data["updated_time"]),
+                    location=location,
+                    capabilities=[
+                        self._compact_sku_to_azure_capability(location, x)
+                        for x in loaded_data["skus"]
+                    ],
                 )
             except Exception as identifier:
                 # if schema changed, There may be exception, remove cache and retry
@@ -776,7 +878,8 @@ class AzurePlatform(Platform):
             f"azure_locations_{location}.json"
         )
         should_refresh: bool = True
-        location_data = self._locations_data_cache.get(location, None)
+        with self._locations_lock:
+            location_data = self._locations_data_cache.get(location, None)
         if not location_data:
             location_data = self._load_location_info_from_file(
                 cached_file_name=cached_file_name, log=log
@@ -816,40 +919,33 @@ class AzurePlatform(Platform):
                             ):
                                 # restricted on this location
                                 continue
-                            resource_sku = sku_obj.as_dict()
-                            capability = self._resource_sku_to_capability(
-                                location, sku_obj
-                            )
-
-                            # estimate vm cost for priority
-                            assert isinstance(capability.core_count, int)
-                            assert isinstance(capability.gpu_count, int)
-                            estimated_cost = (
-                                capability.core_count + capability.gpu_count * 100
-                            )
-                            azure_capability = AzureCapability(
-                                location=location,
-                                vm_size=sku_obj.name,
-                                capability=capability,
-                                resource_sku=resource_sku,
-                                estimated_cost=estimated_cost,
+                            all_skus.append(
+                                self._compact_sku_to_azure_capability(
+                                    location, self._compact_resource_sku(sku_obj)
+                                )
                             )
-                            all_skus.append(azure_capability)
                     except Exception as identifier:
                         log.error(f"unknown sku: {sku_obj}")
                         raise identifier
             location_data = AzureLocation(location=location, capabilities=all_skus)
-            self._locations_data_cache[location_data.location] = location_data
             log.debug(f"{location}: saving to disk")
             with open(cached_file_name, "w") as f:
-                json.dump(location_data.to_dict(), f)  # type: ignore
+                json.dump(
+                    {
+                        "updated_time": location_data.updated_time.isoformat(),
+                        "location": location_data.location,
+                        "skus": [x.resource_sku for x in location_data.capabilities],
+                    },
+                    f,
+                )
             log.debug(
                 f"{location_data.location}: new data, "
                 f"sku: {len(location_data.capabilities)}"
             )
 
         assert location_data
-        self._locations_data_cache[location] = location_data
+        with self._locations_lock:
+            self._locations_data_cache[location] = location_data
         return location_data
 
     def _create_deployment_parameters(
@@ -1235,6 +1331,12 @@ class AzurePlatform(Platform):
             if not node.name:
                 node.name = vm_name
 
+            # nodes from the same image and vm size share cached facts.
+            node_runbook = node.capability.get_extended_runbook(AzureNodeSchema, AZURE)
+            node.facts_key = (
+                f"{AZURE}|{node_runbook.get_image_name()}|{node_runbook.vm_size}"
+            )
+
             assert isinstance(node, RemoteNode)
             node.set_connection_info(
                 address=address,
@@ -1248,6 +1350,44 @@ class AzurePlatform(Platform):
 
     def _resource_sku_to_capability(
         self, location: str, resource_sku: ResourceSku
+    ) -> schema.NodeSpace:
+        return self._compact_sku_to_capability(
+            location, self._compact_resource_sku(resource_sku)
+        )
+
+    def _compact_resource_sku(self, resource_sku: ResourceSku) -> Dict[str, Any]:
+        """
+        keep the fields, which are needed to generate capability only. The full
+        resource sku is large and slow to cache.
+        """
+        return {
+            "name": resource_sku.name,
+            "family": resource_sku.family,
+            "capabilities": {
+                x.name: x.value
+                for x in resource_sku.capabilities
+                if x.name in _SKU_CAPABILITY_NAMES
+            },
+        }
+
+    def _compact_sku_to_azure_capability(
+        self, location: str, compact_sku: Dict[str, Any]
+    ) -> AzureCapability:
+        capability = self._compact_sku_to_capability(location, compact_sku)
+        # estimate vm cost for priority
+        assert isinstance(capability.core_count, int)
+        assert isinstance(capability.gpu_count, int)
+        estimated_cost = capability.core_count + capability.gpu_count * 100
+        return AzureCapability(
+            location=location,
+            vm_size=compact_sku["name"],
+            capability=capability,
+            resource_sku=compact_sku,
+            estimated_cost=estimated_cost,
+        )
+
+    def _compact_sku_to_capability(
+        self, location: str, compact_sku: Dict[str, Any]
     ) -> schema.NodeSpace:
         # fill in default values, in case no capability meet.
         node_space = schema.NodeSpace(
@@ -1260,37 +1400,33 @@ class AzurePlatform(Platform):
             features=search_space.SetSpace[str](is_allow_set=True),
             excluded_features=search_space.SetSpace[str](is_allow_set=False),
         )
-        node_space.name = f"{location}_{resource_sku.name}"
+        node_space.name = f"{location}_{compact_sku['name']}"
         node_space.features = search_space.SetSpace[str](is_allow_set=True)
-        for sku_capability in resource_sku.capabilities:
-            if resource_sku.family in ["standardLSv2Family"]:
-                node_space.features.update([features.Nvme.name()])
-            name = sku_capability.name
+        sku_capabilities: Dict[str, str] = compact_sku["capabilities"]
+        if compact_sku["family"] in ["standardLSv2Family"]:
+            node_space.features.update([features.Nvme.name()])
+        for name, value in sku_capabilities.items():
             if name == "vCPUs":
-                node_space.core_count = int(sku_capability.value)
+                node_space.core_count = int(value)
             elif name == "MaxDataDiskCount":
-                node_space.data_disk_count = search_space.IntRange(
-                    max=int(sku_capability.value)
-                )
+                node_space.data_disk_count = search_space.IntRange(max=int(value))
             elif name == "MemoryGB":
-                node_space.memory_mb = int(float(sku_capability.value) * 1024)
+                node_space.memory_mb = int(float(value) * 1024)
             elif name == "MaxNetworkInterfaces":
-                node_space.nic_count = search_space.IntRange(
-                    max=int(sku_capability.value)
-                )
+                node_space.nic_count = search_space.IntRange(max=int(value))
             elif name == "GPUs":
-                node_space.gpu_count = int(sku_capability.value)
+                node_space.gpu_count = int(value)
                 # update features list if gpu feature is supported
                 node_space.features.update([features.Gpu.name()])
             elif name == "AcceleratedNetworkingEnabled":
-                if eval(sku_capability.value) is True:
+                if eval(value) is True:
                     # update features list if sriov feature is supported
                     node_space.features.update([features.Sriov.name()])
             elif name == "PremiumIO":
-                if eval(sku_capability.value) is True:
+                if eval(value) is True:
                     node_space.features.update([features.DiskPremiumLRS.name()])
             elif name == "EphemeralOSDiskSupported":
-                if eval(sku_capability.value) is True:
+                if eval(value) is True:
                     node_space.features.update([features.DiskEphemeral.name()])
 
         # set a min value for nic_count work around for an azure python sdk bug
@@ -1310,6 +1446,33 @@ class AzurePlatform(Platform):
 
         return node_space
 
+    def _prefetch_eligible_vm_sizes(
+        self, locations: List[str], index: int, log: Logger
+    ) -> None:
+        """
+        Querying skus is slow, if the cache is timeout. The first location is
+        loaded only, because most requirements are met in it. If a later
+        location isn't loaded when it's checked, a batch of locations from it
+        are loaded at the same time, so the following ones can be checked
+        without waiting.
+        """
+        if index == 0:
+            return
+        with self._locations_lock:
+            if locations[index] in self._eligible_capabilities:
+                return
+            tasks: Dict[str, Callable[[], List[AzureCapability]]] = {
+                location: partial(self._get_eligible_vm_sizes, location, log)
+                for location in locations[index : index + _MAX_PARALLEL_LOCATIONS]
+                if location not in self._eligible_capabilities
+            }
+        try:
+            run_in_parallel(tasks, max_workers=_MAX_PARALLEL_LOCATIONS)
+        except Exception as identifier:
+            # failed locations are loaded again, when they are checked. So the
+            # error is raised, only if the location is needed.
+            log.debug(f"failed to prefetch locations: {identifier}")
+
     def _get_eligible_vm_sizes(
         self, location: str, log: Logger
     ) -> List[AzureCapability]:
@@ -1317,9 +1480,10 @@ class AzurePlatform(Platform):
         # 1. vm size supported in current location
         # 2. vm size match predefined pattern
 
-        location_capabilities: List[AzureCapability] = []
-
-        if location not in self._eligible_capabilities:
+        with self._locations_lock:
+            location_capabilities = self._eligible_capabilities.get(location, None)
+        if location_capabilities is None:
+            location_capabilities = []
             location_info: AzureLocation = self._get_location_info(location, log)
             # loop all fall back levels
             for fallback_pattern in VM_SIZE_FALLBACK_PATTERNS:
@@ -1338,8 +1502,9 @@ class AzurePlatform(Platform):
                     f"{[x.vm_size for x in level_capabilities]}"
                 )
                 location_capabilities.extend(level_capabilities)
-            self._eligible_capabilities[location] = location_capabilities
-        return self._eligible_capabilities[location]
+            with self._locations_lock:
+                self._eligible_capabilities[location] = location_capabilities
+        return location_capabilities
 
     def _parse_marketplace_image(
         self, location: str, marketplace: AzureVmMarketplaceSchema
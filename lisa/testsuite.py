@@ -89,6 +89,9 @@ class TestResultMessage(notifier.MessageBase):
     information: Dict[str, str] = field(default_factory=dict)
     log_file: str = ""
 
+    def get_coalesce_key(self) -> str:
+        return f"{self.type}_{self.id_}"
+
 
 @dataclass
 class TestResult:
@@ -104,6 +107,10 @@ class TestResult:
     log_file: str = ""
 
     def __post_init__(self, *args: Any, **kwargs: Any) -> None:
+        # listeners are called after status changed. The runner uses them to
+        # update scheduling queues incrementally, instead of rescanning all
+        # results.
+        self._status_listeners: List[Callable[[TestResult], None]] = []
         self._send_result_message()
         self._timer: Timer
 
@@ -132,6 +139,9 @@ class TestResult:
     def update_test_result_message(self, message: TestResultMessage) -> None:
         ...
 
+    def add_status_listener(self, listener: Callable[[TestResult], None]) -> None:
+        self._status_listeners.append(listener)
+
     def handle_exception(
         self, exception: Exception, log: Logger, phase: str = ""
     ) -> None:
@@ -174,13 +184,17 @@ class TestResult:
             if new_status == TestStatus.RUNNING:
                 self._timer = create_timer()
             self._send_result_message()
+            for listener in self._status_listeners:
+                listener(self)
 
     def check_environment(
         self, environment: Environment, save_reason: bool = False
     ) -> bool:
         requirement = self.runtime_data.metadata.requirement
         assert requirement.environment
-        check_result = requirement.environment.check(environment.capability)
+        check_result = search_space.check_with_cache(
+            requirement.environment, environment.capability
+        )
         if (
             check_result.result
             and requirement.os_type
@@ -8,6 +8,10 @@ from lisa.executable import Tool
 from lisa.util import LisaException
 from lisa.util.process import ExecutableResult
 
+# the output of dmesg may be very large on long running nodes, so keep the head
+# and tail in memory, and the full output is read from the file when it's used.
+_MAX_OUTPUT_SIZE = 1024 * 1024
+
 
 class Dmesg(Tool):
     # meet any pattern will be considered as potential error line.
@@ -27,7 +31,7 @@ class Dmesg(Tool):
 
     def get_output(self, force_run: bool = False) -> str:
         command_output = self._run(force_run=force_run)
-        return command_output.stdout
+        return command_output.get_full_stdout()
 
     def check_kernel_errors(
         self,
@@ -38,7 +42,7 @@ class Dmesg(Tool):
         if command_output.exit_code != 0:
             raise LisaException(f"exit code should be zero: {command_output.exit_code}")
         matched_lines: List[str] = []
-        for line in command_output.stdout.splitlines(keepends=False):
+        for line in command_output.get_full_stdout().splitlines(keepends=False):
             for pattern in self.__errors_patterns:
                 if pattern.search(line):
                     matched_lines.append(line)
@@ -60,9 +64,13 @@ class Dmesg(Tool):
     def _run(self, force_run: bool = False) -> ExecutableResult:
         # sometime it need sudo, we can retry
         # so no_error_log for first time
-        result = self.run(force_run=force_run, no_error_log=True)
+        result = self.run(
+            force_run=force_run,
+            no_error_log=True,
+            max_output_size=_MAX_OUTPUT_SIZE,
+        )
         if result.exit_code != 0:
             # may need sudo
-            result = self.run(sudo=True)
+            result = self.run(sudo=True, max_output_size=_MAX_OUTPUT_SIZE)
         self._cached_result = result
         return result
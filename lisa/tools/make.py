@@ -11,6 +11,9 @@ from lisa.tools import Gcc, Lscpu
 if TYPE_CHECKING:
     from lisa.node import Node
 
+# the output of building is large, and it's useful on failures only.
+_MAX_OUTPUT_SIZE = 1024 * 1024
+
 
 class Make(Tool):
     def __init__(self, node: "Node") -> None:
@@ -52,10 +55,11 @@ class Make(Tool):
 
         # yes '' answers all questions with default value.
         result = self.node.execute(
-            f"yes '' | make -j{self._thread_count} {arguments}",
+            f"yes '' | make -j{thread_count} {arguments}",
             cwd=cwd,
             timeout=timeout,
             sudo=sudo,
             shell=True,
+            max_output_size=_MAX_OUTPUT_SIZE,
         )
         result.assert_exit_code()
@@ -100,6 +100,8 @@ class Reboot(Tool):
         except Exception as identifier:
             # it doesn't matter to exceptions here. The system may reboot fast
             self._log.debug(f"ignorable exception on rebooting: {identifier}")
+        # results of commands before rebooting may be changed.
+        self.node.tools.clear_cached_results()
 
         connected: bool = False
         while (
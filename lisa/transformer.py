@@ -3,6 +3,7 @@
 
 import copy
 import functools
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from typing import Any, Dict, List, Set
 
 from lisa import schema
@@ -156,25 +157,131 @@ def _run_transformers(
     for value in runbook_builder.variables.values():
         copied_variables[value.name] = value.copy()
 
-    factory = subclasses.Factory[Transformer](Transformer)
-    for runbook in transformers_runbook:
-        # serialize to data for replacing variables
-        runbook_data = runbook.to_dict()  # type: ignore
+    concurrency: int = root_runbook_data.get(constants.TRANSFORMER_CONCURRENCY, 1)
+    if concurrency > 1:
+        _run_transformers_concurrently(
+            runbook_builder=runbook_builder,
+            transformers_runbook=transformers_runbook,
+            variables=copied_variables,
+            max_workers=concurrency,
+            is_dry_run=is_dry_run,
+        )
+    else:
+        for runbook in transformers_runbook:
+            values = _run_transformer(
+                runbook, runbook_builder, copied_variables, is_dry_run
+            )
+            merge_variables(copied_variables, values)
 
-        # replace to validate all variables exist
-        replace_variables(runbook_data, copied_variables)
+    return copied_variables
 
-        # revert to runbook
-        runbook = schema.Transformer.schema().load(runbook_data)  # type: ignore
 
-        derived_builder = runbook_builder.derive(copied_variables)
-        transformer = factory.create_by_runbook(
-            runbook=runbook, runbook_builder=derived_builder
-        )
-        values = transformer.run(is_dry_run=is_dry_run)
-        merge_variables(copied_variables, values)
+def _run_transformer(
+    runbook: schema.Transformer,
+    runbook_builder: RunbookBuilder,
+    variables: Dict[str, VariableEntry],
+    is_dry_run: bool,
+) -> Dict[str, VariableEntry]:
+    # serialize to data for replacing variables
+    runbook_data = runbook.to_dict()  # type: ignore
 
-    return copied_variables
+    # replace to validate all variables exist
+    replace_variables(runbook_data, variables)
+
+    # revert to runbook
+    runbook = schema.Transformer.schema().load(runbook_data)  # type: ignore
+
+    derived_builder = runbook_builder.derive(variables)
+    factory = subclasses.Factory[Transformer](Transformer)
+    transformer = factory.create_by_runbook(
+        runbook=runbook, runbook_builder=derived_builder
+    )
+    return transformer.run(is_dry_run=is_dry_run)
+
+
+def _run_transformers_concurrently(
+    runbook_builder: RunbookBuilder,
+    transformers_runbook: List[schema.Transformer],
+    variables: Dict[str, VariableEntry],
+    max_workers: int,
+    is_dry_run: bool,
+) -> None:
+    """
+    Run a transformer, once all its depends_on are completed. A transformer gets
+    variables of all its dependent transformers, and the results are merged in
+    the sorted order, so the results are the same as running one by one. If a
+    transformer fails, no more transformer starts, and the error is raised.
+    """
+    log = _get_init_logger()
+    all_depends_on = _get_all_depends_on(transformers_runbook)
+
+    outputs: Dict[str, Dict[str, VariableEntry]] = {}
+    inputs: Dict[str, Dict[str, VariableEntry]] = {}
+    pending = list(transformers_runbook)
+    running: Dict[Future[Dict[str, VariableEntry]], str] = {}
+    pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="transformer")
+    try:
+        while pending or running:
+            for runbook in pending[:]:
+                if len(running) >= max_workers:
+                    break
+                if any(x not in outputs for x in runbook.depends_on):
+                    continue
+                pending.remove(runbook)
+                current_variables = {
+                    name: value.copy() for name, value in variables.items()
+                }
+                for dependent in transformers_runbook:
+                    if dependent.name in all_depends_on[runbook.name]:
+                        merge_variables(current_variables, outputs[dependent.name])
+                inputs[runbook.name] = current_variables
+                future = pool.submit(
+                    _run_transformer,
+                    runbook,
+                    runbook_builder,
+                    current_variables,
+                    is_dry_run,
+                )
+                running[future] = runbook.name
+
+            done_futures, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done_futures:
+                name = running.pop(future)
+                # the exception is raised here, and stops starting others.
+                outputs[name] = future.result()
+    except Exception:
+        if running:
+            log.info(
+                f"a transformer failed, no more transformer starts. The running "
+                f"ones are not stopped: {list(running.values())}"
+            )
+        pool.shutdown(wait=False)
+        raise
+    pool.shutdown()
+
+    for runbook in transformers_runbook:
+        # keep used flags, so unused variables are reported correctly.
+        for name, value in inputs[runbook.name].items():
+            if value.is_used and name in variables:
+                variables[name].is_used = True
+        merge_variables(variables, outputs[runbook.name])
+
+
+def _get_all_depends_on(
+    transformers_runbook: List[schema.Transformer],
+) -> Dict[str, Set[str]]:
+    """
+    Return all dependent transformers, includes indirect ones. The runbooks are
+    sorted, so dependents are found before.
+    """
+    all_depends_on: Dict[str, Set[str]] = {}
+    for runbook in transformers_runbook:
+        depends_on: Set[str] = set()
+        for name in runbook.depends_on:
+            depends_on.add(name)
+            depends_on.update(all_depends_on[name])
+        all_depends_on[runbook.name] = depends_on
+    return all_depends_on
 
 
 def run(runbook_builder: RunbookBuilder) -> None:
@@ -129,6 +129,8 @@ class KernelInstallerTransformer(Transformer):
 
         posix = cast(Posix, node.os)
         posix.replace_boot_kernel(installed_kernel_version)
+        # cached facts are for the original kernel.
+        node.invalidate_facts()
 
         self._log.info("rebooting")
         node.reboot()
@@ -1,22 +1,32 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
 
-
+import hashlib
+import json
 from dataclasses import dataclass, field
-from pathlib import PurePath
-from typing import Any, List, Optional, Type, cast
+from pathlib import Path, PurePath
+from threading import Lock
+from typing import Any, Dict, List, Optional, Type, cast
 
 from dataclasses_json import dataclass_json
 
 from lisa import schema
-from lisa.node import Node
+from lisa.node import Node, quick_connect
 from lisa.operating_system import Redhat, Ubuntu
 from lisa.tools import Echo, Git, Make, Uname
-from lisa.util import LisaException, subclasses
+from lisa.util import LisaException, artifact_cache, constants, subclasses
 from lisa.util.logger import Logger, get_logger
 
 from .kernel_installer import BaseInstaller, BaseInstallerSchema
 
+_PACKAGE_FOLDER_NAME = "kernel_packages"
+_PACKAGE_NODE_FOLDER_NAME = "kernel_package"
+_INSTALL_NODE_FOLDER_NAME = "kernel_install"
+
+# build the same package once, even installers run at the same time.
+_package_locks: Dict[str, Lock] = {}
+_package_locks_lock = Lock()
+
 
 @dataclass_json()
 @dataclass
@@ -77,6 +87,14 @@ class SourceInstallerSchema(BaseInstallerSchema):
     # Steps to modify code by patches and others.
     modifier: List[BaseModifierSchema] = field(default_factory=list)
 
+    # build kernel once, and install the packaged build on nodes. The package is
+    # cached on the controller by the hash of location, modifiers and kernel
+    # config, so later runs with the same key skip building. Use a tag or a
+    # commit id as ref, because a branch may move.
+    build_once: bool = False
+    # the node to build kernel on. If it's not set, the target node builds it.
+    build_connection: Optional[schema.RemoteNode] = None
+
 
 class SourceInstaller(BaseInstaller):
     @classmethod
@@ -100,6 +118,52 @@ class SourceInstaller(BaseInstaller):
         runbook: SourceInstallerSchema = self.runbook
         assert runbook.location, "the repo must be defined."
 
+        if runbook.build_once:
+            return self._install_by_package()
+
+        code_path = self._prepare_code(node)
+
+        self._build_code(node=node, code_path=code_path)
+
+        self._install_build(node=node, code_path=code_path)
+
+        kernel_version = self._get_kernel_release(node=node, code_path=code_path)
+
+        # copy current config back to system folder.
+        result = node.execute(
+            f"cp .config /boot/config-{kernel_version}", cwd=code_path, sudo=True
+        )
+        result.assert_exit_code()
+
+        return kernel_version
+
+    def _install_by_package(self) -> str:
+        runbook: SourceInstallerSchema = self.runbook
+        if runbook.build_connection:
+            build_node = quick_connect(runbook.build_connection, "build_node")
+        else:
+            build_node = self._node
+
+        try:
+            key = _get_build_key(runbook, self._get_kernel_config(build_node))
+            package_path = constants.CACHE_PATH / _PACKAGE_FOLDER_NAME / f"{key}.tar.gz"
+            with _package_locks_lock:
+                package_lock = _package_locks.setdefault(key, Lock())
+            with package_lock:
+                if package_path.exists():
+                    self._log.info(f"found built kernel package {key}, skip building")
+                else:
+                    self._build_package(build_node, package_path)
+        finally:
+            if build_node is not self._node:
+                build_node.close()
+
+        return self._install_package(self._node, package_path)
+
+    def _prepare_code(self, node: Node) -> PurePath:
+        runbook: SourceInstallerSchema = self.runbook
+        assert runbook.location, "the repo must be defined."
+
         self._install_build_tools(node)
 
         factory = subclasses.Factory[BaseLocation](BaseLocation)
@@ -114,30 +178,127 @@ class SourceInstaller(BaseInstaller):
         # modify code
         self._modify_code(node=node, code_path=code_path)
 
+        return code_path
+
+    def _build_package(self, node: Node, package_path: Path) -> None:
+        """
+        Build kernel on the node, and pack it with the layout below. The package
+        is copied back to the controller.
+
+        kernelrelease, vmlinuz, System.map, config, lib/modules/<kernel release>
+        """
+        code_path = self._prepare_code(node)
         self._build_code(node=node, code_path=code_path)
+        kernel_version = self._get_kernel_release(node=node, code_path=code_path)
 
-        self._install_build(node=node, code_path=code_path)
+        package_folder = node.working_path / _PACKAGE_NODE_FOLDER_NAME
+        node.execute(f"rm -rf {package_folder}", sudo=True).assert_exit_code()
+        node.execute(f"mkdir -p {package_folder}", sudo=True).assert_exit_code()
 
-        result = node.execute("make kernelrelease", cwd=code_path)
-        kernel_version = result.stdout
-        result.assert_exit_code(0, f"failed on get kernel version: {kernel_version}")
+        make = node.tools[Make]
+        # strip modules to reduce the size of package.
+        make.make(
+            arguments=f"{_get_make_arguments(node)} modules_install "
+            f"INSTALL_MOD_PATH={package_folder} INSTALL_MOD_STRIP=1",
+            cwd=code_path,
+            sudo=True,
+        )
 
-        # copy current config back to system folder.
+        result = node.execute("make -s image_name", cwd=code_path)
+        result.assert_exit_code(message="failed on get kernel image name")
+        image_path = code_path / result.stdout.strip()
+        for source, name in [
+            (image_path, "vmlinuz"),
+            (code_path / "System.map", "System.map"),
+            (code_path / ".config", "config"),
+        ]:
+            result = node.execute(f"cp {source} {package_folder / name}", sudo=True)
+            result.assert_exit_code()
         result = node.execute(
-            f"cp .config /boot/config-{kernel_version}", cwd=code_path, sudo=True
+            f"echo {kernel_version} > {package_folder / 'kernelrelease'}",
+            shell=True,
+            sudo=True,
+        )
+        result.assert_exit_code()
+
+        node_package_path = node.working_path / package_path.name
+        result = node.execute(
+            f"tar czf {node_package_path} -C {package_folder} .", sudo=True
+        )
+        result.assert_exit_code(message="failed on pack kernel")
+        node.execute(f"chmod a+r {node_package_path}", sudo=True).assert_exit_code()
+
+        # copy to a temp file, so an incomplete package isn't used.
+        package_path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = package_path.with_name(f"{package_path.name}.tmp")
+        node.shell.copy_back(node_package_path, temp_path)
+        temp_path.replace(package_path)
+        self._log.info(f"kernel {kernel_version} is packed to {package_path}")
+
+    def _install_package(self, node: Node, package_path: Path) -> str:
+        node_package_path = node.working_path / package_path.name
+        cache = artifact_cache.get_cache()
+        if cache:
+            cache.deploy(node, str(package_path), node_package_path)
+        elif not node.shell.exists(node_package_path):
+            node.shell.copy(package_path, node_package_path)
+
+        install_folder = node.working_path / _INSTALL_NODE_FOLDER_NAME
+        node.execute(f"rm -rf {install_folder}", sudo=True).assert_exit_code()
+        node.execute(f"mkdir -p {install_folder}", sudo=True).assert_exit_code()
+        result = node.execute(
+            f"tar xzf {node_package_path} -C {install_folder}", sudo=True
         )
+        result.assert_exit_code(message="failed on unpack kernel")
+
+        result = node.execute("cat kernelrelease", cwd=install_folder)
         result.assert_exit_code()
+        kernel_version = result.stdout.strip()
+        self._log.info(f"installing kernel package: {kernel_version}")
+
+        for command in [
+            f"cp -r lib/modules/{kernel_version} /lib/modules/",
+            f"depmod {kernel_version}",
+            # it's the same as 'make install'.
+            f"installkernel {kernel_version} vmlinuz System.map /boot",
+            f"cp config /boot/config-{kernel_version}",
+        ]:
+            result = node.execute(command, cwd=install_folder, sudo=True)
+            result.assert_exit_code()
+
+        self._update_boot_loader(node)
 
         return kernel_version
 
+    def _get_kernel_config(self, node: Node) -> str:
+        uname = node.tools[Uname]
+        kernel_information = uname.get_linux_information()
+        result = node.execute(
+            f"cat /boot/config-{kernel_information.kernel_version_raw}"
+        )
+        result.assert_exit_code(message="failed on get kernel config")
+        return result.stdout
+
+    def _get_kernel_release(self, node: Node, code_path: PurePath) -> str:
+        result = node.execute("make kernelrelease", cwd=code_path)
+        kernel_version = result.stdout
+        result.assert_exit_code(0, f"failed on get kernel version: {kernel_version}")
+        return kernel_version
+
     def _install_build(self, node: Node, code_path: PurePath) -> None:
         make = node.tools[Make]
-        make.make(arguments="modules", cwd=code_path, sudo=True)
+        make_arguments = _get_make_arguments(node)
+        make.make(arguments=f"{make_arguments} modules", cwd=code_path, sudo=True)
+
+        make.make(
+            arguments=f"{make_arguments} modules_install", cwd=code_path, sudo=True
+        )
 
-        make.make(arguments="modules_install", cwd=code_path, sudo=True)
+        make.make(arguments=f"{make_arguments} install", cwd=code_path, sudo=True)
 
-        make.make(arguments="install", cwd=code_path, sudo=True)
+        self._update_boot_loader(node)
 
+    def _update_boot_loader(self, node: Node) -> None:
         # The build for Redhat needs extra steps than RPM package. So put it
         # here, not in OS.
         if isinstance(node.os, Redhat):
@@ -208,7 +369,9 @@ class SourceInstaller(BaseInstaller):
         make.make(arguments="olddefconfig", cwd=code_path)
 
         # set timeout to 2 hours
-        make.make(arguments="", cwd=code_path, timeout=60 * 60 * 2)
+        make.make(
+            arguments=_get_make_arguments(node), cwd=code_path, timeout=60 * 60 * 2
+        )
 
     def _install_build_tools(self, node: Node) -> None:
         os = node.os
@@ -230,8 +393,6 @@ class SourceInstaller(BaseInstaller):
                 node.execute("rpm -e ius-release", sudo=True)
         elif isinstance(os, Ubuntu):
             # ccache is used to speed up recompilation
-            # node.execute("command -v ccache", shell=True)
-            # node.execute("export PATH=/usr/lib/ccache:$PATH", shell=True)
             os.install_packages(
                 [
                     "git",
@@ -364,6 +525,31 @@ class PatchModifier(BaseModifier):
         git.apply(cwd=self._code_path, patches=patches_path)
 
 
+def _get_build_key(runbook: SourceInstallerSchema, config: str) -> str:
+    """
+    The key of a kernel build, which is the hash of the code location, the
+    modifiers like patches, and the kernel config.
+    """
+    assert runbook.location, "the repo must be defined."
+    content = {
+        "location": runbook.location.to_dict(),  # type: ignore
+        "modifier": [x.to_dict() for x in runbook.modifier],  # type: ignore
+        "config": config,
+    }
+    return hashlib.sha256(
+        json.dumps(content, sort_keys=True).encode("utf-8")
+    ).hexdigest()
+
+
+def _get_make_arguments(node: Node) -> str:
+    # use the same arguments in all make commands, otherwise the changed
+    # compiler causes rebuilding.
+    result = node.execute("command -v ccache", shell=True, no_error_log=True)
+    if result.exit_code == 0:
+        return 'CC="ccache gcc"'
+    return ""
+
+
 def _get_code_path(path: str, node: Node, default_name: str) -> PurePath:
     if path:
         code_path = node.get_pure_path(path)
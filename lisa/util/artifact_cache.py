@@ -0,0 +1,271 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+import hashlib
+import json
+import os
+import shlex
+import shutil
+import tempfile
+import time
+import urllib.request
+from functools import partial
+from pathlib import Path, PurePath, PurePosixPath
+from threading import Lock
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from lisa.util import LisaException, constants
+from lisa.util.logger import get_logger
+from lisa.util.parallel import run_in_parallel
+
+if TYPE_CHECKING:
+    from lisa.node import Node
+
+_FOLDER_NAME = "artifacts"
+_INDEX_FILE_NAME = "index.json"
+# it's saved in a folder artifact on nodes, and lists hashes of all files.
+_MANIFEST_FILE_NAME = ".lisa_artifact.sha256"
+_CHUNK_SIZE = 1024 * 1024
+
+
+def _hash_file(path: Path) -> str:
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def _get_manifest(path: Path) -> str:
+    """
+    The manifest is in the format of sha256sum, so it can be checked on nodes.
+    """
+    file_paths: Dict[str, Path] = {}
+    for root, _, file_names in os.walk(path):
+        for file_name in file_names:
+            file_path = Path(root) / file_name
+            relative_path = file_path.relative_to(path).as_posix()
+            if relative_path != _MANIFEST_FILE_NAME:
+                file_paths[relative_path] = file_path
+    return "".join(
+        f"{_hash_file(file_paths[x])}  {x}\n" for x in sorted(file_paths.keys())
+    )
+
+
+class ArtifactCache:
+    """
+    The controller side cache of artifacts, which are needed by nodes. An artifact
+    is fetched once per ttl, saved by the hash of its content, and then copied to
+    nodes. The source can be an url, a local file or a local folder.
+    """
+
+    def __init__(self, path: Path, ttl: float) -> None:
+        self._path = path
+        self._ttl = ttl
+        self._lock = Lock()
+        # fetch the same source once, even nodes ask it at the same time.
+        self._source_locks: Dict[str, Lock] = {}
+        self._log = get_logger("artifact_cache")
+
+    def fetch(self, source: str) -> Tuple[Path, str]:
+        """
+        Return the cached path and hash of the source. For a folder, the hash is
+        of its manifest.
+        """
+        with self._lock:
+            source_lock = self._source_locks.setdefault(source, Lock())
+        with source_lock:
+            entry = self._load_index().get(source, None)
+            if entry:
+                cached_path = self._path / entry["hash"]
+                if (
+                    cached_path.exists()
+                    and time.time() - entry["updated_time"] <= self._ttl
+                ):
+                    return cached_path, entry["hash"]
+
+            cached_path, digest = self._fetch(source)
+            with self._lock:
+                index = self._load_index()
+                index[source] = {"hash": digest, "updated_time": time.time()}
+                self._save_index(index)
+            return cached_path, digest
+
+    def deploy(
+        self,
+        node: "Node",
+        source: str,
+        node_path: PurePath,
+        overwrite: bool = True,
+    ) -> PurePath:
+        """
+        Copy the artifact to the node path, and return the expanded node path. It's
+        skipped, if the node has the same content already, or the path exists and
+        overwrite is False. The content is verified by hash after copied.
+        """
+        if not node.is_posix:
+            raise LisaException("artifact cache supports posix nodes only.")
+        cached_path, digest = self.fetch(source)
+        node_path = self._expand_node_path(node, node_path)
+        if not overwrite and self._exists_on_node(node, node_path):
+            node.log.debug(f"'{node_path}' exists, and it's not overwritten")
+            return node_path
+        if cached_path.is_dir():
+            self._deploy_folder(node, cached_path, node_path)
+        else:
+            self._deploy_file(node, cached_path, digest, node_path)
+        return node_path
+
+    def deploy_to_nodes(
+        self, nodes: List["Node"], source: str, node_path: PurePath
+    ) -> None:
+        # fetch it firstly, so all nodes use the same content.
+        self.fetch(source)
+        tasks: Dict[str, Callable[[], PurePath]] = {
+            f"node[{node.index}]": partial(self.deploy, node, source, node_path)
+            for node in nodes
+        }
+        run_in_parallel(tasks)
+
+    def _deploy_file(
+        self, node: "Node", cached_path: Path, digest: str, node_path: PurePath
+    ) -> None:
+        if self._get_node_hash(node, node_path) == digest:
+            node.log.debug(f"'{node_path}' exists with same content, skip copying")
+            return
+        node.shell.copy(cached_path, node_path)
+        node_digest = self._get_node_hash(node, node_path)
+        if node_digest != digest:
+            raise LisaException(
+                f"hash of copied '{node_path}' mismatches, "
+                f"expected: {digest}, actual: {node_digest}"
+            )
+
+    def _deploy_folder(
+        self, node: "Node", cached_path: Path, node_path: PurePath
+    ) -> None:
+        if self._check_node_manifest(node, node_path):
+            node.log.debug(f"'{node_path}' exists with same content, skip copying")
+            return
+        for root, _, file_names in os.walk(cached_path):
+            for file_name in file_names:
+                file_path = Path(root) / file_name
+                relative_path = file_path.relative_to(cached_path).as_posix()
+                node.shell.copy(file_path, node_path / relative_path)
+        if not self._check_node_manifest(node, node_path):
+            raise LisaException(f"hash of copied '{node_path}' mismatches")
+
+    def _expand_node_path(self, node: "Node", node_path: PurePath) -> PurePath:
+        # files are copied by the literal path, but commands expand it. So
+        # expand variables and home on the node, to copy and check the same file.
+        node_path_str = str(node_path)
+        if "$" in node_path_str or "~" in node_path_str:
+            result = node.execute(f"echo {node_path_str}", shell=True)
+            result.assert_exit_code(
+                message=f"failed to expand the node path: {node_path_str}"
+            )
+            node_path = PurePosixPath(result.stdout)
+        if not node.is_remote:
+            node_path = Path(node_path)
+        return node_path
+
+    # node paths are expanded already, so they are quoted in commands.
+    def _exists_on_node(self, node: "Node", node_path: PurePath) -> bool:
+        result = node.execute(
+            f"test -e {shlex.quote(str(node_path))}", shell=True, no_error_log=True
+        )
+        return result.exit_code == 0
+
+    def _check_node_manifest(self, node: "Node", node_path: PurePath) -> bool:
+        # it fails, if the folder or manifest doesn't exist.
+        result = node.execute(
+            f"cd {shlex.quote(str(node_path))} && "
+            f"sha256sum -c --quiet {_MANIFEST_FILE_NAME}",
+            shell=True,
+            no_error_log=True,
+        )
+        return result.exit_code == 0
+
+    def _get_node_hash(self, node: "Node", node_path: PurePath) -> str:
+        result = node.execute(
+            f"sha256sum {shlex.quote(str(node_path))}", shell=True, no_error_log=True
+        )
+        if result.exit_code != 0:
+            return ""
+        return result.stdout.split(" ")[0]
+
+    def _fetch(self, source: str) -> Tuple[Path, str]:
+        self._path.mkdir(parents=True, exist_ok=True)
+        temp_folder = Path(tempfile.mkdtemp(dir=self._path))
+        try:
+            temp_path = temp_folder / "content"
+            parsed_url = urlparse(source)
+            if parsed_url.scheme in ["http", "https"]:
+                self._log.debug(f"downloading {source}")
+                with urllib.request.urlopen(source) as response:
+                    with open(temp_path, "wb") as f:
+                        shutil.copyfileobj(response, f, _CHUNK_SIZE)
+            else:
+                local_path = Path(
+                    parsed_url.path if parsed_url.scheme == "file" else source
+                )
+                if local_path.is_dir():
+                    shutil.copytree(local_path, temp_path)
+                    (temp_path / _MANIFEST_FILE_NAME).write_text(
+                        _get_manifest(temp_path)
+                    )
+                elif local_path.is_file():
+                    shutil.copyfile(local_path, temp_path)
+                else:
+                    raise LisaException(f"cannot find the artifact source: {source}")
+
+            if temp_path.is_dir():
+                digest = hashlib.sha256(
+                    (temp_path / _MANIFEST_FILE_NAME).read_bytes()
+                ).hexdigest()
+            else:
+                digest = _hash_file(temp_path)
+            cached_path = self._path / digest
+            # if it exists, the same content is cached already.
+            if not cached_path.exists():
+                temp_path.rename(cached_path)
+        finally:
+            shutil.rmtree(temp_folder, ignore_errors=True)
+        self._log.debug(f"cached {source} as {digest}")
+        return cached_path, digest
+
+    def _load_index(self) -> Dict[str, Any]:
+        index_path = self._path / _INDEX_FILE_NAME
+        if not index_path.exists():
+            return {}
+        try:
+            with open(index_path, "r") as f:
+                index: Dict[str, Any] = json.load(f)
+            return index
+        except Exception as identifier:
+            self._log.debug(f"error on loading artifact index: {identifier}")
+            return {}
+
+    def _save_index(self, index: Dict[str, Any]) -> None:
+        self._path.mkdir(parents=True, exist_ok=True)
+        index_path = self._path / _INDEX_FILE_NAME
+        temp_path = index_path.with_name(f"{index_path.name}.{os.getpid()}.tmp")
+        with open(temp_path, "w") as f:
+            json.dump(index, f)
+        temp_path.replace(index_path)
+
+
+_cache: Optional[ArtifactCache] = None
+
+
+def enable_cache(ttl: float) -> None:
+    """
+    It's opt-in. ttl is in seconds.
+    """
+    global _cache
+    _cache = ArtifactCache(constants.CACHE_PATH.joinpath(_FOLDER_NAME), ttl)
+
+
+def get_cache() -> Optional[ArtifactCache]:
+    return _cache
@@ -0,0 +1,148 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+import json
+from pathlib import Path
+from threading import Lock
+from typing import Any, Dict, Optional, TextIO
+
+from lisa.secret import mask
+from lisa.util import LisaException, constants
+from lisa.util.logger import get_logger
+
+_FILE_NAME = "checkpoint.jsonl"
+_KIND_RESULT = "result"
+_KIND_ENVIRONMENT = "environment"
+
+
+class Checkpoint:
+    """
+    The progress of a run. Completed test results and deployed environments are
+    appended to a file under the run folder, so it's kept if the run crashes. A
+    run can be resumed from the checkpoint of a previous run, so completed test
+    results are skipped, and deployed environments can be re-attached.
+    """
+
+    def __init__(self, path: Path, resumed_path: Optional[Path] = None) -> None:
+        self._path = path
+        self._lock = Lock()
+        self._log = get_logger("checkpoint")
+        # completed test results of the resumed run, by keys.
+        self._results: Dict[str, Dict[str, Any]] = {}
+        # deployed environments of the resumed run, by platform data.
+        self._environments: Dict[str, Dict[str, Any]] = {}
+        self._file: Optional[TextIO] = None
+        if resumed_path:
+            self._load(resumed_path)
+
+    def get_result(self, key: str, variables: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Return the status and message of a completed test result in the resumed
+        run. It's empty, if it's not completed, or iteration variables changed.
+        """
+        record = self._results.get(key, None)
+        if record and record["variables"] == self._mask_variables(variables):
+            return record
+        return {}
+
+    def add_result(
+        self, key: str, variables: Dict[str, Any], status: str, message: str
+    ) -> None:
+        self._write(
+            {
+                "kind": _KIND_RESULT,
+                "key": key,
+                "variables": self._mask_variables(variables),
+                "status": status,
+                "message": message,
+            }
+        )
+
+    def take_environment(self, requirement: str) -> Dict[str, Any]:
+        """
+        Return platform data of a deployed environment in the resumed run, which
+        has the same requirement. It's not returned again. It's empty, if there
+        is no such environment.
+        """
+        with self._lock:
+            for key, record in self._environments.items():
+                if record["requirement"] == requirement:
+                    del self._environments[key]
+                    data: Dict[str, Any] = record["data"]
+                    return data
+        return {}
+
+    def add_environment(self, requirement: str, data: Dict[str, Any]) -> None:
+        self._write(
+            {
+                "kind": _KIND_ENVIRONMENT,
+                "requirement": requirement,
+                "data": data,
+                "is_deleted": False,
+            }
+        )
+
+    def remove_environment(self, data: Dict[str, Any]) -> None:
+        self._write({"kind": _KIND_ENVIRONMENT, "data": data, "is_deleted": True})
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        line = json.dumps(record, default=str) + "\n"
+        with self._lock:
+            if not self._file:
+                self._file = open(self._path, "a", encoding="utf-8")
+            self._file.write(line)
+            # flush each record, so it's kept if the run crashes.
+            self._file.flush()
+
+    def _load(self, resumed_path: Path) -> None:
+        checkpoint_path = resumed_path / _FILE_NAME
+        if not checkpoint_path.exists():
+            raise LisaException(f"cannot find checkpoint: {checkpoint_path}")
+        with open(checkpoint_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except Exception:
+                    # the last line may be partial, if the run crashed.
+                    self._log.debug(f"skipped partial record: {line}")
+                    continue
+                if record["kind"] == _KIND_RESULT:
+                    self._results[record["key"]] = record
+                else:
+                    key = json.dumps(record["data"], sort_keys=True)
+                    if record["is_deleted"]:
+                        self._environments.pop(key, None)
+                    else:
+                        self._environments[key] = record
+        # environments are kept, so they can be re-attached if this run is
+        # resumed again. Results are added again, when they are resumed.
+        for record in self._environments.values():
+            self._write(record)
+        self._log.info(
+            f"resumed from {checkpoint_path}, completed results: "
+            f"{len(self._results)}, deployed environments: {len(self._environments)}"
+        )
+
+    def _mask_variables(self, variables: Dict[str, Any]) -> Dict[str, str]:
+        return {name: mask(str(value)) for name, value in variables.items()}
+
+
+_checkpoint: Optional[Checkpoint] = None
+
+
+def enable_checkpoint(resumed_path: Optional[Path] = None) -> None:
+    """
+    It's enabled by runs, and the checkpoint is saved in the run folder.
+    """
+    global _checkpoint
+    _checkpoint = Checkpoint(constants.RUN_LOCAL_PATH / _FILE_NAME, resumed_path)
+
+
+def get_checkpoint() -> Optional[Checkpoint]:
+    return _checkpoint
@@ -47,6 +47,9 @@ LIST_CASE = "case"
 # notifier
 NOTIFIER = "notifier"
 NOTIFIER_CONSOLE = "console"
+NOTIFIER_QUEUE_BLOCK = "block"
+NOTIFIER_QUEUE_DROP = "drop"
+NOTIFIER_QUEUE_COALESCE = "coalesce"
 
 # common
 NODES = "nodes"
@@ -68,6 +71,7 @@ EXTENSION = "extension"
 VARIABLE = "variable"
 
 TRANSFORMER = "transformer"
+TRANSFORMER_CONCURRENCY = "transformer_concurrency"
 TRANSFORMER_TOLIST = "tolist"
 
 COMBINATOR = "combinator"
@@ -87,6 +91,7 @@ ENVIRONMENTS_NODES_REMOTE_PUBLIC_PORT = "public_port"
 ENVIRONMENTS_NODES_REMOTE_USERNAME = "username"
 ENVIRONMENTS_NODES_REMOTE_PASSWORD = "password"
 ENVIRONMENTS_NODES_REMOTE_PRIVATE_KEY_FILE = "private_key_file"
+ENVIRONMENTS_NODES_REMOTE_MAX_SESSIONS = "max_sessions"
 
 PLATFORM = "platform"
 PLATFORM_READY = "ready"
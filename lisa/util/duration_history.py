@@ -0,0 +1,105 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+import json
+import os
+from pathlib import Path
+from threading import Lock
+from typing import Any, Dict, Optional
+
+from lisa.util import constants
+from lisa.util.logger import get_logger
+
+_FILE_NAME = "durations.json"
+# the key of durations on all vm sizes.
+_ALL_VM_SIZES = ""
+# the average is weighted to recent runs after the count.
+_MAX_SAMPLE_COUNT = 10
+
+
+class DurationHistory:
+    """
+    Elapsed time of test cases across runs. It's saved by the full name of test
+    cases, and by vm sizes. So the scheduler can predict how long a test case
+    takes.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self._path = path
+        self._lock = Lock()
+        # case name: vm size: [count, average]
+        self._durations: Optional[Dict[str, Dict[str, Any]]] = None
+        # only changes are saved, so other runs' changes are kept.
+        self._changes: Dict[str, Dict[str, Any]] = {}
+        self._log = get_logger("duration_history")
+
+    def get(self, name: str, vm_size: str = "") -> float:
+        """
+        Return the average elapsed seconds, or 0 if it's never run. If the vm
+        size doesn't have history, the average of all vm sizes is used.
+        """
+        with self._lock:
+            case_durations = self._load().get(name, {})
+            duration = case_durations.get(vm_size, None) or case_durations.get(
+                _ALL_VM_SIZES, None
+            )
+        return float(duration[1]) if duration else 0.0
+
+    def add(self, name: str, elapsed: float, vm_size: str = "") -> None:
+        with self._lock:
+            case_durations = self._load().setdefault(name, {})
+            keys = [_ALL_VM_SIZES]
+            if vm_size:
+                keys.append(vm_size)
+            for key in keys:
+                count, average = case_durations.get(key, [0, 0.0])
+                count = min(count + 1, _MAX_SAMPLE_COUNT)
+                average += (elapsed - average) / count
+                case_durations[key] = [count, average]
+                self._changes.setdefault(name, {})[key] = [count, average]
+
+    def save(self) -> None:
+        with self._lock:
+            if not self._changes:
+                return
+            # reload, because other runs may update the file.
+            self._durations = None
+            durations = self._load()
+            for name, case_changes in self._changes.items():
+                durations.setdefault(name, {}).update(case_changes)
+            self._changes = {}
+
+            self._path.parent.mkdir(parents=True, exist_ok=True)
+            # write to a temp file and then rename it, so other runs never read
+            # a partial file.
+            temp_path = self._path.with_name(f"{self._path.name}.{os.getpid()}.tmp")
+            with open(temp_path, "w") as f:
+                json.dump(durations, f)
+            temp_path.replace(self._path)
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if self._durations is None:
+            durations: Dict[str, Dict[str, Any]] = {}
+            if self._path.exists():
+                try:
+                    with open(self._path, "r") as f:
+                        durations = json.load(f)
+                except Exception as identifier:
+                    self._log.debug(f"error on loading durations: {identifier}")
+            self._durations = durations
+        return self._durations
+
+
+_history: Optional[DurationHistory] = None
+_history_lock = Lock()
+
+
+def get_history() -> DurationHistory:
+    """
+    The history is shared by runners, so changes are saved together.
+    """
+    global _history
+    with _history_lock:
+        if not _history:
+            _history = DurationHistory(constants.CACHE_PATH.joinpath(_FILE_NAME))
+        return _history
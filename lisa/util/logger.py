@@ -1,11 +1,15 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
 
+import atexit
 import logging
+import os
 import sys
 import time
 from functools import partial
 from pathlib import Path
+from queue import Queue
+from threading import Event, Lock, Thread
 from typing import Any, Dict, List, Optional, TextIO, Union, cast
 
 from lisa.secret import mask
@@ -15,6 +19,9 @@ from lisa.util import LisaException, filter_ansi_escape
 ENV_KEY_RUN_LOCAL_PATH = "LISA_RUN_LOCAL_PATH"
 DEFAULT_LOG_NAME = "lisa"
 
+# the attribute on log records of lines, which are not filtered yet.
+_LINE_PREFIX_ATTR = "lisa_line_prefix"
+
 
 class Logger(logging.Logger):
     def lines(
@@ -30,6 +37,12 @@ class Logger(logging.Logger):
             for key, value in content.items():
                 temp_content.append(f"{key}: {value}")
             content = temp_content
+        if _queued_writer:
+            # filter lines on the writer thread.
+            for line in content:
+                if line and not line.isspace():
+                    self.log(level, line, extra={_LINE_PREFIX_ATTR: prefix})
+            return
         for line in content:
             line = filter_ansi_escape(line)
             # No good in logging empty lines (and they can happen via
@@ -54,8 +67,10 @@ class Logger(logging.Logger):
         """
         Low-level log implementation, proxied to allow nested logger adapters.
         """
-        msg = self._filter_secrets(msg)
-        args = self._filter_secrets(args)
+        # if it's queued, secrets are masked on the writer thread.
+        if not _queued_writer:
+            msg = _filter_secrets(msg)
+            args = _filter_secrets(args)
 
         return super()._log(
             level,
@@ -67,23 +82,6 @@ class Logger(logging.Logger):
             stacklevel=stacklevel,
         )
 
-    def _filter_secrets(self, value: Any) -> Any:
-        if isinstance(value, str):
-            value = mask(value)
-        elif isinstance(value, Exception):
-            value_args = list(value.args)
-            for index, arg_item in enumerate(value.args):
-                if isinstance(value_args[index], str):
-                    value_args[index] = mask(arg_item)
-            value.args = tuple(value_args)
-        elif isinstance(value, tuple):
-            value_list = self._filter_secrets(list(value))
-            value = tuple(value_list)
-        elif isinstance(value, list):
-            for index, item in enumerate(value):
-                value[index] = self._filter_secrets(item)
-        return value
-
     def warn_or_raise(self, raise_error: bool, message: str) -> None:
         if raise_error:
             raise LisaException(message)
@@ -95,22 +93,158 @@ class LogWriter(object):
     def __init__(self, logger: Logger, level: int):
         self._level = level
         self._log = logger
-        self._buffer: str = ""
+        self._buffer: List[str] = []
 
     def write(self, message: str) -> None:
-        self._buffer = "".join([self._buffer, message])
+        self._buffer.append(message)
         if "\n" in message:
             self.flush()
 
     def flush(self) -> None:
-        if len(self._buffer) > 0:
-            self._log.lines(self._level, self._buffer)
-            self._buffer = ""
+        if self._buffer:
+            buffer = "".join(self._buffer)
+            self._buffer = []
+            self._log.lines(self._level, buffer)
 
     def close(self) -> None:
         self.flush()
 
 
+def _filter_secrets(value: Any) -> Any:
+    if isinstance(value, str):
+        value = mask(value)
+    elif isinstance(value, Exception):
+        value_args = list(value.args)
+        for index, arg_item in enumerate(value.args):
+            if isinstance(value_args[index], str):
+                value_args[index] = mask(arg_item)
+        value.args = tuple(value_args)
+    elif isinstance(value, tuple):
+        value_list = _filter_secrets(list(value))
+        value = tuple(value_list)
+    elif isinstance(value, list):
+        for index, item in enumerate(value):
+            value[index] = _filter_secrets(item)
+    return value
+
+
+class _QueueHandler(logging.Handler):
+    def __init__(self, queue: "Queue[Any]") -> None:
+        super().__init__()
+        self._queue = queue
+
+    def createLock(self) -> None:  # noqa: N802
+        # the queue is thread safe, so it doesn't need to lock on emitting.
+        self.lock = None
+
+    def emit(self, record: logging.LogRecord) -> None:
+        # it blocks, if the queue is full. So the writer is not overwhelmed.
+        self._queue.put(record)
+
+
+class QueuedLogWriter:
+    """
+    It's opt-in. Log records are put into a bounded queue, and a writer thread
+    masks secrets, filters ansi escapes, formats and writes them. Handlers are
+    routed by logger names, so a handler of a logger receives records of the
+    logger and its children, without adding it to shared loggers.
+    """
+
+    def __init__(self, max_size: int = 10000) -> None:
+        self._max_size = max_size
+        self._queue: "Queue[Any]" = Queue(maxsize=max_size)
+        self.handler = _QueueHandler(self._queue)
+        self._routes: Dict[str, List[logging.Handler]] = {}
+        self._routes_lock = Lock()
+        self._is_closed = False
+        self._start_thread()
+        # the writer thread doesn't exist in forked processes.
+        os.register_at_fork(after_in_child=self._on_forked)
+
+    def _start_thread(self) -> None:
+        self._thread = Thread(target=self._process, name="log writer", daemon=True)
+        self._thread.start()
+
+    def _on_forked(self) -> None:
+        if self._is_closed:
+            return
+        # the queue may be locked by other threads on forking, so use a new one.
+        self._queue = Queue(maxsize=self._max_size)
+        self.handler._queue = self._queue
+        self._start_thread()
+
+    def add_route(self, name: str, handler: logging.Handler) -> None:
+        with self._routes_lock:
+            # copy on write, so the writer thread reads them without locking.
+            routes = self._routes.copy()
+            routes[name] = routes.get(name, []) + [handler]
+            self._routes = routes
+
+    def remove_route(self, name: str, handler: logging.Handler) -> None:
+        # write all records before the handler is removed.
+        self.flush()
+        with self._routes_lock:
+            routes = self._routes.copy()
+            handlers = [x for x in routes.get(name, []) if x is not handler]
+            if handlers:
+                routes[name] = handlers
+            else:
+                routes.pop(name, None)
+            self._routes = routes
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """
+        wait until records, which are logged before this call, are written.
+        """
+        if not self._thread.is_alive():
+            return
+        event = Event()
+        self._queue.put(event)
+        event.wait(timeout)
+
+    def close(self) -> None:
+        self._is_closed = True
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+    def _process(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            if isinstance(item, Event):
+                item.set()
+                continue
+            try:
+                self._write(item)
+            except Exception:
+                # the writer thread must not be broken by a bad record.
+                self.handler.handleError(item)
+
+    def _write(self, record: logging.LogRecord) -> None:
+        prefix: Optional[str] = getattr(record, _LINE_PREFIX_ATTR, None)
+        if prefix is not None:
+            line = filter_ansi_escape(record.msg)
+            if not line or line.isspace():
+                return
+            record.msg = f"{prefix}{line}"
+        record.msg = _filter_secrets(record.msg)
+        record.args = _filter_secrets(record.args)
+
+        routes = self._routes
+        name = record.name
+        while True:
+            for handler in routes.get(name, []):
+                if record.levelno >= handler.level:
+                    handler.handle(record)
+            if "." not in name:
+                break
+            name = name.rsplit(".", 1)[0]
+
+
+_queued_writer: Optional[QueuedLogWriter] = None
+
 _get_root_logger = partial(logging.getLogger, DEFAULT_LOG_NAME)
 
 _format = logging.Formatter(
@@ -136,6 +270,43 @@ def init_logger() -> None:
     sys.stderr = cast(TextIO, LogWriter(stderr_logger, logging.ERROR))
 
 
+def enable_queued_writer(max_size: int = 10000) -> None:
+    """
+    Move handlers of the root logger to the queued writer, and new handlers
+    are added as routes of it.
+    """
+    global _queued_writer
+    if _queued_writer:
+        return
+    writer = QueuedLogWriter(max_size=max_size)
+    root_logger = _get_root_logger()
+    for handler in root_logger.handlers[:]:
+        root_logger.removeHandler(handler)
+        writer.add_route(root_logger.name, handler)
+    root_logger.addHandler(writer.handler)
+    _queued_writer = writer
+    atexit.register(disable_queued_writer)
+
+
+def disable_queued_writer() -> None:
+    global _queued_writer
+    writer = _queued_writer
+    if not writer:
+        return
+    _queued_writer = None
+    root_logger = _get_root_logger()
+    root_logger.removeHandler(writer.handler)
+    # write queued records, and then restore handlers of the root logger.
+    writer.close()
+    for handler in writer._routes.get(root_logger.name, []):
+        root_logger.addHandler(handler)
+
+
+def flush_queued_writer() -> None:
+    if _queued_writer:
+        _queued_writer.flush()
+
+
 def enable_console_timestamp() -> None:
     _console_handler.setFormatter(_format)
 
@@ -155,7 +326,10 @@ def add_handler(
     if not formatter:
         formatter = _format
     handler.setFormatter(formatter)
-    logger.addHandler(handler)
+    if _queued_writer:
+        _queued_writer.add_route(logger.name, handler)
+    else:
+        logger.addHandler(handler)
 
 
 def remove_handler(
@@ -166,7 +340,10 @@ def remove_handler(
 
     if logger is None:
         logger = _get_root_logger()
-    logger.removeHandler(log_handler)
+    if _queued_writer:
+        _queued_writer.remove_route(logger.name, log_handler)
+    else:
+        logger.removeHandler(log_handler)
 
 
 def create_file_handler(
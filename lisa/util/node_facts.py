@@ -0,0 +1,119 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from threading import Lock
+from typing import Any, Dict, List, Optional
+
+from dataclasses_json import dataclass_json
+
+from lisa.util import constants
+from lisa.util.logger import get_logger
+
+_FILE_NAME = "node_facts.json"
+
+
+@dataclass_json()
+@dataclass
+class NodeFacts:
+    # The facts are valid, only if the stamp matches the node. It includes the
+    # kernel release, so the facts are invalid once the kernel is changed.
+    stamp: str = ""
+    updated_time: float = 0
+    # type name of the detected operating system
+    os_type: str = ""
+    os_information: Dict[str, str] = field(default_factory=dict)
+    # tool name: [exists, use sudo]
+    tools: Dict[str, List[bool]] = field(default_factory=dict)
+
+
+class NodeFactsCache:
+    """
+    Node facts, like operating system and existence of builtin tools, are saved
+    across runs. So new nodes with the same image and vm size don't need to probe
+    them again.
+    """
+
+    def __init__(self, path: Path, ttl: float) -> None:
+        self._path = path
+        self._ttl = ttl
+        self._lock = Lock()
+        self._facts: Optional[Dict[str, NodeFacts]] = None
+        self._log = get_logger("node_facts")
+
+    def get(self, key: str, stamp: str) -> Optional[NodeFacts]:
+        with self._lock:
+            facts = self._load().get(key, None)
+        if facts is None:
+            return None
+        if facts.stamp != stamp:
+            self._log.debug(f"stamp changed, ignored cached facts of '{key}'")
+            return None
+        if time.time() - facts.updated_time > self._ttl:
+            self._log.debug(f"cached facts of '{key}' are timeout")
+            return None
+        return facts
+
+    def save(self, key: str, facts: NodeFacts) -> None:
+        # the ttl starts from the facts are probed, so loaded facts keep the time.
+        if not facts.updated_time:
+            facts.updated_time = time.time()
+        with self._lock:
+            # reload, because other runs may update the file.
+            self._facts = None
+            self._load()[key] = facts
+            self._write()
+
+    def remove(self, key: str) -> None:
+        with self._lock:
+            self._facts = None
+            if self._load().pop(key, None):
+                self._write()
+
+    def _load(self) -> Dict[str, NodeFacts]:
+        if self._facts is None:
+            self._facts = {}
+            if self._path.exists():
+                try:
+                    with open(self._path, "r") as f:
+                        loaded_data: Dict[str, Any] = json.load(f)
+                    for key, value in loaded_data.items():
+                        self._facts[key] = NodeFacts.schema().load(  # type: ignore
+                            value
+                        )
+                except Exception as identifier:
+                    # if schema changed, There may be exception, ignore the cache.
+                    self._log.debug(f"error on loading node facts: {identifier}")
+                    self._facts = {}
+        return self._facts
+
+    def _write(self) -> None:
+        assert self._facts is not None
+        data = {
+            key: value.to_dict() for key, value in self._facts.items()  # type: ignore
+        }
+        # write to a temp file and then rename it, so other runs never read a
+        # partial file.
+        temp_path = self._path.with_name(f"{self._path.name}.{os.getpid()}.tmp")
+        with open(temp_path, "w") as f:
+            json.dump(data, f)
+        temp_path.replace(self._path)
+
+
+_cache: Optional[NodeFactsCache] = None
+
+
+def enable_cache(ttl: float) -> None:
+    """
+    It's opt-in. ttl is in seconds.
+    """
+    global _cache
+    _cache = NodeFactsCache(constants.CACHE_PATH.joinpath(_FILE_NAME), ttl)
+
+
+def get_cache() -> Optional[NodeFactsCache]:
+    return _cache
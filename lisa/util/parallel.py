@@ -2,7 +2,7 @@
 # Licensed under the MIT license.
 
 from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
-from typing import Any, Callable, Generic, List, Optional, TypeVar
+from typing import Any, Callable, Dict, Generic, List, Optional, TypeVar
 
 from . import LisaException
 
@@ -54,6 +54,59 @@ class TaskManager(Generic[T_RESULT]):
         return len(self._futures) > 0
 
 
+class ParallelException(LisaException):
+    """
+    It includes all errors of failed tasks, and the key is the task name.
+    """
+
+    def __init__(self, errors: Dict[str, Exception]) -> None:
+        self.errors = errors
+        messages = [
+            f"[{name}] {error.__class__.__name__}: {error}"
+            for name, error in errors.items()
+        ]
+        super().__init__(f"{len(errors)} task(s) failed. {'; '.join(messages)}")
+
+
+def run_in_parallel(
+    tasks: Dict[str, Callable[[], T_RESULT]], max_workers: int = 8
+) -> Dict[str, T_RESULT]:
+    """
+    Run named tasks on a bounded thread pool, and wait all of them are completed.
+    Results are in the order of tasks. If one task fails, its exception is
+    raised as is. If more tasks fail, ParallelException is raised with errors of
+    all failed tasks, and the order is the same as tasks.
+    """
+    results: Dict[str, T_RESULT] = {}
+    errors: Dict[str, Exception] = {}
+    if len(tasks) <= 1:
+        # no need to create threads for one task.
+        for name, task in tasks.items():
+            try:
+                results[name] = task()
+            except Exception as identifier:
+                errors[name] = identifier
+    else:
+        with ThreadPoolExecutor(
+            max_workers=min(max_workers, len(tasks)), thread_name_prefix="parallel"
+        ) as pool:
+            futures = {name: pool.submit(task) for name, task in tasks.items()}
+        for name, future in futures.items():
+            exception = future.exception()
+            if exception:
+                assert isinstance(exception, Exception)
+                errors[name] = exception
+            else:
+                results[name] = future.result()
+
+    if len(errors) == 1:
+        # keep the type of the only error, so callers can handle it.
+        raise next(iter(errors.values()))
+    if errors:
+        raise ParallelException(errors)
+    return results
+
+
 _default_task_manager: Optional[TaskManager[Any]] = None
 
 
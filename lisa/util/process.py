@@ -6,9 +6,10 @@ import pathlib
 import shlex
 import signal
 import subprocess
-import time
+import uuid
+from collections import deque
 from dataclasses import dataclass
-from typing import Dict, List, Optional, Union
+from typing import Deque, Dict, List, Optional, TextIO, Union
 
 import spur  # type: ignore
 from assertpy.assertpy import AssertionBuilder, assert_that
@@ -18,6 +19,9 @@ from lisa.util.logger import Logger, LogWriter, get_logger
 from lisa.util.perf_timer import create_timer
 from lisa.util.shell import Shell
 
+# it's between the head and tail of an output, which is too large to keep.
+_OUTPUT_OMITTED_MARK = "\n...(omitted, full output is in file)...\n"
+
 
 @dataclass
 class ExecutableResult:
@@ -26,10 +30,20 @@ class ExecutableResult:
     exit_code: Optional[int]
     cmd: Union[str, List[str]]
     elapsed: float
+    # If the output is larger than the limit of capture, the full output is
+    # saved to the file, and stdout or stderr keeps the head and tail only.
+    stdout_path: Optional[pathlib.Path] = None
+    stderr_path: Optional[pathlib.Path] = None
 
     def __str__(self) -> str:
         return self.stdout
 
+    def get_full_stdout(self) -> str:
+        return _read_full_output(self.stdout, self.stdout_path)
+
+    def get_full_stderr(self) -> str:
+        return _read_full_output(self.stderr, self.stderr_path)
+
     def assert_exit_code(
         self, expected_exit_code: int = 0, message: str = ""
     ) -> AssertionBuilder:
@@ -43,6 +57,77 @@ class ExecutableResult:
         return assert_that(self.stderr, message).is_equal_to(expected_stderr)
 
 
+def _read_full_output(output: str, path: Optional[pathlib.Path]) -> str:
+    if not path:
+        return output
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read().strip()
+
+
+class _OutputCapture:
+    """
+    It passes output to the log writer, and keeps it in memory. If the max size
+    is set and the output is larger than it, the full output is spilled to the
+    file, and only the head and tail are kept in memory.
+    """
+
+    # let the shell know the output is kept here, so it doesn't keep it again.
+    keeps_output = True
+
+    def __init__(
+        self, writer: LogWriter, max_size: int, path: Optional[pathlib.Path]
+    ) -> None:
+        self._writer = writer
+        self._max_size = max_size
+        # the size of head and tail, if it's spilled.
+        self._half_size = max(max_size // 2, 1)
+        self._path = path
+        self._head: List[str] = []
+        self._head_size = 0
+        self._tail: Deque[str] = deque()
+        self._tail_size = 0
+        self._file: Optional[TextIO] = None
+
+    @property
+    def path(self) -> Optional[pathlib.Path]:
+        return self._path if self._file else None
+
+    @property
+    def text(self) -> str:
+        if not self._file:
+            return "".join(self._head)
+        return "".join(["".join(self._head), _OUTPUT_OMITTED_MARK, "".join(self._tail)])
+
+    def write(self, message: str) -> None:
+        self._writer.write(message)
+        if self._file:
+            self._file.write(message)
+            self._tail.append(message)
+            self._tail_size += len(message)
+            while self._tail_size - len(self._tail[0]) >= self._half_size:
+                self._tail_size -= len(self._tail.popleft())
+            return
+
+        self._head.append(message)
+        self._head_size += len(message)
+        if self._max_size and self._path and self._head_size > self._max_size:
+            self._spill()
+
+    def close(self) -> None:
+        self._writer.close()
+        if self._file:
+            self._file.close()
+
+    def _spill(self) -> None:
+        assert self._path
+        self._file = open(self._path, "w", encoding="utf-8")
+        head = "".join(self._head)
+        self._file.write(head)
+        self._head = [head[: self._half_size]]
+        self._tail = deque([head[-self._half_size :]])
+        self._tail_size = len(self._tail[0])
+
+
 # TODO: So much cleanup here. It was using duck typing.
 class Process:
     def __init__(
@@ -69,9 +154,15 @@ class Process:
         new_envs: Optional[Dict[str, str]] = None,
         no_error_log: bool = False,
         no_info_log: bool = False,
+        max_output_size: int = 0,
+        output_path: Optional[pathlib.Path] = None,
     ) -> None:
         """
         command include all parameters also.
+
+        max_output_size: the max size of stdout or stderr in memory, 0 means no
+            limit. If it's exceeded, the output is spilled to a file in the
+            output_path.
         """
         stdout_level = logging.INFO
         stderr_level = logging.ERROR
@@ -82,8 +173,19 @@ class Process:
 
         self.stdout_logger = get_logger("stdout", parent=self._log)
         self.stderr_logger = get_logger("stderr", parent=self._log)
-        self._stdout_writer = LogWriter(logger=self.stdout_logger, level=stdout_level)
-        self._stderr_writer = LogWriter(logger=self.stderr_logger, level=stderr_level)
+        # the id of process is random and may be duplicated, so the file name
+        # is made unique by uuid.
+        file_prefix = f"cmd-{self._id_}-{uuid.uuid4().hex[:8]}"
+        self._stdout_writer = _OutputCapture(
+            LogWriter(logger=self.stdout_logger, level=stdout_level),
+            max_size=max_output_size,
+            path=output_path / f"{file_prefix}-stdout.log" if output_path else None,
+        )
+        self._stderr_writer = _OutputCapture(
+            LogWriter(logger=self.stderr_logger, level=stderr_level),
+            max_size=max_output_size,
+            path=output_path / f"{file_prefix}-stderr.log" if output_path else None,
+        )
 
         # command may be Path object, convert it to str
         command = str(command)
@@ -142,15 +244,13 @@ class Process:
             self._log.log(stderr_level, f"not found command: {identifier}")
 
     def wait_result(self, timeout: float = 600) -> ExecutableResult:
-        timer = create_timer()
-
-        while self.is_running() and timeout >= timer.elapsed(False):
-            time.sleep(0.01)
-
-        if timeout < timer.elapsed():
-            if self._process is not None:
+        if self.is_running():
+            self._wait_exit(timeout)
+            # the wait is bounded, and may return a bit earlier than the timeout,
+            # so check the process itself.
+            if self.is_running():
                 self._log.info(f"timeout in {timeout} sec, and killed")
-            self.kill()
+                self.kill()
 
         if self._result is None:
             assert self._process
@@ -159,11 +259,13 @@ class Process:
             self._stderr_writer.close()
             # cache for future queries, in case it's queried twice.
             self._result = ExecutableResult(
-                process_result.output.strip(),
-                process_result.stderr_output.strip(),
+                self._stdout_writer.text.strip(),
+                self._stderr_writer.text.strip(),
                 process_result.return_code,
                 self._cmd,
                 self._timer.elapsed(),
+                stdout_path=self._stdout_writer.path,
+                stderr_path=self._stderr_writer.path,
             )
             # TODO: The spur library is not very good and leaves open
             # resources (probably due to it starting the process with
@@ -201,6 +303,22 @@ class Process:
                 # the value is different between windows and posix
                 self._process.send_signal(signal.SIGTERM)
 
+    def _wait_exit(self, timeout: float) -> None:
+        """
+        Block until the process exits or timeout. It wakes up on the exit
+        notification, instead of polling the status.
+        """
+        if isinstance(self._process, spur.ssh.SshProcess):
+            # the event is set, when the exit status is received or the channel
+            # is closed.
+            self._process._channel.status_event.wait(timeout)
+        elif isinstance(self._process, spur.local.LocalProcess):
+            popen: subprocess.Popen[str] = self._process._subprocess
+            try:
+                popen.wait(timeout)
+            except subprocess.TimeoutExpired:
+                pass
+
     def is_running(self) -> bool:
         if self._running and self._process:
             self._running = self._process.is_running()
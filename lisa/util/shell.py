@@ -7,13 +7,13 @@ import shutil
 import socket
 import sys
 from pathlib import Path, PurePath
+from threading import Lock, Thread
 from time import sleep
 from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple, Union, cast
 
 import paramiko
 import spur  # type: ignore
 import spurplus  # type: ignore
-from func_timeout import FunctionTimedOut, func_set_timeout  # type: ignore
 from paramiko.ssh_exception import SSHException
 from retry import retry
 
@@ -65,12 +65,15 @@ class ConnectionInfo:
         username: str = "root",
         password: Optional[str] = "",
         private_key_file: Optional[str] = None,
+        max_sessions: int = 10,
     ) -> None:
         self.address = address
         self.port = port
         self.username = username
         self.password = password
         self.private_key_file = private_key_file
+        # it should be the same as MaxSessions of sshd on the node.
+        self.max_sessions = max_sessions
 
         if not self.password and not self.private_key_file:
             raise LisaException(
@@ -88,6 +91,11 @@ class ConnectionInfo:
 
         if not self.username:
             raise LisaException("username must be set")
+        if self.max_sessions < 2:
+            raise LisaException(
+                f"max_sessions must be at least 2, one for sftp and others for "
+                f"commands, actual: {self.max_sessions}"
+            )
 
     def __str__(self) -> str:
         return f"{self.username}@{self.address}:{self.port}"
@@ -139,48 +147,328 @@ class WindowsShellType(object):
 
 # retry strategy is the same as spurplus.connect_with_retries.
 @retry(Exception, tries=3, delay=1, logger=None)  # type: ignore
-def try_connect(connection_info: ConnectionInfo) -> Any:
+def try_connect(connection_info: ConnectionInfo) -> Tuple[paramiko.SSHClient, str]:
+    """
+    return the connected client, and the first line of the probing output. The
+    client is reused by the shell, so it doesn't need to connect again.
+    """
     # spur always run a posix command and will fail on Windows.
     # So try with paramiko firstly.
     paramiko_client = paramiko.SSHClient()
     paramiko_client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
 
-    paramiko_client.connect(
-        hostname=connection_info.address,
-        port=connection_info.port,
-        username=connection_info.username,
-        password=connection_info.password,
-        key_filename=connection_info.private_key_file,
-        banner_timeout=10,
-    )
-    stdin, stdout, _ = paramiko_client.exec_command("cmd\n")
-    # Flush commands and prevent more writes
-    stdin.flush()
-
-    # Give it some time to process the command, otherwise reads on
-    # stdout on calling contexts have been seen having empty strings
-    # from stdout, on Windows. There is a certain 3s penalty on Linux
-    # systems, as it's never ready for that (inexisting) command, but
-    # that should only happen once per node (not per command)
-    tries = 3
-    while not stdout.channel.recv_ready() and tries:
-        sleep(1)
-        tries -= 1
-
-    stdin.channel.shutdown_write()
-    paramiko_client.close()
-
-    return stdout
+    try:
+        paramiko_client.connect(
+            hostname=connection_info.address,
+            port=connection_info.port,
+            username=connection_info.username,
+            password=connection_info.password,
+            key_filename=connection_info.private_key_file,
+            banner_timeout=10,
+        )
+        stdin, stdout, _ = paramiko_client.exec_command("cmd\n")
+        # Flush commands and prevent more writes
+        stdin.flush()
+
+        # Give it some time to process the command, otherwise reads on
+        # stdout on calling contexts have been seen having empty strings
+        # from stdout, on Windows. The 'cmd' doesn't exist on Linux, so the
+        # channel exits soon, and it doesn't need to wait until timeout.
+        channel = stdout.channel
+        timer = create_timer()
+        while (
+            not channel.recv_ready()
+            and not channel.exit_status_ready()
+            and timer.elapsed(False) < 3
+        ):
+            channel.status_event.wait(0.1)
+
+        stdin.channel.shutdown_write()
+
+        # Some windows doesn't end the text stream, so read first line only.
+        # it's  enough to detect os.
+        channel.settimeout(1)
+        try:
+            stdout_content = stdout.readline()
+        except socket.timeout:
+            stdout_content = ""
+        channel.close()
+    except Exception:
+        paramiko_client.close()
+        raise
+
+    return paramiko_client, stdout_content
 
 
 # paramiko stuck on get command output of 'fortinet' VM, and spur hide timeout of
-# exec_command. So use an external timeout wrapper to force timeout.
+# exec_command. So the channel times out, until the command is started.
 # some images needs longer time to set up ssh connection.
 # e.g. Oracle Oracle-Linux 7.5 7.5.20181207
 # e.g. qubole-inc qubole-data-service default-img 0.7.4
-@func_set_timeout(20)  # type: ignore
-def _spawn_ssh_process(shell: spur.ssh.SshShell, **kwargs: Any) -> spur.ssh.SshProcess:
-    return shell.spawn(**kwargs)
+_SPAWN_TIMEOUT = 20
+# if all channels are taken by long running commands, new commands fail after
+# waiting for this time, instead of being blocked forever.
+_CHANNEL_WAIT_TIMEOUT = 120
+_KEEPALIVE_INTERVAL = 30
+
+
+class _SpurSshShell(spur.ssh.SshShell):  # type: ignore
+    """
+    It keeps one transport per node, which is shared by the os probing, sftp and
+    command channels. Compare to spur, it limits concurrent channels, checks the
+    connection by keepalive, and uses channel timeout instead of a thread per
+    command to detect stuck shells.
+    """
+
+    def __init__(
+        self, client: paramiko.SSHClient, max_channels: int, **kwargs: Any
+    ) -> None:
+        super().__init__(**kwargs)
+        self._client: Optional[paramiko.SSHClient] = client
+        transport = client.get_transport()
+        assert transport
+        transport.set_keepalive(_KEEPALIVE_INTERVAL)
+
+        self._max_channels = max_channels
+        self._channels: List[paramiko.Channel] = []
+        # the count of channels, which are opening out of the lock.
+        self._opening_count = 0
+        self._channels_lock = Lock()
+        self._transport_lock = Lock()
+
+    def spawn(
+        self, command: Sequence[str], *args: Any, **kwargs: Any
+    ) -> spur.ssh.SshProcess:
+        stdout = kwargs.pop("stdout", None)
+        stderr = kwargs.pop("stderr", None)
+        allow_error = kwargs.pop("allow_error", False)
+        store_pid = kwargs.pop("store_pid", False)
+        use_pty = kwargs.pop("use_pty", False)
+        encoding = kwargs.pop("encoding", None)
+        cwd = kwargs.get("cwd")
+        command_in_cwd = self._shell_type.generate_run_command(
+            command, *args, store_pid=store_pid, **kwargs
+        )
+
+        channel = self._open_channel()
+        try:
+            channel.settimeout(_SPAWN_TIMEOUT)
+            if use_pty:
+                channel.get_pty()
+            channel.exec_command(command_in_cwd)
+            process_stdout = channel.makefile("rb")
+
+            if store_pid:
+                pid = _read_int_initialization_line(process_stdout)
+
+            if cwd is not None:
+                cd_output: List[bytes] = []
+                while True:
+                    line = _read_initialization_line(process_stdout)
+                    if line.strip() == b"spur-cd: 0":
+                        break
+                    elif line.startswith(b"spur-cd: "):
+                        raise spur.errors.CouldNotChangeDirectoryError(
+                            cwd, b"".join(cd_output)
+                        )
+                    cd_output.append(line)
+
+            if self._shell_type.supports_which:
+                which_return_code = _read_int_initialization_line(process_stdout)
+                if which_return_code != 0:
+                    raise spur.errors.NoSuchCommandError(command[0])
+
+            # the command is started, so it can run as long as it needs.
+            channel.settimeout(None)
+            if _is_background_command(command):
+                # the shell exits soon, and the command keeps running without
+                # the channel, so it doesn't take a channel of others.
+                self._release_channel(channel)
+        except socket.timeout:
+            channel.close()
+            raise LisaException(
+                f"The remote node is timeout on execute {command}. "
+                f"It may be caused by paramiko/spur not support the shell of node."
+            )
+        except Exception:
+            channel.close()
+            raise
+
+        process = _SpurSshProcess(
+            channel,
+            allow_error=allow_error,
+            process_stdout=process_stdout,
+            stdout=stdout,
+            stderr=stderr,
+            encoding=encoding,
+            shell=self,
+        )
+        if store_pid:
+            process.pid = pid
+
+        return process
+
+    def _get_ssh_transport(self) -> paramiko.Transport:
+        # the lock prevents threads from reconnecting at the same time.
+        with self._transport_lock:
+            transport: paramiko.Transport = super()._get_ssh_transport()
+            if not transport.is_active():
+                # the keepalive found the connection is broken, for example, the
+                # node is rebooted. So connect again.
+                assert self._client
+                self._client.close()
+                self._client = None
+                transport = super()._get_ssh_transport()
+                transport.set_keepalive(_KEEPALIVE_INTERVAL)
+            return transport
+
+    def _open_channel(self) -> paramiko.Channel:
+        transport = self._get_ssh_transport()
+        timer = create_timer()
+        while True:
+            with self._channels_lock:
+                self._channels = [
+                    x
+                    for x in self._channels
+                    if not x.closed and not x.exit_status_ready()
+                ]
+                is_reserved = (
+                    len(self._channels) + self._opening_count < self._max_channels
+                )
+                if is_reserved:
+                    self._opening_count += 1
+                elif self._channels:
+                    oldest_channel: Optional[paramiko.Channel] = self._channels[0]
+                else:
+                    # all channels are opening by other threads.
+                    oldest_channel = None
+            if is_reserved:
+                return self._open_reserved_channel(transport)
+            if timer.elapsed(False) > _CHANNEL_WAIT_TIMEOUT:
+                raise LisaException(
+                    f"no ssh channel is released in {_CHANNEL_WAIT_TIMEOUT} "
+                    f"seconds, all {self._max_channels} channels are taken by "
+                    f"running commands."
+                )
+            # wait for a running command exits, so its channel can be released.
+            if oldest_channel:
+                oldest_channel.status_event.wait(1)
+            else:
+                sleep(0.1)
+
+    def _open_reserved_channel(self, transport: paramiko.Transport) -> paramiko.Channel:
+        # opening a session may take long, so it's out of the lock, and the
+        # slot is reserved by the opening count.
+        channel: Optional[paramiko.Channel] = None
+        try:
+            channel = transport.open_session(timeout=_SPAWN_TIMEOUT)
+        except EOFError as identifier:
+            raise self._connection_error(identifier)
+        finally:
+            with self._channels_lock:
+                self._opening_count -= 1
+                if channel:
+                    self._channels.append(channel)
+        assert channel
+        return channel
+
+    def _release_channel(self, channel: paramiko.Channel) -> None:
+        with self._channels_lock:
+            if channel in self._channels:
+                self._channels.remove(channel)
+
+
+def _is_background_command(command: Sequence[str]) -> bool:
+    # like "nohup command &", but not "command1 && command2".
+    command_line = " ".join(command).strip()
+    return command_line.endswith("&") and not command_line.endswith("&&")
+
+
+class _OutputReader:
+    """
+    Compare to spur, it reads by lines instead of chars, and doesn't keep the
+    output again, if the writer keeps it already.
+    """
+
+    def __init__(self, file_in: Any, file_out: Any, encoding: Optional[str]) -> None:
+        self._file_in = file_in
+        self._file_out = file_out
+        self._encoding = encoding
+        self._output: List[Any] = []
+        self._thread = Thread(target=self._read, daemon=True)
+        self._thread.start()
+
+    def wait(self) -> Any:
+        self._thread.join()
+        empty: Any = "" if self._encoding else b""
+        return empty.join(self._output)
+
+    def _read(self) -> None:
+        is_kept = getattr(self._file_out, "keeps_output", False)
+        for line in iter(self._file_in.readline, b""):
+            # a line never breaks a multi-byte char.
+            output = (
+                line.decode(self._encoding, errors="replace")
+                if self._encoding
+                else line
+            )
+            if self._file_out is not None:
+                self._file_out.write(output)
+            if not is_kept:
+                self._output.append(output)
+
+
+class _OutputHandler:
+    def __init__(self, readers: List[_OutputReader]) -> None:
+        self._readers = readers
+
+    def wait(self) -> List[Any]:
+        return [x.wait() for x in self._readers]
+
+
+class _SpurSshProcess(spur.ssh.SshProcess):  # type: ignore
+    def __init__(
+        self,
+        channel: paramiko.Channel,
+        allow_error: bool,
+        process_stdout: Any,
+        stdout: Any,
+        stderr: Any,
+        encoding: Optional[str],
+        shell: _SpurSshShell,
+    ) -> None:
+        # mirror spur, except the output handler.
+        self._channel = channel
+        self._allow_error = allow_error
+        self._stdin = channel.makefile("wb")
+        self._stdout = process_stdout
+        self._stderr = channel.makefile_stderr("rb")
+        self._shell = shell
+        self._result = None
+
+        self._io = _OutputHandler(
+            [
+                _OutputReader(self._stdout, stdout, encoding),
+                _OutputReader(self._stderr, stderr, encoding),
+            ]
+        )
+
+
+def _read_initialization_line(output_file: Any) -> bytes:
+    line: bytes = output_file.readline()
+    if not line:
+        raise LisaException("the channel is closed before the command is started.")
+    return line
+
+
+def _read_int_initialization_line(output_file: Any) -> int:
+    while True:
+        line = _read_initialization_line(output_file).strip()
+        if line:
+            try:
+                return int(line)
+            except ValueError:
+                raise spur.errors.CommandInitializationError(line)
 
 
 class SshShell(InitializableMixin):
@@ -205,7 +493,7 @@ class SshShell(InitializableMixin):
                 f"error code: {tcp_error_code}"
             )
         try:
-            stdout = try_connect(self._connection_info)
+            client, stdout_content = try_connect(self._connection_info)
         except Exception as identifier:
             raise LisaException(
                 f"failed to connect SSH "
@@ -213,11 +501,6 @@ class SshShell(InitializableMixin):
                 f"{identifier.__class__.__name__}: {identifier}"
             )
 
-        # Some windows doesn't end the text stream, so read first line only.
-        # it's  enough to detect os.
-        stdout_content = stdout.readline()
-        stdout.close()
-
         if stdout_content and "Windows" in stdout_content:
             self.is_posix = False
             shell_type = WindowsShellType()
@@ -234,7 +517,13 @@ class SshShell(InitializableMixin):
             "missing_host_key": spur.ssh.MissingHostKey.accept,
         }
 
-        spur_ssh_shell = spur.SshShell(shell_type=shell_type, **spur_kwargs)
+        # the sftp client takes one session.
+        spur_ssh_shell = _SpurSshShell(
+            client=client,
+            max_channels=self._connection_info.max_sessions - 1,
+            shell_type=shell_type,
+            **spur_kwargs,
+        )
         sftp = spurplus.sftp.ReconnectingSFTP(
             sftp_opener=spur_ssh_shell._open_sftp_client
         )
@@ -269,24 +558,17 @@ class SshShell(InitializableMixin):
         self.initialize()
         assert self._inner_shell
 
-        try:
-            process: spur.ssh.SshProcess = _spawn_ssh_process(
-                self._inner_shell,
-                command=command,
-                update_env=update_env,
-                store_pid=store_pid,
-                cwd=cwd,
-                stdout=stdout,
-                stderr=stderr,
-                encoding=encoding,
-                use_pty=use_pty,
-                allow_error=allow_error,
-            )
-        except FunctionTimedOut:
-            raise LisaException(
-                f"The remote node is timeout on execute {command}. "
-                f"It may be caused by paramiko/spur not support the shell of node."
-            )
+        process: spur.ssh.SshProcess = self._inner_shell.spawn(
+            command=command,
+            update_env=update_env,
+            store_pid=store_pid,
+            cwd=cwd,
+            stdout=stdout,
+            stderr=stderr,
+            encoding=encoding,
+            use_pty=use_pty,
+            allow_error=allow_error,
+        )
         return process
 
     def mkdir(
@@ -392,6 +674,18 @@ class SshShell(InitializableMixin):
             consistent=self.is_posix,
         )
 
+    def copy_back(self, node_path: PurePath, local_path: PurePath) -> None:
+        self.initialize()
+        assert self._inner_shell
+        node_path_str = self._purepath_to_str(node_path)
+        local_path_str = self._purepath_to_str(local_path)
+        self._inner_shell.get(
+            node_path_str,
+            local_path_str,
+            create_directories=True,
+            consistent=self.is_posix,
+        )
+
     def _purepath_to_str(
         self, path: Union[Path, PurePath, str]
     ) -> Union[Path, PurePath, str]:
@@ -496,5 +790,8 @@ class LocalShell(InitializableMixin):
         assert isinstance(node_path, Path), f"actual: {type(node_path)}"
         shutil.copy(local_path, node_path)
 
+    def copy_back(self, node_path: PurePath, local_path: PurePath) -> None:
+        self.copy(node_path, local_path)
+
 
 Shell = Union[LocalShell, SshShell]
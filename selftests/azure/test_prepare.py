@@ -203,6 +203,30 @@ class AzurePrepareTestCase(TestCase):
             environment=env,
         )
 
+    def test_match_capability(self) -> None:
+        # the shortest vm size, which contains the given one, is matched.
+        location_info = self._platform._get_location_info("eastus2", self._log)
+        matched = location_info.match_capability("ds1")
+        assert matched
+        self.assertEqual("Standard_DS1_v2", matched.vm_size)
+        matched = location_info.match_capability("Standard_DS2_v2")
+        assert matched
+        self.assertEqual("Standard_DS2_v2", matched.vm_size)
+        self.assertIsNone(location_info.match_capability("not_exist"))
+
+        # it's the same as searching all vm sizes.
+        for vm_size in ["a2", "_v2", "DS", "m_v", "standard_f", "Standard_A8m_v2"]:
+            expected = min(
+                (
+                    x
+                    for x in location_info.capabilities
+                    if vm_size.lower() in x.vm_size.lower()
+                ),
+                key=lambda x: len(x.vm_size),
+                default=None,
+            )
+            self.assertIs(expected, location_info.match_capability(vm_size))
+
     def test_normal_req_in_same_location(self) -> None:
         # normal requirement will be in same location of predefined
         env = self.load_environment(node_req_count=2)
@@ -241,6 +265,31 @@ class AzurePrepareTestCase(TestCase):
             environment=env,
         )
 
+    def test_locations_loaded_lazily(self) -> None:
+        platform = platform_.AzurePlatform(schema.Platform())
+        platform._azure_runbook = platform_.AzurePlatformSchema()
+
+        # the first location meets the requirement, so others aren't loaded.
+        env = self.load_environment(node_req_count=1)
+        platform._prepare_environment(env, self._log)
+        self.assertListEqual(["westus2"], list(platform._eligible_capabilities))
+
+        # the first location misses, so a batch of following locations are
+        # loaded.
+        env = self.load_environment(node_req_count=1)
+        assert env.runbook.nodes_requirement
+        env.runbook.nodes_requirement.append(
+            schema.NodeSpace(memory_mb=search_space.IntRange(min=143360))
+        )
+        platform._prepare_environment(env, self._log)
+        self.assertListEqual(
+            platform_.LOCATIONS[: platform_._MAX_PARALLEL_LOCATIONS + 1],
+            sorted(
+                platform._eligible_capabilities,
+                key=lambda x: platform_.LOCATIONS.index(x),
+            ),
+        )
+
     def test_normal_may_fit_2nd_batch_vm(self) -> None:
         # fit 2nd batch of candidates
         env = self.load_environment(node_req_count=1)
@@ -1,15 +1,19 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
 
+import tempfile
+from pathlib import Path
 from typing import List, Optional, cast
 from unittest import TestCase
 
 import lisa
-from lisa import schema
-from lisa.environment import EnvironmentStatus, load_environments
+from lisa import environment_pool, schema
+from lisa.environment import Environment, EnvironmentStatus, load_environments
+from lisa.environment_pool import EnvironmentPool
+from lisa.runner import split_concurrency
 from lisa.runners.lisa_runner import LisaRunner
 from lisa.testsuite import TestResult, TestStatus, simple_requirement
-from lisa.util import LisaException, constants
+from lisa.util import LisaException, checkpoint, constants
 from selftests import test_platform, test_testsuite
 from selftests.test_environment import generate_runbook as generate_env_runbook
 
@@ -44,6 +48,12 @@ def generate_runner(
     return runner
 
 
+class MockEnvironmentPool(EnvironmentPool):
+    def _prepare_leased(self, environment: Environment) -> bool:
+        # nodes are mocked, so they cannot be checked.
+        return True
+
+
 class RunnerTestCase(TestCase):
     __skipped_no_env = "no available environment"
 
@@ -52,6 +62,8 @@ class RunnerTestCase(TestCase):
 
     def tearDown(self) -> None:
         test_testsuite.cleanup_cases_metadata()  # Necessary side effects!
+        test_testsuite.fail_on_before_suite = False
+        checkpoint._checkpoint = None
 
     def test_merge_req_create_on_new(self) -> None:
         # if no predefined envs, can generate from requirement
@@ -557,6 +569,203 @@ class RunnerTestCase(TestCase):
             test_results=test_results,
         )
 
+    def test_scheduling_index_updated_by_status(self) -> None:
+        # completed results are removed from scheduling queues by status
+        # changes, so the runner doesn't need to rescan all results.
+        test_testsuite.generate_cases_metadata()
+        env_runbook = generate_env_runbook(is_single_env=True, local=True, remote=True)
+        runner = generate_runner(env_runbook)
+        runner.initialize()
+        self.assertListEqual(
+            ["mock_ut1", "mock_ut2", "mock_ut3"],
+            [x.runtime_data.metadata.name for x in runner._get_pending_results()],
+        )
+
+        runner.test_results[1].set_status(TestStatus.SKIPPED, "skipped by ut")
+        runner._update_scheduling_index()
+        self.assertListEqual(
+            ["mock_ut1", "mock_ut3"],
+            [x.runtime_data.metadata.name for x in runner._get_pending_results()],
+        )
+
+        while not runner.is_done:
+            task = runner.fetch_task()
+            if task:
+                task()
+        self.assertDictEqual({}, runner._pending_results)
+        self.assertListEqual(
+            [TestStatus.PASSED, TestStatus.SKIPPED, TestStatus.PASSED],
+            [x.status for x in runner.test_results],
+        )
+
+    def test_env_reused_by_pool(self) -> None:
+        # environments are released to the pool by the first runner, and reused
+        # by the second runner without deploying.
+        test_testsuite.generate_cases_metadata()
+        pool = MockEnvironmentPool(ttl=60, max_idle=60, reset=False)
+        environment_pool._pool = pool
+        self.addCleanup(setattr, environment_pool, "_pool", None)
+
+        first_runner = generate_runner()
+        self._run_all_tests(first_runner)
+        first_runner.close()
+        deployed_envs = cast(
+            test_platform.MockPlatform, first_runner.platform
+        ).test_data.deployed_envs
+        self.verify_env_results(
+            expected_prepared=["generated_0", "generated_1", "generated_2"],
+            expected_deployed_envs=deployed_envs,
+            expected_deleted_envs=[],
+            runner=first_runner,
+        )
+        self.assertEqual(len(deployed_envs), pool.count)
+
+        second_runner = generate_runner()
+        test_results = self._run_all_tests(second_runner)
+        second_runner.close()
+        self.assertListEqual([TestStatus.PASSED] * 3, [x.status for x in test_results])
+        self.assertListEqual(
+            deployed_envs,
+            sorted({x.environment.name for x in test_results if x.environment}),
+        )
+        self.verify_env_results(
+            expected_prepared=["generated_3", "generated_4", "generated_5"],
+            expected_deployed_envs=[],
+            expected_deleted_envs=[],
+            runner=second_runner,
+        )
+
+        # pooled environments are deleted by the platform, which deployed them.
+        pool.clear()
+        self.assertEqual(0, pool.count)
+        self.assertListEqual(
+            deployed_envs,
+            sorted(
+                cast(
+                    test_platform.MockPlatform, first_runner.platform
+                ).test_data.deleted_envs
+            ),
+        )
+
+    def test_env_deployed_ahead(self) -> None:
+        # when an environment is in use, the environment for cases, which
+        # cannot run on it, is deployed ahead, and used without deploying again.
+        test_testsuite.generate_cases_metadata()
+        runner = generate_runner()
+        runner._runbook.predeploy_count = 1
+        runner.initialize()
+
+        deploy_task = runner.fetch_task()
+        assert deploy_task
+        runner._predeploy_environments()
+        self.assertEqual(1, len(runner._predeploy_futures))
+        runner._predeploy_futures[0].result()
+        platform = cast(test_platform.MockPlatform, runner.platform)
+        self.assertListEqual(["generated_2"], platform.test_data.deployed_envs)
+        # the count of deployed ahead environments is limited.
+        runner._predeploy_environments()
+        self.assertEqual(0, len([x for x in runner._predeploy_futures if not x.done()]))
+
+        test_results = deploy_task()
+        while not runner.is_done:
+            task = runner.fetch_task()
+            if task:
+                test_results.extend(task())
+        runner.close()
+
+        self.verify_test_results(
+            expected_test_order=["mock_ut1", "mock_ut2", "mock_ut3"],
+            expected_envs=["generated_0", "generated_0", "generated_2"],
+            expected_status=[TestStatus.PASSED, TestStatus.PASSED, TestStatus.PASSED],
+            expected_message=["", "", ""],
+            test_results=test_results,
+        )
+        self.assertListEqual(
+            ["generated_2", "generated_0"], platform.test_data.deployed_envs
+        )
+
+    def test_env_deployed_ahead_wait_more_resource(self) -> None:
+        # the environment, which waits for more resource, is not deployed ahead
+        # again at once.
+        platform_schema = test_platform.MockPlatformSchema()
+        platform_schema.wait_more_resource_error = True
+        test_testsuite.generate_cases_metadata()
+        runner = generate_runner(platform_schema=platform_schema)
+        runner._runbook.predeploy_count = 1
+        runner.initialize()
+
+        assert runner.fetch_task()
+        runner._predeploy_environments()
+        self.assertEqual(1, len(runner._predeploy_futures))
+        runner._predeploy_futures[0].result()
+        runner._predeploy_environments()
+        self.assertEqual(0, len([x for x in runner._predeploy_futures if not x.done()]))
+        runner.close()
+
+    def test_sort_by_duration(self) -> None:
+        # longer suites run earlier, and cases in a suite are kept together.
+        test_testsuite.generate_cases_metadata()
+        runner = generate_runner()
+        runner._runbook.schedule_by_duration = True
+        runner.initialize()
+        for test_result in runner.test_results:
+            runner._predicted_durations[id(test_result)] = {
+                "mock_ut1": 10,
+                "mock_ut2": 20,
+                "mock_ut3": 25,
+            }[test_result.name]
+
+        runner._sort_by_duration(runner.test_results)
+        self.assertListEqual(
+            ["mock_ut2", "mock_ut1", "mock_ut3"],
+            [x.name for x in runner.test_results],
+        )
+
+    def test_cases_split_by_shard(self) -> None:
+        # cases of a suite are in the same shard.
+        test_testsuite.generate_cases_metadata()
+        shard_names: List[List[str]] = []
+        for shard_index in range(2):
+            runner = generate_runner()
+            runner.shard_index = shard_index
+            runner.shard_count = 2
+            runner.initialize()
+            shard_names.append([x.name for x in runner.test_results])
+        self.assertListEqual(
+            [["mock_ut1", "mock_ut2"], ["mock_ut3"]],
+            shard_names,
+        )
+
+        # the total concurrency is kept.
+        self.assertListEqual([2, 2, 1], split_concurrency(5, 3))
+        self.assertListEqual([1, 1], split_concurrency(2, 4))
+
+    def test_resume_completed_cases(self) -> None:
+        test_testsuite.generate_cases_metadata()
+        with tempfile.TemporaryDirectory() as temp_dir:
+            first_path = Path(temp_dir) / "first"
+            first_path.mkdir()
+            first = checkpoint.Checkpoint(first_path / "checkpoint.jsonl")
+            first.add_result(
+                "1/MockTestSuite2.mock_ut3/0", {}, TestStatus.FAILED.name, "err"
+            )
+            first.close()
+
+            checkpoint._checkpoint = checkpoint.Checkpoint(
+                Path(temp_dir) / "checkpoint.jsonl", first_path
+            )
+            # results are identified by the combinator iteration, not the
+            # runner id, which is counted in each shard.
+            runner = generate_runner()
+            runner.iteration = 1
+            runner.initialize()
+            self.assertListEqual(
+                [TestStatus.QUEUED, TestStatus.QUEUED, TestStatus.FAILED],
+                [x.status for x in runner.test_results],
+            )
+            self.assertEqual("err", runner.test_results[2].message)
+            checkpoint._checkpoint.close()
+
     def verify_test_results(
         self,
         expected_test_order: List[str],
@@ -0,0 +1,91 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+import os
+import tempfile
+from pathlib import Path, PurePosixPath
+from unittest.case import TestCase
+
+from lisa import schema
+from lisa.node import LocalNode
+from lisa.util.artifact_cache import ArtifactCache
+
+
+class ArtifactCacheTestCase(TestCase):
+    def setUp(self) -> None:
+        self._temp_dir = tempfile.TemporaryDirectory()
+        self._root = Path(self._temp_dir.name)
+        self._cache = ArtifactCache(self._root / "cache", ttl=60)
+        self._source = self._root / "source"
+        self._source.mkdir()
+        self._source.joinpath("driver.run").write_text("driver content")
+        self._source.joinpath("sub").mkdir()
+        self._source.joinpath("sub", "file.txt").write_text("file content")
+        self._node = LocalNode(
+            schema.LocalNode(),
+            index=0,
+            logger_name="node",
+            base_log_path=self._root / "log",
+        )
+
+        os.environ["LISA_TEST_NODE"] = str(self._root / "node")
+
+    def tearDown(self) -> None:
+        os.environ.pop("LISA_TEST_NODE", None)
+        self._temp_dir.cleanup()
+
+    def test_fetch(self) -> None:
+        source = str(self._source / "driver.run")
+        path, digest = self._cache.fetch(source)
+        self.assertEqual("driver content", path.read_text())
+        # it's cached, so changes of source are not fetched before ttl.
+        self._source.joinpath("driver.run").write_text("changed")
+        self.assertEqual((path, digest), self._cache.fetch(source))
+
+        folder_path, folder_digest = self._cache.fetch(str(self._source))
+        self.assertEqual("file content", (folder_path / "sub" / "file.txt").read_text())
+        self.assertNotEqual(digest, folder_digest)
+
+    def test_deploy(self) -> None:
+        node_path = self._root / "node" / "driver.run"
+        self._cache.deploy(self._node, str(self._source / "driver.run"), node_path)
+        self.assertEqual("driver content", node_path.read_text())
+        # the changed file is copied again.
+        node_path.write_text("changed")
+        self._cache.deploy(self._node, str(self._source / "driver.run"), node_path)
+        self.assertEqual("driver content", node_path.read_text())
+
+        node_folder = self._root / "node" / "folder"
+        self._cache.deploy_to_nodes([self._node], str(self._source), node_folder)
+        self.assertEqual("file content", (node_folder / "sub" / "file.txt").read_text())
+
+    def test_deploy_expanded_path(self) -> None:
+        source = str(self._source / "driver.run")
+        node_path = self._cache.deploy(
+            self._node, source, PurePosixPath("$LISA_TEST_NODE/driver.run")
+        )
+        self.assertEqual(self._root / "node" / "driver.run", node_path)
+        self.assertEqual("driver content", Path(node_path).read_text())
+
+        # the existing file is kept, if it's not overwritten.
+        Path(node_path).write_text("changed")
+        self._cache.deploy(
+            self._node,
+            source,
+            PurePosixPath("$LISA_TEST_NODE/driver.run"),
+            overwrite=False,
+        )
+        self.assertEqual("changed", Path(node_path).read_text())
+
+    def test_deploy_quoted_path(self) -> None:
+        # the path is a literal one, so it's quoted in commands on the node.
+        node_folder = self._root / "node" / "a b;c"
+        node_path = node_folder / "driver.run"
+        self._cache.deploy(self._node, str(self._source / "driver.run"), node_path)
+        self.assertEqual("driver content", node_path.read_text())
+        self.assertTrue(self._cache._exists_on_node(self._node, node_path))
+
+        self._cache.deploy(self._node, str(self._source), node_folder / "folder")
+        self.assertTrue(
+            self._cache._check_node_manifest(self._node, node_folder / "folder")
+        )
@@ -0,0 +1,64 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+import tempfile
+from pathlib import Path
+from unittest.case import TestCase
+
+from lisa.util import LisaException
+from lisa.util.checkpoint import Checkpoint
+
+
+class CheckpointTestCase(TestCase):
+    def setUp(self) -> None:
+        self._temp_dir = tempfile.TemporaryDirectory()
+        self._first_path = Path(self._temp_dir.name) / "first"
+        self._second_path = Path(self._temp_dir.name) / "second"
+        self._first_path.mkdir()
+        self._second_path.mkdir()
+
+    def tearDown(self) -> None:
+        self._temp_dir.cleanup()
+
+    def test_resume_results(self) -> None:
+        first = Checkpoint(self._first_path / "checkpoint.jsonl")
+        first.add_result("0/a1.ut1/0", {"image": "ubuntu"}, "PASSED", "")
+        first.add_result("0/a1.ut2/0", {}, "FAILED", "error")
+        first.close()
+        # the run crashed on writing a record.
+        with open(self._first_path / "checkpoint.jsonl", "a") as f:
+            f.write('{"kind": "res')
+
+        second = Checkpoint(self._second_path / "checkpoint.jsonl", self._first_path)
+        self.assertEqual(
+            "PASSED",
+            second.get_result("0/a1.ut1/0", {"image": "ubuntu"})["status"],
+        )
+        # results of other iterations are not resumed.
+        self.assertDictEqual({}, second.get_result("0/a1.ut1/0", {"image": "centos"}))
+        self.assertEqual("error", second.get_result("0/a1.ut2/0", {})["message"])
+        self.assertDictEqual({}, second.get_result("0/a1.ut3/0", {}))
+
+        with self.assertRaises(LisaException):
+            Checkpoint(self._second_path / "checkpoint.jsonl", self._second_path)
+
+    def test_resume_environments(self) -> None:
+        first = Checkpoint(self._first_path / "checkpoint.jsonl")
+        first.add_environment("small", {"resource_group_name": "rg_0"})
+        first.add_environment("small", {"resource_group_name": "rg_1"})
+        first.add_environment("large", {"resource_group_name": "rg_2"})
+        first.remove_environment({"resource_group_name": "rg_0"})
+        first.close()
+
+        second = Checkpoint(self._second_path / "checkpoint.jsonl", self._first_path)
+        self.assertDictEqual(
+            {"resource_group_name": "rg_1"}, second.take_environment("small")
+        )
+        self.assertDictEqual({}, second.take_environment("small"))
+        second.close()
+
+        # environments not re-attached are kept for the next resume.
+        third = Checkpoint(self._first_path / "checkpoint.jsonl", self._second_path)
+        self.assertDictEqual(
+            {"resource_group_name": "rg_2"}, third.take_environment("large")
+        )
@@ -0,0 +1,40 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+import tempfile
+from pathlib import Path
+from unittest.case import TestCase
+
+from lisa.util.duration_history import DurationHistory
+
+
+class DurationHistoryTestCase(TestCase):
+    def setUp(self) -> None:
+        self._temp_dir = tempfile.TemporaryDirectory()
+        self._path = Path(self._temp_dir.name) / "durations.json"
+
+    def tearDown(self) -> None:
+        self._temp_dir.cleanup()
+
+    def test_average(self) -> None:
+        history = DurationHistory(self._path)
+        self.assertEqual(0, history.get("suite.case"))
+        history.add("suite.case", 10, vm_size="small")
+        history.add("suite.case", 20, vm_size="large")
+        self.assertEqual(10, history.get("suite.case", vm_size="small"))
+        self.assertEqual(20, history.get("suite.case", vm_size="large"))
+        # no history on the vm size, so the average of all sizes is used.
+        self.assertEqual(15, history.get("suite.case", vm_size="medium"))
+
+    def test_save(self) -> None:
+        history = DurationHistory(self._path)
+        history.add("suite.case1", 10)
+        other_history = DurationHistory(self._path)
+        other_history.add("suite.case2", 20)
+        other_history.save()
+        history.save()
+
+        # changes from different histories are kept.
+        loaded_history = DurationHistory(self._path)
+        self.assertEqual(10, loaded_history.get("suite.case1"))
+        self.assertEqual(20, loaded_history.get("suite.case2"))
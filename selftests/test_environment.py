@@ -11,10 +11,11 @@ from marshmallow import validate
 
 import lisa
 from lisa import node, schema, search_space
-from lisa.environment import load_environments
+from lisa.environment import EnvironmentHookImpl, EnvironmentStatus, load_environments
 from lisa.testsuite import simple_requirement
-from lisa.util import constants
+from lisa.util import LisaException, constants
 from lisa.util.logger import Logger
+from lisa.util.parallel import ParallelException
 
 CUSTOM_LOCAL = "custom_local"
 CUSTOM_REMOTE = "custom_remote"
@@ -272,3 +273,25 @@ class EnvironmentTestCase(TestCase):
                     self.assertEqual(r_n.custom_remote_field, CUSTOM_REMOTE)
                     done += 1
             self.assertEqual(2, done)
+
+    def test_node_errors(self) -> None:
+        runbook = generate_runbook(is_single_env=True, local=True, remote=True)
+        env = load_environments(runbook)["customized_0"]
+        env.status = EnvironmentStatus.Deployed
+        for n in env.nodes.list():
+            n._initialize = _raise_error  # type: ignore
+
+        # all failed nodes are in one error, and kept in the environment.
+        with self.assertRaises(ParallelException) as cm:
+            env.initialize()
+        self.assertListEqual(["node[0]", "node[1]"], list(cm.exception.errors))
+        self.assertListEqual(["node[0]", "node[1]"], list(env.node_errors))
+        information = EnvironmentHookImpl().get_environment_information(env)
+        self.assertIn(
+            "node[1]: failed to initialize, LisaException: mock error",
+            information["node_errors"],
+        )
+
+
+def _raise_error(*args: Any, **kwargs: Any) -> None:
+    raise LisaException("mock error")
@@ -0,0 +1,70 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+import sys
+import time
+from threading import Thread
+from typing import List
+from unittest.case import TestCase
+
+from lisa.executable import ResultCache
+from lisa.util.process import Process
+from lisa.util.shell import LocalShell
+
+
+class ResultCacheTestCase(TestCase):
+    def setUp(self) -> None:
+        shell = LocalShell()
+        shell.initialize()
+        self._processes = [Process(str(index), shell) for index in range(3)]
+
+    def test_lru(self) -> None:
+        cache = ResultCache(max_size=2)
+        cache.put("a", self._processes[0])
+        cache.put("b", self._processes[1])
+        # "a" is used recently, so "b" is dropped.
+        self.assertIs(self._processes[0], cache.get("a"))
+        cache.put("c", self._processes[2])
+        self.assertIsNone(cache.get("b"))
+        self.assertIs(self._processes[2], cache.get("c"))
+        self.assertEqual(2, len(cache))
+        self.assertEqual(2, cache.hits)
+        self.assertEqual(1, cache.misses)
+
+    def test_ttl_and_mutating(self) -> None:
+        cache = ResultCache(ttl=0.01)
+        cache.put("a", self._processes[0])
+        time.sleep(0.02)
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(0, len(cache))
+
+        self.assertTrue(cache.is_mutating("-G eth0 rx 1", force_run=True, sudo=True))
+        self.assertFalse(cache.is_mutating("-g eth0", force_run=True, sudo=False))
+
+    def test_concurrent(self) -> None:
+        cache = ResultCache(max_size=2)
+        errors: List[Exception] = []
+
+        def _use_cache(index: int) -> None:
+            try:
+                for count in range(2000):
+                    key = str(count % 3)
+                    cache.put(key, self._processes[index])
+                    cache.get(key)
+                    if count % 100 == 0:
+                        cache.clear()
+            except Exception as identifier:
+                errors.append(identifier)
+
+        # switch threads more often, so races are easier to happen.
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        threads = [Thread(target=_use_cache, args=(index,)) for index in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        sys.setswitchinterval(switch_interval)
+        self.assertListEqual([], errors)
+        self.assertLessEqual(len(cache), 2)
+        self.assertEqual(6000, cache.hits + cache.misses)
@@ -0,0 +1,38 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+from unittest import TestCase
+
+from lisa.transformers.kernel_source_installer import (
+    PatchModifierSchema,
+    RepoLocationSchema,
+    SourceInstallerSchema,
+    _get_build_key,
+)
+
+
+class BuildKeyTestCase(TestCase):
+    def test_build_key(self) -> None:
+        runbook = self._create_runbook(ref="v5.15")
+        key = _get_build_key(runbook, "CONFIG_A=y")
+        self.assertEqual(
+            key, _get_build_key(self._create_runbook("v5.15"), "CONFIG_A=y")
+        )
+
+        # the ref, patches and config make different builds.
+        self.assertNotEqual(
+            key, _get_build_key(self._create_runbook("v5.16"), "CONFIG_A=y")
+        )
+        self.assertNotEqual(key, _get_build_key(runbook, "CONFIG_A=m"))
+        patched_runbook = self._create_runbook("v5.15")
+        patched_runbook.modifier = [
+            PatchModifierSchema(type="patch", repo="https://patches.git")
+        ]
+        self.assertNotEqual(key, _get_build_key(patched_runbook, "CONFIG_A=y"))
+
+    def _create_runbook(self, ref: str) -> SourceInstallerSchema:
+        return SourceInstallerSchema(
+            type="source",
+            location=RepoLocationSchema(type="repo", ref=ref),
+            build_once=True,
+        )
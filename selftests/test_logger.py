@@ -0,0 +1,66 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+import logging
+from typing import List
+from unittest.case import TestCase
+
+from lisa.secret import add_secret, reset
+from lisa.util import logger
+from lisa.util.logger import get_logger
+
+
+class _ListHandler(logging.Handler):
+    def __init__(self) -> None:
+        super().__init__()
+        self.messages: List[str] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.messages.append(record.getMessage())
+
+
+class QueuedLogWriterTestCase(TestCase):
+    def setUp(self) -> None:
+        reset()
+        logger.enable_queued_writer(max_size=10)
+        assert logger._queued_writer
+        self._writer = logger._queued_writer
+
+    def tearDown(self) -> None:
+        logger.disable_queued_writer()
+        reset()
+
+    def test_route_by_name(self) -> None:
+        case_handler = _ListHandler()
+        other_handler = _ListHandler()
+        case_log = get_logger("case", "c1")
+        self._writer.add_route(case_log.name, case_handler)
+        self._writer.add_route(get_logger("case", "c2").name, other_handler)
+
+        case_log.info("case message")
+        get_logger("node", parent=case_log).info("node message")
+        get_logger("case", "c3").info("not routed")
+        self._writer.remove_route(case_log.name, case_handler)
+        case_log.info("removed")
+        self._writer.flush()
+
+        self.assertListEqual(["case message", "node message"], case_handler.messages)
+        self.assertListEqual([], other_handler.messages)
+
+    def test_filter_on_writer(self) -> None:
+        add_secret("t1t2", sub="**")
+        handler = _ListHandler()
+        log = get_logger("lines")
+        self._writer.add_route(log.name, handler)
+
+        log.lines(logging.INFO, "\x1b[31mred t1t2\x1b[0m\n\x1b[0m\nnext", prefix="> ")
+        log.info("with args: %s", "t1t2")
+        # more records than the queue size, it blocks until there is space.
+        for index in range(20):
+            log.debug(f"line {index}")
+        self._writer.flush()
+
+        self.assertListEqual(
+            ["> red **", "> next", "with args: **"], handler.messages[:3]
+        )
+        self.assertEqual(23, len(handler.messages))
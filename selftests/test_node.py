@@ -0,0 +1,74 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+import tempfile
+from pathlib import Path
+from unittest.case import TestCase
+
+from lisa import schema
+from lisa.node import LocalNode
+from lisa.tools import Echo
+
+
+class ExecuteBatchTestCase(TestCase):
+    def setUp(self) -> None:
+        self._temp_dir = tempfile.TemporaryDirectory()
+        self._node = LocalNode(
+            schema.LocalNode(),
+            index=0,
+            logger_name="node",
+            base_log_path=Path(self._temp_dir.name),
+        )
+
+    def tearDown(self) -> None:
+        self._temp_dir.cleanup()
+
+    def test_empty_output(self) -> None:
+        # the first command prints nothing, and the whole output is stripped.
+        results = self._node.execute_batch(["true", "echo b", "true"])
+        self.assertListEqual(["", "b", ""], [x.stdout for x in results])
+        self.assertListEqual([0, 0, 0], [x.exit_code for x in results])
+
+    def test_failed_commands(self) -> None:
+        results = self._node.execute_batch(
+            ["lsb_release_missing -d", "echo a; echo b >&2; exit 3", "uname"],
+            shell=True,
+        )
+        self.assertNotEqual(0, results[0].exit_code)
+        self.assertEqual("", results[0].stdout)
+        self.assertEqual(("a", "b"), (results[1].stdout, results[1].stderr))
+        self.assertEqual(3, results[1].exit_code)
+        self.assertEqual(0, results[2].exit_code)
+        self.assertNotEqual("", results[2].stdout)
+
+        # not found commands fail, and don't break frames of other commands.
+        results = self._node.execute_batch(["lsb_release_missing -d", "echo c"])
+        self.assertEqual(1, results[0].exit_code)
+        self.assertEqual("c", results[1].stdout)
+
+
+class ToolOutputTestCase(TestCase):
+    def setUp(self) -> None:
+        self._temp_dir = tempfile.TemporaryDirectory()
+        self._node = LocalNode(
+            schema.LocalNode(),
+            index=0,
+            logger_name="node",
+            base_log_path=Path(self._temp_dir.name),
+        )
+
+    def tearDown(self) -> None:
+        self._temp_dir.cleanup()
+
+    def test_max_output_size(self) -> None:
+        echo = self._node.tools[Echo]
+        text = "a" * 1000
+        result = echo.run(text, max_output_size=100)
+        self.assertIsNotNone(result.stdout_path)
+        self.assertLess(len(result.stdout), len(text))
+        self.assertEqual(text, result.get_full_stdout())
+
+        # the result of a different limit isn't loaded from the cache.
+        result = echo.run(text)
+        self.assertIsNone(result.stdout_path)
+        self.assertEqual(text, result.stdout)
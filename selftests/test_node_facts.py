@@ -0,0 +1,43 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+import tempfile
+from pathlib import Path
+from unittest.case import TestCase
+
+from lisa.util.node_facts import NodeFacts, NodeFactsCache
+
+
+class NodeFactsTestCase(TestCase):
+    def setUp(self) -> None:
+        self._temp_dir = tempfile.TemporaryDirectory()
+        self._path = Path(self._temp_dir.name).joinpath("facts.json")
+
+    def tearDown(self) -> None:
+        self._temp_dir.cleanup()
+
+    def test_save_and_load(self) -> None:
+        cache = NodeFactsCache(self._path, ttl=60)
+        facts = NodeFacts(stamp="5.4.0", os_type="Ubuntu")
+        facts.tools["echo"] = [True, False]
+        cache.save("image|size", facts)
+
+        # another run loads it from file
+        cache = NodeFactsCache(self._path, ttl=60)
+        loaded = cache.get("image|size", "5.4.0")
+        assert loaded
+        self.assertEqual("Ubuntu", loaded.os_type)
+        self.assertEqual([True, False], loaded.tools["echo"])
+        self.assertIsNone(cache.get("other image|size", "5.4.0"))
+
+    def test_stamp_and_ttl(self) -> None:
+        cache = NodeFactsCache(self._path, ttl=60)
+        cache.save("key", NodeFacts(stamp="5.4.0", os_type="Ubuntu"))
+        # kernel is changed
+        self.assertIsNone(cache.get("key", "5.8.0"))
+
+        cache.save("old", NodeFacts(stamp="5.4.0", updated_time=1))
+        self.assertIsNone(cache.get("old", "5.4.0"))
+
+        cache.remove("key")
+        self.assertIsNone(cache.get("key", "5.4.0"))
@@ -0,0 +1,229 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+import json
+import sqlite3
+import tempfile
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import ClassVar, List, Type
+from unittest.case import TestCase
+
+from lisa import schema
+from lisa.notifier import (
+    MessageBase,
+    Notifier,
+    TestRunMessage,
+    TestRunStatus,
+    _Dispatcher,
+)
+from lisa.notifiers.jsonl import JsonLines, JsonLinesSchema
+from lisa.notifiers.streaming_html import StreamingHtml, StreamingHtmlSchema
+from lisa.testsuite import TestResultMessage, TestStatus
+from lisa.util import constants
+
+
+@dataclass
+class MockDebugMessage(MessageBase):
+    is_debug: ClassVar[bool] = True
+    type: str = "MockDebug"
+
+
+class MockNotifier(Notifier):
+    """
+    It blocks on delivering, until it's released.
+    """
+
+    def __init__(self) -> None:
+        super().__init__(schema.Notifier(type="mock"))
+        self.batches: List[List[MessageBase]] = []
+        self.delivering = threading.Event()
+        self.released = threading.Event()
+
+    @classmethod
+    def type_name(cls) -> str:
+        return "mock"
+
+    @classmethod
+    def type_schema(cls) -> Type[schema.TypedSchema]:
+        return schema.Notifier
+
+    @property
+    def messages(self) -> List[MessageBase]:
+        return [message for batch in self.batches for message in batch]
+
+    def _received_messages(self, messages: List[MessageBase]) -> None:
+        self.delivering.set()
+        self.released.wait()
+        self.batches.append(messages)
+
+    def _subscribed_message_type(self) -> List[Type[MessageBase]]:
+        return [TestResultMessage, TestRunMessage, MockDebugMessage]
+
+
+class DispatcherTestCase(TestCase):
+    def setUp(self) -> None:
+        self._notifier = MockNotifier()
+        self._run_message = TestRunMessage()
+
+    def test_ordered_in_batches(self) -> None:
+        dispatcher = self._start_dispatcher(10, constants.NOTIFIER_QUEUE_BLOCK)
+        messages = [TestResultMessage(id_=str(index)) for index in range(5)]
+        for message in messages:
+            dispatcher.put(message)
+        self._notifier.released.set()
+        # queued messages are delivered on closing.
+        dispatcher.close()
+
+        self.assertListEqual([self._run_message, *messages], self._notifier.messages)
+        self.assertEqual(2, len(self._notifier.batches))
+
+    def test_coalesce_status(self) -> None:
+        dispatcher = self._start_dispatcher(1, constants.NOTIFIER_QUEUE_COALESCE)
+        running = TestResultMessage(id_="0", status=TestStatus.RUNNING)
+        passed = TestResultMessage(id_="0", status=TestStatus.PASSED)
+        dispatcher.put(running)
+        dispatcher.put(passed)
+        self._notifier.released.set()
+        dispatcher.close()
+
+        self.assertListEqual([self._run_message, passed], self._notifier.messages)
+        self.assertEqual(1, dispatcher.coalesced_count)
+
+    def test_drop_debug(self) -> None:
+        dispatcher = self._start_dispatcher(1, constants.NOTIFIER_QUEUE_DROP)
+        result_message = TestResultMessage(id_="0")
+        dispatcher.put(result_message)
+        dispatcher.put(MockDebugMessage())
+        self._notifier.released.set()
+        dispatcher.close()
+
+        self.assertListEqual(
+            [self._run_message, result_message], self._notifier.messages
+        )
+        self.assertEqual(1, dispatcher.dropped_count)
+
+    def _start_dispatcher(self, queue_size: int, policy: str) -> _Dispatcher:
+        # the first message blocks the thread, so others are queued.
+        dispatcher = _Dispatcher(self._notifier, queue_size=queue_size, policy=policy)
+        dispatcher.put(self._run_message)
+        self._notifier.delivering.wait()
+        return dispatcher
+
+
+class ResultFileTestCase(TestCase):
+    def setUp(self) -> None:
+        self._temp_dir = tempfile.TemporaryDirectory()
+        self._run_local_path = constants.RUN_LOCAL_PATH
+        constants.RUN_LOCAL_PATH = Path(self._temp_dir.name)
+
+    def tearDown(self) -> None:
+        constants.RUN_LOCAL_PATH = self._run_local_path
+        self._temp_dir.cleanup()
+
+    def test_stream_results(self) -> None:
+        notifier = JsonLines(JsonLinesSchema(type="jsonl", database="lisa.db"))
+        notifier.initialize()
+        information = {"vmsize": "Standard_DS2_v2", "image": "ubuntu"}
+        notifier._received_messages(
+            [
+                TestRunMessage(status=TestRunStatus.RUNNING, tags=["t1"]),
+                TestResultMessage(id_="0", name="a1.ut1", status=TestStatus.RUNNING),
+                TestResultMessage(id_="1", name="a1.ut2", status=TestStatus.FAILED),
+            ]
+        )
+        notifier._received_messages(
+            [
+                TestResultMessage(
+                    id_="0",
+                    name="a1.ut1",
+                    status=TestStatus.PASSED,
+                    information=information,
+                )
+            ]
+        )
+
+        # it can be queried before finalizing.
+        connection = sqlite3.connect(str(constants.RUN_LOCAL_PATH / "lisa.db"))
+        rows = connection.execute(
+            "SELECT id, suite, status, vm_size, image FROM results ORDER BY id"
+        ).fetchall()
+        self.assertListEqual(
+            [
+                ("0", "a1", "PASSED", "Standard_DS2_v2", "ubuntu"),
+                ("1", "a1", "FAILED", "", ""),
+            ],
+            rows,
+        )
+        self.assertEqual(
+            ("RUNNING", '["t1"]'),
+            connection.execute("SELECT status, tags FROM runs").fetchone(),
+        )
+        connection.close()
+        notifier.finalize()
+
+        with open(constants.RUN_LOCAL_PATH / "lisa.jsonl") as f:
+            records = [json.loads(line) for line in f]
+        self.assertListEqual(
+            ["RUNNING", "RUNNING", "FAILED", "PASSED"], [x["status"] for x in records]
+        )
+
+    def test_run_fields_kept(self) -> None:
+        notifier = JsonLines(JsonLinesSchema(type="jsonl", database="lisa.db"))
+        notifier.initialize()
+        notifier._received_messages(
+            [
+                TestRunMessage(
+                    status=TestRunStatus.INITIALIZING,
+                    run_name="run1",
+                    test_project="project1",
+                    test_pass="pass1",
+                    tags=["t1"],
+                )
+            ]
+        )
+        # the final message doesn't have all fields.
+        notifier._received_messages(
+            [TestRunMessage(status=TestRunStatus.SUCCESS, elapsed=10)]
+        )
+
+        connection = sqlite3.connect(str(constants.RUN_LOCAL_PATH / "lisa.db"))
+        self.assertEqual(
+            ("run1", "SUCCESS", "project1", "pass1", '["t1"]', 10),
+            connection.execute(
+                "SELECT run_name, status, test_project, test_pass, tags, elapsed "
+                "FROM runs"
+            ).fetchone(),
+        )
+        connection.close()
+        notifier.finalize()
+
+    def test_streaming_html(self) -> None:
+        notifier = StreamingHtml(StreamingHtmlSchema(type="streaming_html"))
+        notifier.initialize()
+        path = constants.RUN_LOCAL_PATH / "report.html"
+        header = path.read_text()
+        notifier._received_messages(
+            [
+                TestResultMessage(id_="0", name="a1.ut1", status=TestStatus.RUNNING),
+                TestResultMessage(
+                    id_="0",
+                    name="a1.ut1",
+                    status=TestStatus.FAILED,
+                    message="</script><!--",
+                ),
+            ]
+        )
+
+        # the report is appended without finalizing, and only completed results
+        # are written.
+        content = path.read_text()
+        self.assertTrue(content.startswith(header))
+        appended = content[len(header) :].splitlines()
+        self.assertEqual(1, len(appended))
+        self.assertTrue(appended[0].startswith("<script>r("))
+        self.assertEqual(1, appended[0].count("</script>"))
+        self.assertNotIn("<!--", appended[0])
+        notifier.finalize()
+        self.assertDictEqual({"FAILED": 1}, notifier._summary)
@@ -0,0 +1,48 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+from threading import Barrier
+from typing import Callable, Dict
+from unittest.case import TestCase
+
+from lisa.util import LisaException
+from lisa.util.parallel import ParallelException, run_in_parallel
+
+
+class ParallelTestCase(TestCase):
+    def test_run_in_parallel(self) -> None:
+        # all tasks must run at the same time to pass the barrier.
+        barrier = Barrier(3, timeout=10)
+
+        def _task(value: int) -> int:
+            barrier.wait()
+            return value
+
+        results = run_in_parallel(
+            {"c": lambda: _task(3), "a": lambda: _task(1), "b": lambda: _task(2)}
+        )
+        self.assertListEqual(["c", "a", "b"], list(results.keys()))
+        self.assertListEqual([3, 1, 2], list(results.values()))
+
+    def test_run_in_parallel_errors(self) -> None:
+        def _fail(message: str) -> int:
+            raise LisaException(message)
+
+        tasks: Dict[str, Callable[[], int]] = {
+            "node[0]": lambda: 0,
+            "node[1]": lambda: _fail("error 1"),
+            "node[2]": lambda: _fail("error 2"),
+        }
+        with self.assertRaises(ParallelException) as cm:
+            run_in_parallel(tasks)
+        self.assertListEqual(["node[1]", "node[2]"], list(cm.exception.errors.keys()))
+        self.assertIn("[node[2]] LisaException: error 2", str(cm.exception))
+
+    def test_run_in_parallel_one_error(self) -> None:
+        def _fail() -> int:
+            raise FileNotFoundError("missing")
+
+        tasks: Dict[str, Callable[[], int]] = {"node[0]": lambda: 0, "node[1]": _fail}
+        # the only error is raised as is.
+        with self.assertRaises(FileNotFoundError):
+            run_in_parallel(tasks)
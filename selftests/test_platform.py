@@ -252,3 +252,20 @@ class PlatformTestCase(TestCase):
             self.assertEqual(EnvironmentStatus.Deployed, env.status)
             platform.delete_environment(env)
             self.assertEqual(EnvironmentStatus.Deleted, env.status)
+
+    def test_environment_requirement(self) -> None:
+        platform = generate_platform()
+        env = generate_environments()["customized_0"]
+        requirement = platform._get_environment_requirement(env)
+        self.assertEqual(requirement, platform._get_environment_requirement(env))
+
+        # environments of the previous run aren't re-attached, if the platform
+        # runbook or chosen settings are changed.
+        changed_platform = generate_platform(keep_environment=True)
+        self.assertNotEqual(
+            requirement, changed_platform._get_environment_requirement(env)
+        )
+        platform._get_environment_settings = lambda _: {  # type: ignore
+            "vm_size": "Standard_DS2_v2"
+        }
+        self.assertNotEqual(requirement, platform._get_environment_requirement(env))
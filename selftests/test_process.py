@@ -0,0 +1,83 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+import logging
+import tempfile
+from pathlib import Path
+from unittest.case import TestCase
+
+from lisa.util.logger import LogWriter, get_logger
+from lisa.util.perf_timer import create_timer
+from lisa.util.process import ExecutableResult, Process, _OutputCapture
+from lisa.util.shell import LocalShell
+
+
+class OutputCaptureTestCase(TestCase):
+    def setUp(self) -> None:
+        self._temp_dir = tempfile.TemporaryDirectory()
+        self._path = Path(self._temp_dir.name).joinpath("stdout.log")
+        self._writer = LogWriter(get_logger("stdout"), logging.DEBUG)
+
+    def tearDown(self) -> None:
+        self._temp_dir.cleanup()
+
+    def test_in_memory(self) -> None:
+        capture = _OutputCapture(self._writer, max_size=100, path=self._path)
+        capture.write("line 1\n")
+        capture.write("line 2\n")
+        capture.close()
+        self.assertEqual("line 1\nline 2\n", capture.text)
+        self.assertIsNone(capture.path)
+        self.assertFalse(self._path.exists())
+
+    def test_spill(self) -> None:
+        capture = _OutputCapture(self._writer, max_size=20, path=self._path)
+        lines = [f"line {index:02}\n" for index in range(10)]
+        for line in lines:
+            capture.write(line)
+        capture.close()
+
+        self.assertEqual(self._path, capture.path)
+        self.assertTrue(capture.text.startswith("line 00\nli"))
+        self.assertTrue(capture.text.endswith("line 08\nline 09\n"))
+        self.assertNotIn("line 05", capture.text)
+
+        result = ExecutableResult(
+            capture.text.strip(), "", 0, "cmd", 0, stdout_path=capture.path
+        )
+        self.assertEqual("".join(lines).strip(), result.get_full_stdout())
+        self.assertEqual("", result.get_full_stderr())
+
+
+class ProcessTestCase(TestCase):
+    def test_killed_on_timeout(self) -> None:
+        shell = LocalShell()
+        shell.initialize()
+        process = Process("timeout", shell)
+        process.start("sleep 30")
+        timer = create_timer()
+        result = process.wait_result(timeout=0.5)
+        self.assertLess(timer.elapsed(), 10)
+        self.assertNotEqual(0, result.exit_code)
+
+    def test_spill_files_unique(self) -> None:
+        # ids of processes are random, so they may be the same.
+        shell = LocalShell()
+        shell.initialize()
+        with tempfile.TemporaryDirectory() as temp_dir:
+            results = []
+            for index in range(2):
+                process = Process("1", shell)
+                process.start(
+                    f"seq {index} 1000",
+                    max_output_size=100,
+                    output_path=Path(temp_dir),
+                )
+                results.append(process.wait_result())
+
+            self.assertNotEqual(results[0].stdout_path, results[1].stdout_path)
+            for index, result in enumerate(results):
+                self.assertEqual(
+                    "\n".join(str(x) for x in range(index, 1001)),
+                    result.get_full_stdout(),
+                )
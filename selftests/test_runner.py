@@ -0,0 +1,150 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, List, Tuple
+from unittest.case import TestCase
+
+from lisa import notifier
+from lisa.environment import EnvironmentHookImpl
+from lisa.parameter_parser.runbook import RunbookBuilder
+from lisa.runner import RootRunner
+from lisa.runners.lisa_runner import LisaRunner
+from lisa.sut_orchestrator.ready import ReadyPlatform
+from lisa.testsuite import TestResultMessage, TestStatus
+from lisa.util import LisaException, constants, plugin_manager
+from lisa.util.parallel import TaskManager, check_cancelled, set_global_task_manager
+from selftests import test_testsuite
+
+# seconds of a shard waiting to be cancelled, it's much longer than the test.
+_CANCEL_TIMEOUT = 30
+
+
+class MockRootRunner(RootRunner):
+    """
+    The shard of the failed index fails, and other shards wait to be cancelled.
+    """
+
+    def __init__(self, runbook_builder: RunbookBuilder, failed_shard: int = -1):
+        super().__init__(runbook_builder)
+        self.failed_shard = failed_shard
+        self.summary: List[Tuple[str, TestStatus, str]] = []
+        self.shard_messages: List[TestResultMessage] = []
+
+    def _start_loop(self) -> None:
+        if self.failed_shard < 0:
+            super()._start_loop()
+        elif self._shard_index == self.failed_shard:
+            raise LisaException("mock shard failed")
+        else:
+            set_global_task_manager(TaskManager[Any](1, lambda _: None))
+            timer = time.time()
+            while time.time() - timer < _CANCEL_TIMEOUT:
+                check_cancelled()
+                time.sleep(0.1)
+
+    def _start_shards(self, shard_count: int) -> List[TestResultMessage]:
+        self.shard_messages = super()._start_shards(shard_count)
+        return self.shard_messages
+
+    def _output_results(self, test_results: List[Tuple[str, TestStatus, str]]) -> None:
+        self.summary = test_results
+        super()._output_results(test_results)
+
+
+class RootRunnerTestCase(TestCase):
+    def setUp(self) -> None:
+        self._temp_dir = tempfile.TemporaryDirectory()
+        self._run_local_path = constants.RUN_LOCAL_PATH
+        constants.RUN_LOCAL_PATH = Path(self._temp_dir.name)
+        test_testsuite.generate_cases_metadata()
+        # the mock platform unregisters plugins, so register the environment
+        # information again.
+        self._environment_hook = EnvironmentHookImpl()
+        plugin_manager.register(self._environment_hook)
+
+    def tearDown(self) -> None:
+        plugin_manager.unregister(self._environment_hook)
+        test_testsuite.cleanup_cases_metadata()
+        test_testsuite.fail_case_count = 0
+        notifier.set_forward(None)
+        constants.RUN_LOCAL_PATH = self._run_local_path
+        self._temp_dir.cleanup()
+
+    def test_shards(self) -> None:
+        # test results of shard processes are merged to the summary.
+        test_testsuite.fail_case_count = 1
+        runner = MockRootRunner(self._generate_runbook_builder())
+        asyncio.run(runner.start())
+
+        self.assertListEqual(
+            [
+                ("MockTestSuite.mock_ut1", TestStatus.FAILED),
+                ("MockTestSuite.mock_ut2", TestStatus.PASSED),
+                ("MockTestSuite2.mock_ut3", TestStatus.PASSED),
+            ],
+            sorted((name, status) for name, status, _ in runner.summary),
+        )
+        # the exit code is the count of failed test results.
+        self.assertEqual(1, runner.exit_code)
+        # environments with existing nodes are split, and ids of environments
+        # are unique in shards.
+        self.assertDictEqual(
+            {
+                "MockTestSuite.mock_ut1": "customized_0",
+                "MockTestSuite.mock_ut2": "customized_0",
+                "MockTestSuite2.mock_ut3": "customized_100000",
+            },
+            {
+                x.name: x.information["name"]
+                for x in runner.shard_messages
+                if x.status == TestStatus.PASSED or x.status == TestStatus.FAILED
+            },
+        )
+
+    def test_shards_more_than_environments(self) -> None:
+        # the nodes of an environment cannot run test cases of shards at the
+        # same time.
+        runner = MockRootRunner(self._generate_runbook_builder(environment_count=1))
+        with self.assertRaises(LisaException) as cm:
+            asyncio.run(runner.start())
+        self.assertIn("cannot be less than the shard count 2", str(cm.exception))
+
+    def test_shards_cancelled_on_failure(self) -> None:
+        runner = MockRootRunner(self._generate_runbook_builder(), failed_shard=1)
+        timer = time.time()
+        with self.assertRaises(LisaException) as cm:
+            asyncio.run(runner.start())
+
+        # the other shard is cancelled, instead of running to the end.
+        self.assertLess(time.time() - timer, _CANCEL_TIMEOUT)
+        self.assertIn("shard 1: mock shard failed", str(cm.exception))
+        self.assertIn("shard 0: Tasks are cancelled", str(cm.exception))
+
+    def _generate_runbook_builder(self, environment_count: int = 2) -> RunbookBuilder:
+        runbook_builder = RunbookBuilder(Path("mock_runbook.yml"))
+        local_node = {
+            constants.TYPE: constants.ENVIRONMENTS_NODES_LOCAL,
+            constants.ENVIRONMENTS_NODES_CAPABILITY: {"core_count": {"min": 8}},
+        }
+        runbook_builder._raw_data = {
+            constants.PLATFORM: [{constants.TYPE: ReadyPlatform.type_name()}],
+            constants.ENVIRONMENT: {
+                constants.ENVIRONMENTS: [
+                    {"nodes": [local_node, local_node]}
+                    for _ in range(environment_count)
+                ]
+            },
+            constants.TESTCASE: [
+                {
+                    constants.TYPE: LisaRunner.type_name(),
+                    "criteria": {"priority": [0, 1, 2]},
+                }
+            ],
+            "concurrency": 2,
+            "shard_count": 2,
+        }
+        return runbook_builder
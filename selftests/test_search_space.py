@@ -7,6 +7,7 @@ from dataclasses import dataclass
 from typing import Any, List, Optional, TypeVar
 
 from lisa.search_space import (
+    CheckCache,
     CountSpace,
     IntRange,
     RequirementMixin,
@@ -16,6 +17,7 @@ from lisa.search_space import (
     check_countspace,
     generate_min_capability,
     generate_min_capability_countspace,
+    get_fingerprint,
 )
 from lisa.util import LisaException
 from lisa.util.logger import get_logger
@@ -184,6 +186,47 @@ class SearchSpaceTestCase(unittest.TestCase):
             IntRange(min=5, max=5, max_inclusive=False)
         self.assertIn("shouldn't be equal to", str(cm.exception))
 
+    def test_fingerprint(self) -> None:
+        self.assertEqual(
+            get_fingerprint(IntRange(min=1, max=5)),
+            get_fingerprint(IntRange(min=1, max=5)),
+        )
+        self.assertNotEqual(
+            get_fingerprint(IntRange(min=1, max=5)),
+            get_fingerprint(IntRange(min=1, max=5, max_inclusive=False)),
+        )
+        self.assertNotEqual(get_fingerprint(1), get_fingerprint(IntRange(1, 1)))
+        self.assertEqual(
+            get_fingerprint(SetSpace[str](is_allow_set=True, items=["aa", "bb"])),
+            get_fingerprint(SetSpace[str](is_allow_set=True, items=["bb", "aa"])),
+        )
+        self.assertNotEqual(
+            get_fingerprint(SetSpace[str](is_allow_set=True, items=["aa"])),
+            get_fingerprint(SetSpace[str](is_allow_set=False, items=["aa"])),
+        )
+
+    def test_check_cache(self) -> None:
+        cache = CheckCache(max_size=2)
+        requirement = IntRange(min=10, max=15)
+
+        result = cache.check(requirement, IntRange(min=20))
+        self.assertFalse(result.result)
+        # the returned result can be changed without impacting the cache
+        result.add_reason("changed by caller")
+        result = cache.check(IntRange(min=10, max=15), IntRange(min=20))
+        self.assertFalse(result.result)
+        self.assertNotIn("changed by caller", result.reasons)
+        self.assertEqual(1, cache.hits)
+        self.assertEqual(1, cache.misses)
+
+        # the oldest result is dropped, if it's full.
+        cache.check(requirement, 12)
+        cache.check(requirement, 13)
+        self.assertEqual(2, len(cache))
+        cache.check(requirement, IntRange(min=20))
+        self.assertEqual(1, cache.hits)
+        self.assertEqual(4, cache.misses)
+
     def _verify_matrix(
         self,
         expected_meet: List[List[bool]],
@@ -1,9 +1,13 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
 
+import random
 import re
+import string
+from typing import List
 from unittest.case import TestCase
 
+from lisa import secret
 from lisa.secret import PATTERN_GUID, add_secret, mask, reset
 from lisa.util.logger import get_logger
 
@@ -79,3 +83,58 @@ class SecretTestCase(TestCase):
         with self.assertLogs("lisa") as cm:
             log.info("with args t2: %s", "t1")
         self.assertListEqual(["INFO:lisa.:with args ******: ******"], cm.output)
+
+    def test_many_secrets(self) -> None:
+        # the compiled matcher is used for many secrets.
+        secrets = self._generate_secrets(secret._MATCHER_MIN_SECRETS)
+        for item in secrets:
+            add_secret(item)
+        add_secret("t1", sub="*")
+        add_secret("t1t2", sub="**")
+        result = mask(f"t1t2 t1 {secrets[0]},{secrets[-1]}{secrets[1]} test3")
+        self.assertEqual("** * ******,************ test3", result)
+        self.assertEqual("t", mask("t"))
+
+    def test_many_overlapped_secrets(self) -> None:
+        for item in self._generate_secrets(secret._MATCHER_MIN_SECRETS):
+            add_secret(item)
+        add_secret("ab")
+        add_secret("bcdefgh_longsecret")
+        add_secret("longsecret_tail")
+        # the longer secret is masked, even it's overlapped by shorter ones.
+        self.assertEqual("a******", mask("abcdefgh_longsecret"))
+        self.assertEqual("a******_tail", mask("abcdefgh_longsecret_tail"))
+        self.assertEqual("****** and ******", mask("ab and longsecret_tail"))
+
+    def test_same_as_loop(self) -> None:
+        # the matcher masks the same as the simple loop, which is used for a few
+        # secrets, even secrets are overlapped.
+        secrets = self._generate_secrets(1000)
+        secrets.extend(x[2:] + "_overlap" for x in secrets[:50])
+        for item in secrets:
+            add_secret(item)
+        sorted_secrets = sorted(secrets, reverse=True, key=len)
+
+        def _loop_mask(input: str) -> str:
+            for item in sorted_secrets:
+                if item in input:
+                    input = input.replace(item, "******")
+            return input
+
+        generator = random.Random(1)
+        for _ in range(200):
+            parts = generator.sample(secrets, 3)
+            head = parts[1][: generator.randint(0, 8)]
+            line = f"cmd[1234] {parts[0]}{head} {parts[1]}_overlap {parts[2]}."
+            self.assertEqual(_loop_mask(line), mask(line), line)
+
+    def _generate_secrets(self, count: int) -> List[str]:
+        generator = random.Random(0)
+        return [
+            "".join(
+                generator.choices(
+                    string.ascii_letters + string.digits, k=generator.randint(8, 40)
+                )
+            )
+            for _ in range(count)
+        ]
@@ -0,0 +1,92 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+import threading
+from typing import Any, List, Optional
+from unittest.case import TestCase
+
+import paramiko
+
+from lisa.util.shell import _is_background_command, _SpurSshShell
+
+
+class MockChannel:
+    def __init__(self) -> None:
+        self.closed = False
+        self.status_event = threading.Event()
+
+    def exit_status_ready(self) -> bool:
+        return self.status_event.is_set()
+
+    def exit(self) -> None:
+        self.status_event.set()
+
+
+class MockTransport:
+    def __init__(self) -> None:
+        self.channels: List[MockChannel] = []
+
+    def set_keepalive(self, interval: int) -> None:
+        ...
+
+    def is_active(self) -> bool:
+        return True
+
+    def open_session(self, timeout: Optional[float] = None) -> MockChannel:
+        channel = MockChannel()
+        self.channels.append(channel)
+        return channel
+
+    def open_sftp_client(self) -> str:
+        return "sftp"
+
+
+class MockClient(paramiko.SSHClient):
+    def __init__(self) -> None:
+        super().__init__()
+        self.transport = MockTransport()
+
+    def get_transport(self) -> Any:
+        return self.transport
+
+
+class SpurSshShellTestCase(TestCase):
+    def setUp(self) -> None:
+        self._client = MockClient()
+        self._shell = _SpurSshShell(
+            client=self._client, max_channels=2, hostname="mock"
+        )
+
+    def test_transport_reused(self) -> None:
+        # the connected client of probing is used, instead of connecting again.
+        channels = [self._shell._open_channel() for _ in range(2)]
+        self.assertEqual("sftp", self._shell._open_sftp_client())
+        self.assertListEqual(channels, self._client.transport.channels)
+        self.assertIs(self._client, self._shell._client)
+
+    def test_max_channels(self) -> None:
+        for _ in range(2):
+            self._shell._open_channel()
+        opened: List[Any] = []
+        thread = threading.Thread(
+            target=lambda: opened.append(self._shell._open_channel())
+        )
+        thread.start()
+
+        # it waits until a running command exits.
+        thread.join(0.5)
+        self.assertListEqual([], opened)
+        self._client.transport.channels[0].exit()
+        thread.join(10)
+        self.assertEqual(1, len(opened))
+        self.assertEqual(3, len(self._client.transport.channels))
+
+    def test_background_not_counted(self) -> None:
+        channels = [self._shell._open_channel() for _ in range(2)]
+        self._shell._release_channel(channels[0])
+        self._shell._open_channel()
+        self.assertEqual(3, len(self._client.transport.channels))
+
+        self.assertTrue(_is_background_command(["sh", "-c", "nohup sleep 10 &"]))
+        self.assertFalse(_is_background_command(["sh", "-c", "echo a && echo b"]))
+        self.assertFalse(_is_background_command(["nohup", "sleep", "10"]))
@@ -170,6 +170,53 @@ class TestTransformerCase(TestCase):
             result,
         )
 
+    def test_transformer_concurrent(self) -> None:
+        # t2 gets variables from t0 only, and results are merged in sorted order.
+        transformers_data: List[Any] = [
+            {
+                "type": MOCK,
+                "name": "t0",
+                "items": {"v0": "0"},
+                "rename": {"t0_v0": "v0"},
+            },
+            {
+                "type": MOCK,
+                "name": "t1",
+                "items": {"v0": "1"},
+                "rename": {"t1_v0": "v0"},
+            },
+            {
+                "type": MOCK,
+                "name": "t2",
+                "depends_on": ["t0"],
+                "items": {"v0": "$(v0)"},
+            },
+        ]
+        transformers = schema.Transformer.schema().load(  # type: ignore
+            transformers_data, many=True
+        )
+        runbook_builder = self._generate_runbook_builder(transformers, concurrency=3)
+
+        result = transformer._run_transformers(runbook_builder)
+        self._validate_variables(
+            {
+                "v0": "1 processed",
+                "va": "original",
+                "t2_v0": "0 processed processed",
+            },
+            result,
+        )
+
+    def test_transformer_concurrent_failed(self) -> None:
+        transformers = self._generate_transformers_runbook(3)
+        transformers[0].rename = {"v0": "v0_1"}
+        transformers[2].depends_on = ["t0"]
+        runbook_builder = self._generate_runbook_builder(transformers, concurrency=3)
+
+        with self.assertRaises(LisaException) as cm:
+            transformer._run_transformers(runbook_builder)
+        self.assertEqual("unmatched rename variable: {'v0': 'v0_1'}", str(cm.exception))
+
     def _validate_variables(
         self, expected: Dict[str, str], actual: Dict[str, VariableEntry]
     ) -> None:
@@ -177,7 +224,7 @@ class TestTransformerCase(TestCase):
         self.assertDictEqual(expected, actual_pairs)
 
     def _generate_runbook_builder(
-        self, transformers: List[schema.Transformer]
+        self, transformers: List[schema.Transformer], concurrency: int = 1
     ) -> RunbookBuilder:
 
         transformers_data: List[Any] = [
@@ -186,6 +233,7 @@ class TestTransformerCase(TestCase):
         runbook_builder = RunbookBuilder(Path("mock_runbook.yml"))
         runbook_builder._raw_data = {
             constants.TRANSFORMER: transformers_data,
+            constants.TRANSFORMER_CONCURRENCY: concurrency,
         }
         runbook_builder._variables = {
             "v0": VariableEntry("v0", "original"),